@@ -1,25 +1,73 @@
 """
 Настройка SQLAdmin панели для управления базой данных
+
+Админ-панель работает через асинхронный движок (aiosqlite / asyncpg),
+поэтому запросы к БД не блокируют event loop uvicorn. Списки, карточки
+и выгрузки читаются через движок чтения, изменения идут в основной движок.
 """
+import asyncio
+from contextlib import asynccontextmanager
 from starlette.applications import Starlette
 from starlette.middleware import Middleware
 from starlette.middleware.sessions import SessionMiddleware
+import sqladmin
 from sqladmin import Admin, ModelView
 from sqladmin.authentication import AuthenticationBackend
 from starlette.requests import Request
 from database.models import User, Player, TeamApplication, GameNotification, Admin as AdminModel, UserActivity
-from database.database import engine, get_session
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+from database.database import get_async_engine, get_async_session, get_async_read_session, close_async_db
 from config import config
-from starlette.responses import HTMLResponse, Response
+from starlette.responses import HTMLResponse, JSONResponse, Response
 from starlette.routing import Route
 from datetime import datetime
 from typing import Optional
 from wtforms import PasswordField, SelectField
 from wtforms.validators import Optional as OptionalValidator
 from utils.metrics import metrics_service
+from utils.runtime_stats import collect_runtime_stats
+from utils.stats_export import load_exported_stats
+from utils.sql_stats import sql_stats
+
+
+# Версия SQLAdmin, под внутренние методы которой написан ReadReplicaModelView
+SQLADMIN_VERSION = '0.16.1'
+
+
+class ReadReplicaModelView(ModelView):
+    """
+    Представление, которое читает списки и карточки через движок чтения
+    
+    Аналитические списки (счётчики страниц, поиск, выгрузка) не занимают
+    соединения бота. Объект для редактирования и удаления загружается
+    из основной БД, чтобы форма не показала отстающие данные реплики.
+    
+    Переопределяет внутренние методы ModelView (_run_query,
+    _stmt_by_identifier, _form_relations), поэтому SQLAdmin закреплён
+    в requirements.txt на версии SQLADMIN_VERSION.
+    """
+    
+    async def _run_query(self, stmt):
+        async with get_async_read_session() as session:
+            result = await session.execute(stmt)
+            return result.scalars().unique().all()
+    
+    async def _run_primary_query(self, stmt):
+        rows = await super()._run_query(stmt)
+        return rows[0] if rows else None
+    
+    async def get_object_for_edit(self, value):
+        stmt = self._stmt_by_identifier(value)
+        for relation in self._form_relations:
+            stmt = stmt.options(joinedload(relation))
+        return await self._run_primary_query(stmt)
+    
+    async def get_object_for_delete(self, value):
+        return await self._run_primary_query(self._stmt_by_identifier(value))
 
 
-class UserAdmin(ModelView, model=User):
+class UserAdmin(ReadReplicaModelView, model=User):
     """Админка для пользователей (подписчики уведомлений)"""
     
     # Настройки отображения
@@ -66,7 +114,7 @@ class UserAdmin(ModelView, model=User):
         return request.session.get("admin_role") in ["admin", "manager"]
 
 
-class TeamApplicationAdmin(ModelView, model=TeamApplication):
+class TeamApplicationAdmin(ReadReplicaModelView, model=TeamApplication):
     """Админка для заявок команд"""
     
     name = "Заявка команды"
@@ -105,7 +153,7 @@ class TeamApplicationAdmin(ModelView, model=TeamApplication):
         return request.session.get("admin_role") in ["admin", "manager"]
 
 
-class PlayerAdmin(ModelView, model=Player):
+class PlayerAdmin(ReadReplicaModelView, model=Player):
     """Админка для игроков"""
     
     name = "Игрок"
@@ -145,7 +193,7 @@ class PlayerAdmin(ModelView, model=Player):
         return request.session.get("admin_role") in ["admin", "manager"]
 
 
-class GameNotificationAdmin(ModelView, model=GameNotification):
+class GameNotificationAdmin(ReadReplicaModelView, model=GameNotification):
     """Админка для истории уведомлений"""
     
     name = "Уведомление"
@@ -257,8 +305,7 @@ class AdminUserAdmin(ModelView, model=AdminModel):
         new_password = data.pop('new_password', None)
         role = data.pop('role', 'manager')  # Извлекаем роль из extra_fields
         
-        session = get_session()
-        try:
+        async with get_async_session() as session:
             admin = AdminModel(**data)
             admin.role = role  # Устанавливаем роль
             
@@ -269,23 +316,21 @@ class AdminUserAdmin(ModelView, model=AdminModel):
                 admin.set_password('password')
             
             session.add(admin)
-            session.commit()
-            session.refresh(admin)
+            try:
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                raise e
+            await session.refresh(admin)
             return admin
-        except Exception as e:
-            session.rollback()
-            raise e
-        finally:
-            session.close()
     
     async def update_model(self, request: Request, pk: str, data: dict) -> Optional[AdminModel]:
         """Обновление администратора"""
         new_password = data.pop('new_password', None)
         role = data.pop('role', None)  # Извлекаем роль из extra_fields
         
-        session = get_session()
-        try:
-            admin = session.query(AdminModel).filter(AdminModel.id == pk).first()
+        async with get_async_session() as session:
+            admin = await session.get(AdminModel, int(pk))
             if not admin:
                 return None
             
@@ -302,21 +347,20 @@ class AdminUserAdmin(ModelView, model=AdminModel):
             if new_password:
                 admin.set_password(new_password)
             
-            session.commit()
-            session.refresh(admin)
+            try:
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                raise e
+            await session.refresh(admin)
             return admin
-        except Exception as e:
-            session.rollback()
-            raise e
-        finally:
-            session.close()
     
     def is_accessible(self, request: Request) -> bool:
         """Доступ только для admin"""
         return request.session.get("admin_role") == "admin"
 
 
-class UserActivityAdmin(ModelView, model=UserActivity):
+class UserActivityAdmin(ReadReplicaModelView, model=UserActivity):
     """Админка для логов активности пользователей"""
     
     name = "Активность"
@@ -367,17 +411,16 @@ class AdminAuthentication(AuthenticationBackend):
         if not username or not password:
             return False
         
-        session = get_session()
-        try:
-            admin = session.query(AdminModel).filter_by(
-                username=username,
-                is_active=True
-            ).first()
+        async with get_async_session() as session:
+            result = await session.execute(
+                select(AdminModel).filter_by(username=username, is_active=True)
+            )
+            admin = result.scalars().first()
             
             if admin and admin.check_password(password):
                 # Обновляем время последнего входа
                 admin.last_login = datetime.utcnow()
-                session.commit()
+                await session.commit()
                 
                 # Сохраняем в сессии ID, username и роль
                 request.session.update({
@@ -388,8 +431,6 @@ class AdminAuthentication(AuthenticationBackend):
                 return True
             
             return False
-        finally:
-            session.close()
     
     async def logout(self, request: Request) -> bool:
         """Обработка выхода"""
@@ -403,29 +444,32 @@ class AdminAuthentication(AuthenticationBackend):
         if not admin_id:
             return False
         
-        session = get_session()
-        try:
-            admin = session.query(AdminModel).filter_by(
-                id=admin_id,
-                is_active=True
-            ).first()
-            
-            # Обновляем роль в сессии на случай если она изменилась
-            if admin:
-                request.session["admin_role"] = admin.role
-            
-            return admin is not None
-        finally:
-            session.close()
+        async with get_async_session() as session:
+            result = await session.execute(
+                select(AdminModel.role).filter_by(id=admin_id, is_active=True)
+            )
+            role = result.scalar()
+        
+        # Обновляем роль в сессии на случай если она изменилась
+        if role is not None:
+            request.session["admin_role"] = role
+        
+        return role is not None
 
 
-def create_admin_app():
+def create_admin_app(bot=None):
     """
     Создание Starlette приложения с админ-панелью
     
+    Args:
+        bot: Экземпляр бота; если передан, в приложение монтируется webhook
+    
     Returns:
         Starlette app с настроенной админ-панелью
     """
+    if sqladmin.__version__ != SQLADMIN_VERSION:
+        print(f"⚠️ SQLAdmin {sqladmin.__version__} вместо {SQLADMIN_VERSION}: "
+              f"ReadReplicaModelView использует его внутренние методы, проверьте списки и формы")
     
     async def homepage(request):
         html = """
@@ -488,17 +532,18 @@ def create_admin_app():
             return Response("Unauthorized", status_code=401)
         
         # Собираем метрики
-        total_users = metrics_service.get_total_users()
-        active_7d = metrics_service.get_active_users(7)
-        active_30d = metrics_service.get_active_users(30)
-        new_7d = metrics_service.get_new_users(7)
-        new_30d = metrics_service.get_new_users(30)
-        subscribers = metrics_service.get_subscribers_count()
-        interactions_7d = metrics_service.get_total_interactions(7)
-        interactions_30d = metrics_service.get_total_interactions(30)
-        retention_7d = metrics_service.get_retention_rate(7)
-        retention_30d = metrics_service.get_retention_rate(30)
-        top_actions = metrics_service.get_top_actions(7, 10)
+        metrics = await metrics_service.get_dashboard_async(top_actions_limit=10)
+        total_users = metrics['total_users']
+        active_7d = metrics['active_7d']
+        active_30d = metrics['active_30d']
+        new_7d = metrics['new_7d']
+        new_30d = metrics['new_30d']
+        subscribers = metrics['subscribers']
+        interactions_7d = metrics['interactions_7d']
+        interactions_30d = metrics['interactions_30d']
+        retention_7d = metrics['retention_7d']
+        retention_30d = metrics['retention_30d']
+        top_actions = metrics['top_actions']
         
         # HTML страницы
         actions_html = "".join([
@@ -662,17 +707,60 @@ def create_admin_app():
         """
         return HTMLResponse(html)
     
+    async def runtime_metrics(request):
+        """
+        Оперативная статистика: снимок, опубликованный процессом бота,
+        и статистика процесса админ-панели
+        """
+        if not request.session.get("admin_id"):
+            return Response("Unauthorized", status_code=401)
+        
+        return JSONResponse({
+            'bot': await asyncio.to_thread(load_exported_stats),
+            'admin': collect_runtime_stats(),
+        })
+    
+    async def sql_metrics(request):
+        """Статистика SQL-запросов: по обработчикам, N+1, самые затратные запросы"""
+        if not request.session.get("admin_id"):
+            return Response("Unauthorized", status_code=401)
+        
+        exported = await asyncio.to_thread(load_exported_stats)
+        return JSONResponse({
+            'bot': {
+                'updated_at': exported['updated_at'],
+                **exported['stats'].get('sql', {}),
+            } if exported else None,
+            'admin': sql_stats.get_stats(top=20),
+        })
+    
+    @asynccontextmanager
+    async def lifespan(app):
+        """Закрытие соединений асинхронного движка при остановке сервера"""
+        yield
+        await close_async_db()
+    
     # Middleware для сессий
     middleware = [
         Middleware(SessionMiddleware, secret_key=config.ADMIN_SECRET_KEY)
     ]
     
+    routes = [
+        Route('/', homepage),
+        Route('/metrics', metrics_page),
+        Route('/metrics/runtime', runtime_metrics),
+        Route('/metrics/sql', sql_metrics),
+    ]
+    
+    # Webhook бота в том же приложении (один процесс для бота и админки)
+    if bot is not None:
+        from utils.webhook import create_webhook_route
+        routes.append(create_webhook_route(bot))
+    
     app = Starlette(
-        routes=[
-            Route('/', homepage),
-            Route('/metrics', metrics_page),
-        ],
-        middleware=middleware
+        routes=routes,
+        middleware=middleware,
+        lifespan=lifespan
     )
     
     # Создание бэкенда аутентификации
@@ -681,7 +769,7 @@ def create_admin_app():
     # Создание админ-панели с аутентификацией
     admin = Admin(
         app,
-        engine,
+        get_async_engine(),
         title="Админ-панель хоккейной лиги",
         base_url='/admin',
         authentication_backend=authentication_backend
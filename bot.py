@@ -1,16 +1,35 @@
 """
 Главный файл запуска Telegram бота для хоккейной лиги
+
+Запуск с отчётом о времени старта: python bot.py --profile-startup
 """
-import telebot
+import time
+
+_imports_started_at = time.perf_counter()
+
+import signal
+import sys
 from config import config
-from database import init_db
+from database import init_db, close_db
 from handlers import (
     register_start_handlers,
     register_notification_handlers,
     register_team_handlers,
     register_player_handlers
 )
+from handlers.router import router
+from utils.user_context import attach_user_context, notification_state
+from utils.executor import OrderedTeleBot
 from utils.scheduler import NotificationScheduler
+from utils.shutdown import graceful_shutdown, register_shutdown_hook
+from utils.stats_export import stats_exporter
+from utils.throttling import create_throttle_guard
+from utils.update_tracker import update_tracker
+from utils.startup import startup_profiler
+from utils import api_service
+from keyboards.reply_keyboards import get_teams_keyboard
+
+startup_profiler.record('imports', _imports_started_at, time.perf_counter() - _imports_started_at)
 
 
 def create_bot():
@@ -23,7 +42,13 @@ def create_bot():
     if not config.BOT_TOKEN:
         raise ValueError("BOT_TOKEN не найден в .env файле!")
     
-    bot = telebot.TeleBot(config.BOT_TOKEN)
+    # Сообщения одного чата обрабатываются по порядку, разные чаты - параллельно
+    # Повторно доставленные обновления отбрасываются до обработчиков
+    bot = OrderedTeleBot(
+        config.BOT_TOKEN,
+        num_threads=config.WORKER_THREADS,
+        update_tracker=update_tracker
+    )
     
     # Регистрация обработчиков
     register_start_handlers(bot)
@@ -31,9 +56,59 @@ def create_bot():
     register_team_handlers(bot)
     register_player_handlers(bot)
     
+    # Слишком частые сообщения отбрасываются до обращения к БД
+    router.guard(create_throttle_guard(bot, router))
+    
+    # Пользователь загружается один раз на обновление и прикрепляется к сообщению
+    router.middleware(attach_user_context)
+    
+    # Один обработчик telebot, дальше выбор по словарям маршрутизатора
+    router.attach(bot)
+    
     return bot
 
 
+def warm_database() -> int:
+    """
+    Подготовка БД: таблицы, состояние уведомлений и сохранённый offset
+    
+    Returns:
+        Последний обработанный update_id
+    """
+    init_db()
+    notification_state.warm()
+    return update_tracker.load()
+
+
+def warm_api_snapshot():
+    """
+    Загрузка команд и матчей из API и сборка клавиатуры команд,
+    чтобы первый пользователь не ждал запросов к API
+    """
+    teams = api_service.get_teams()
+    api_service.get_games()
+    get_teams_keyboard(teams)
+
+
+def run_webhook(bot):
+    """
+    Запуск бота в режиме webhook на отдельном ASGI сервере
+    
+    Args:
+        bot: Настроенный экземпляр бота
+    """
+    import uvicorn
+    from utils.webhook import create_webhook_app, setup_webhook
+    
+    setup_webhook(bot)
+    print(f"🌐 Webhook сервер: http://{config.WEBHOOK_HOST}:{config.WEBHOOK_PORT}{config.WEBHOOK_PATH}")
+    uvicorn.run(
+        create_webhook_app(bot),
+        host=config.WEBHOOK_HOST,
+        port=config.WEBHOOK_PORT
+    )
+
+
 def main():
     """
     Главная функция запуска бота
@@ -42,34 +117,65 @@ def main():
     print("🏒 Запуск бота хоккейной лиги Time of the Stars")
     print("=" * 50)
     
-    # Инициализация базы данных
-    print("\n📊 Инициализация базы данных...")
-    init_db()
+    profile_startup = '--profile-startup' in sys.argv
+    
+    # БД и снимок API прогреваются параллельно с созданием бота
+    print("\n📊 Инициализация базы данных и прогрев кэшей...")
+    warmup = startup_profiler.start_background({
+        'database': warm_database,
+        'api_snapshot': warm_api_snapshot,
+    })
     
     # Создание бота
     print("\n🤖 Создание бота...")
-    bot = create_bot()
+    with startup_profiler.phase('create_bot'):
+        bot = create_bot()
+    
+    # Без БД бот работать не может, снимок API догрузится в фоне
+    bot.last_update_id = warmup['database'].result()
+    
+    # Offset сохраняется до закрытия соединений с БД
+    register_shutdown_hook('update offset', update_tracker.save)
+    # Последний снимок статистики для админ-панели, тоже до закрытия БД
+    register_shutdown_hook('runtime stats', stats_exporter.stop)
+    register_shutdown_hook('database', close_db)
     
     # Запуск планировщика уведомлений
     print("\n⏰ Запуск планировщика уведомлений...")
     scheduler = NotificationScheduler(bot)
-    scheduler.start()
+    with startup_profiler.phase('scheduler'):
+        scheduler.start()
+    
+    # Статистика процесса бота публикуется в БД для админ-панели
+    stats_exporter.start()
+    
+    if profile_startup:
+        warmup['api_snapshot'].result()
+        print("\n" + startup_profiler.report())
     
     print("\n✅ Бот успешно запущен!")
     print("📱 Нажмите Ctrl+C для остановки\n")
     print("=" * 50)
     
-    # Запуск polling
+    # SIGTERM (остановка контейнера, деплой) завершает polling так же, как Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signum, frame: bot.stop_polling())
+    
     try:
-        bot.infinity_polling(timeout=10, long_polling_timeout=5)
+        if config.BOT_MODE == 'webhook':
+            # uvicorn сам обрабатывает Ctrl+C/SIGTERM и возвращает управление
+            run_webhook(bot)
+        else:
+            # Запуск polling; после остановки infinity_polling возвращает управление
+            bot.remove_webhook()
+            bot.infinity_polling(timeout=10, long_polling_timeout=5)
     except KeyboardInterrupt:
-        print("\n\n⛔ Остановка бота...")
-        scheduler.stop()
-        print("👋 До свидания!")
+        pass
     except Exception as e:
         print(f"\n❌ Ошибка при работе бота: {e}")
-        scheduler.stop()
         raise
+    finally:
+        graceful_shutdown(bot, scheduler, confirm_offset=config.BOT_MODE != 'webhook')
+        print("👋 До свидания!")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,169 @@
+"""
+Запуск бота на asyncio (AsyncTeleBot)
+
+Частые сценарии обслуживаются асинхронными обработчиками, остальные
+передаются синхронным обработчикам через пул потоков.
+Синхронный вариант запуска (bot.py) использует те же маршрутизатор,
+ограничение частоты и кэши пользователей, но выполняет все обработчики
+в пуле потоков с очередями по чатам.
+
+Как и в bot.py, повторные обновления отбрасываются, обработанный update_id
+сохраняется в БД и при запуске polling продолжает с него, а при остановке
+начатые обработки получают SHUTDOWN_TIMEOUT секунд на завершение.
+Работает только в режиме polling.
+"""
+import asyncio
+from typing import List
+from telebot.async_telebot import AsyncTeleBot
+from telebot.types import Update
+from config import config
+from database import init_db, close_async_db
+from handlers import register_team_handlers, register_player_handlers
+from handlers.async_handlers import register_async_handlers, register_sync_bridge, async_router
+from handlers.router import router
+from utils.async_api_service import async_api_service
+from utils.executor import OrderedTeleBot
+from utils.scheduler import NotificationScheduler
+from utils.stats_export import stats_exporter
+from utils.throttling import create_throttle_guard
+from utils.update_tracker import UpdateTracker, update_tracker
+from utils.user_context import notification_state
+
+
+class TrackedAsyncTeleBot(AsyncTeleBot):
+    """AsyncTeleBot с отбрасыванием повторных обновлений и учётом обработанных"""
+    
+    def __init__(self, token: str, update_tracker: UpdateTracker, **kwargs):
+        """
+        Args:
+            token: Токен бота
+            update_tracker: UpdateTracker для повторов и сохранения update_id
+        """
+        super().__init__(token, **kwargs)
+        self.update_tracker = update_tracker
+        self._batches = set()  # задачи обработки пачек обновлений
+    
+    async def process_new_updates(self, updates: List[Update]):
+        updates = self.update_tracker.filter(updates)
+        if not updates:
+            return
+        
+        task = asyncio.current_task()
+        self._batches.add(task)
+        try:
+            await super().process_new_updates(updates)
+        finally:
+            self._batches.discard(task)
+            # Раз в save_interval complete() пишет update_id в БД - не в event loop
+            await asyncio.to_thread(self.update_tracker.complete, [update.update_id for update in updates])
+    
+    async def drain(self, timeout: float) -> bool:
+        """
+        Ожидание начатых обработок обновлений
+        
+        Args:
+            timeout: Сколько секунд ждать
+        
+        Returns:
+            True, если все обработки завершились
+        """
+        batches = [task for task in self._batches if not task.done()]
+        if not batches:
+            return True
+        _, pending = await asyncio.wait(batches, timeout=timeout)
+        return not pending
+
+
+def create_async_bot():
+    """
+    Создание и настройка асинхронного бота
+    
+    Returns:
+        Кортеж (асинхронный бот, синхронный бот для совместимых обработчиков)
+    """
+    if not config.BOT_TOKEN:
+        raise ValueError("BOT_TOKEN не найден в .env файле!")
+    
+    bot = TrackedAsyncTeleBot(config.BOT_TOKEN, update_tracker)
+    
+    # Синхронный бот не опрашивает Telegram, он только выполняет старые обработчики
+    # (транзакция на обработчик, ответы после фиксации); очереди чатов ему не нужны
+    sync_bot = OrderedTeleBot(config.BOT_TOKEN, num_threads=1)
+    register_team_handlers(sync_bot)
+    register_player_handlers(sync_bot)
+    
+    # Ограничение частоты проверяется один раз, до передачи в синхронные обработчики
+    async_router.guard(create_throttle_guard(bot, router))
+    
+    # Асинхронные маршруты, остальное уходит через мост в синхронные обработчики
+    register_async_handlers(bot)
+    register_sync_bridge(bot, sync_bot)
+    async_router.attach(bot)
+    
+    return bot, sync_bot
+
+
+async def run(bot: AsyncTeleBot):
+    """
+    Запуск polling асинхронного бота
+    
+    Args:
+        bot: Асинхронный бот
+    """
+    # Продолжаем с последнего обработанного обновления
+    saved_update_id = await asyncio.to_thread(update_tracker.load)
+    if saved_update_id:
+        bot.offset = saved_update_id + 1
+    
+    try:
+        await bot.remove_webhook()
+        await bot.infinity_polling(timeout=10, request_timeout=30)
+    finally:
+        if not await bot.drain(config.SHUTDOWN_TIMEOUT):
+            print("⚠️ Не все обработчики успели завершиться")
+        await asyncio.to_thread(update_tracker.save)
+        await async_api_service.close()
+        await bot.close_session()
+        await close_async_db()
+
+
+def main():
+    """
+    Главная функция запуска асинхронного бота
+    """
+    print("=" * 50)
+    print("🏒 Запуск бота хоккейной лиги Time of the Stars (asyncio)")
+    print("=" * 50)
+    
+    print("\n📊 Инициализация базы данных...")
+    init_db()
+    notification_state.warm()
+    
+    print("\n🤖 Создание бота...")
+    bot, sync_bot = create_async_bot()
+    
+    # Планировщик работает в своём потоке и отправляет сообщения синхронным ботом
+    print("\n⏰ Запуск планировщика уведомлений...")
+    scheduler = NotificationScheduler(sync_bot)
+    scheduler.start()
+    
+    # Статистика процесса бота публикуется в БД для админ-панели
+    stats_exporter.start()
+    
+    print("\n✅ Бот успешно запущен!")
+    print("📱 Нажмите Ctrl+C для остановки\n")
+    print("=" * 50)
+    
+    try:
+        asyncio.run(run(bot))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("\n\n⛔ Остановка бота...")
+        scheduler.stop(timeout=config.SHUTDOWN_TIMEOUT)
+        stats_exporter.stop()
+        print("👋 До свидания!")
+
+
+if __name__ == '__main__':
+    main()
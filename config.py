@@ -19,6 +19,33 @@ class Config:
     
     # Database
     DATABASE_URL = os.getenv('DATABASE_URL')
+    # Реплика для аналитики и списков админ-панели (для файла SQLite не нужна)
+    DATABASE_READ_URL = os.getenv('DATABASE_READ_URL')
+    
+    # Пул соединений (бот и админ-панель держат каждый свой пул)
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))  # секунд ожидания свободного соединения
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))  # секунд до переоткрытия соединения
+    
+    # Настройки соединений SQLite
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000'))  # мс ожидания блокировки записи
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(64 * 1024 * 1024)))  # байт, 0 - без mmap
+    
+    # Миграции: размер пачки при заполнении данных и пауза между пачками (секунд)
+    MIGRATION_BATCH_SIZE = int(os.getenv('MIGRATION_BATCH_SIZE', '1000'))
+    MIGRATION_BATCH_PAUSE = float(os.getenv('MIGRATION_BATCH_PAUSE', '0.05'))
+    
+    # Архивация активности: сколько дней хранить в БД (0 - не архивировать), каталог архивов, размер пачки
+    ACTIVITY_RETENTION_DAYS = int(os.getenv('ACTIVITY_RETENTION_DAYS', '90'))
+    ACTIVITY_ARCHIVE_DIR = os.getenv('ACTIVITY_ARCHIVE_DIR', 'activity_archive')
+    ACTIVITY_RETENTION_BATCH_SIZE = int(os.getenv('ACTIVITY_RETENTION_BATCH_SIZE', '500'))
+    
+    # Статистика SQL: порог медленного запроса (мс, 0 - не писать в лог) и повторов запроса для N+1
+    SQL_SLOW_QUERY_MS = float(os.getenv('SQL_SLOW_QUERY_MS', '100'))
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv('SQL_N_PLUS_ONE_THRESHOLD', '5'))
     
     # SQLAdmin
     ADMIN_SECRET_KEY = os.getenv('ADMIN_SECRET_KEY')
@@ -28,6 +55,48 @@ class Config:
     
     # Уведомления
     NOTIFICATION_HOURS_BEFORE = int(os.getenv('NOTIFICATION_HOURS_BEFORE'))
+    
+    # Состояния пошаговых сценариев (регистрация, редактирование)
+    FSM_STORAGE = os.getenv('FSM_STORAGE', 'database')  # database или memory
+    FSM_STATE_TTL = int(os.getenv('FSM_STATE_TTL', '3600'))  # секунд без действий до сброса сценария
+    FSM_STATE_MAX_SIZE = int(os.getenv('FSM_STATE_MAX_SIZE', '10000'))
+    
+    # Количество потоков для обработчиков сообщений
+    WORKER_THREADS = int(os.getenv('WORKER_THREADS', '4'))
+    
+    # Количество блокировок пользователей (пользователи распределяются по ним по ID)
+    USER_LOCK_STRIPES = int(os.getenv('USER_LOCK_STRIPES', '64'))
+    
+    # Склейка сообщений обработчика в свой чат (отправка после успешного завершения)
+    OUTBOX_ENABLED = os.getenv('OUTBOX_ENABLED', 'true').lower() == 'true'
+    
+    # Сколько секунд при остановке ждать завершения обработчиков и рассылки
+    SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', '30'))
+    
+    # Защита от повторной обработки обновлений
+    UPDATE_DEDUP_SIZE = int(os.getenv('UPDATE_DEDUP_SIZE', '1000'))  # сколько update_id помнить
+    UPDATE_OFFSET_SAVE_INTERVAL = float(os.getenv('UPDATE_OFFSET_SAVE_INTERVAL', '5'))  # секунд
+    
+    # Как часто бот публикует статистику для админ-панели в другом процессе (секунд, 0 - не публиковать)
+    RUNTIME_STATS_EXPORT_INTERVAL = float(os.getenv('RUNTIME_STATS_EXPORT_INTERVAL', '30'))
+    
+    # Ограничение частоты сообщений от одного пользователя
+    THROTTLE_RATE = float(os.getenv('THROTTLE_RATE', '1'))  # сообщений в секунду
+    THROTTLE_BURST = int(os.getenv('THROTTLE_BURST', '5'))  # сообщений подряд
+    THROTTLE_DUPLICATE_WINDOW = float(os.getenv('THROTTLE_DUPLICATE_WINDOW', '1'))  # секунд
+    
+    # Время жизни кэша пользователей в памяти (секунды)
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '60'))
+    
+    # Режим получения обновлений: polling или webhook
+    BOT_MODE = os.getenv('BOT_MODE', 'polling')
+    
+    # Webhook
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL')  # Публичный адрес, например https://bot.example.com
+    WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram/webhook')
+    WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+    WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+    WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
 
 
 config = Config()
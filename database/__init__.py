@@ -1,7 +1,8 @@
 """
 Модуль для работы с базой данных
 """
-from .database import init_db, get_session
-from .models import User, Player, TeamApplication, GameNotification, Admin, UserActivity
+from .database import init_db, close_db, close_async_db, get_session, get_async_session, get_read_session, get_async_read_session, unit_of_work, defer_write, commit_unit
+from .upsert import upsert_user, upsert_user_async
+from .models import User, Player, TeamApplication, GameNotification, Admin, UserActivity, BotState, FsmState, SchemaMigration
 
-__all__ = ['init_db', 'get_session', 'User', 'Player', 'TeamApplication', 'GameNotification', 'Admin', 'UserActivity']
+__all__ = ['init_db', 'close_db', 'close_async_db', 'get_session', 'get_async_session', 'get_read_session', 'get_async_read_session', 'unit_of_work', 'defer_write', 'commit_unit', 'upsert_user', 'upsert_user_async', 'User', 'Player', 'TeamApplication', 'GameNotification', 'Admin', 'UserActivity', 'BotState', 'FsmState', 'SchemaMigration']
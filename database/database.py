@@ -1,22 +1,232 @@
 """
 Управление подключением к базе данных
 """
-from sqlalchemy import create_engine
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from config import config
 from .models import Base
 
 
+def is_sqlite_memory(url: str) -> bool:
+    """Проверка, что URL указывает на SQLite в памяти"""
+    database = make_url(url).database
+    return not database or database == ':memory:'
+
+
+def get_engine_options(url: str) -> dict:
+    """
+    Параметры движка и пула соединений из config
+    
+    Args:
+        url: URL базы данных
+        
+    Returns:
+        Именованные аргументы для create_engine / create_async_engine
+    """
+    options = {
+        'echo': False,  # Логирование SQL запросов (True для дебага)
+    }
+    
+    if url.startswith('sqlite+aiosqlite'):
+        if is_sqlite_memory(url):
+            return options
+        # По умолчанию aiosqlite открывает файл заново на каждый запрос (NullPool)
+        options['poolclass'] = AsyncAdaptedQueuePool
+    elif url.startswith('sqlite'):
+        options['connect_args'] = {'check_same_thread': False}
+        # SQLite в памяти живёт в одном соединении, пул для него не настраивается
+        if is_sqlite_memory(url):
+            return options
+    
+    options.update(
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+        pool_recycle=config.DB_POOL_RECYCLE,
+    )
+    return options
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Настройка каждого нового соединения SQLite
+    
+    WAL позволяет админ-панели читать, пока бот пишет активность,
+    busy_timeout заставляет писателя подождать блокировку вместо ошибки
+    "database is locked".
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT}")
+        cursor.execute(f"PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}")
+    finally:
+        cursor.close()
+
+
+def set_sqlite_read_pragmas(dbapi_connection, connection_record):
+    """
+    Настройка соединения SQLite только для чтения
+    
+    Режим журнала задаёт основной движок, query_only защищает от случайной записи.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT}")
+        cursor.execute(f"PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}")
+        cursor.execute("PRAGMA query_only=1")
+    finally:
+        cursor.close()
+
+
+def get_read_database_url(url: str) -> Optional[str]:
+    """
+    URL базы данных для тяжёлых запросов на чтение (аналитика, списки админки)
+    
+    Если задан DATABASE_READ_URL (реплика), используется он. Для файла SQLite
+    без реплики открывается тот же файл только для чтения: в режиме WAL
+    читатели не мешают боту писать.
+    
+    Args:
+        url: URL основной базы данных
+        
+    Returns:
+        URL для движка чтения или None, если читать нужно из основного движка
+    """
+    if config.DATABASE_READ_URL:
+        return config.DATABASE_READ_URL
+    if url.startswith('sqlite') and not is_sqlite_memory(url):
+        parsed = make_url(url)
+        return parsed.set(
+            database=f"file:{parsed.database}",
+            query={**parsed.query, 'mode': 'ro', 'uri': 'true'}
+        ).render_as_string(hide_password=False)
+    return None
+
+
+def create_read_engine(url: str, create=create_engine):
+    """
+    Создание движка только для чтения
+    
+    Args:
+        url: URL из get_read_database_url()
+        create: create_engine или create_async_engine
+    """
+    read_engine = create(url, **get_engine_options(url))
+    if read_engine.dialect.name == 'sqlite':
+        sync_engine = getattr(read_engine, 'sync_engine', read_engine)
+        if config.DATABASE_READ_URL:
+            event.listen(sync_engine, 'connect', set_sqlite_pragmas)
+        else:
+            event.listen(sync_engine, 'connect', set_sqlite_read_pragmas)
+    return read_engine
+
+
 # Создание движка базы данных
-engine = create_engine(
-    config.DATABASE_URL,
-    echo=False,  # Логирование SQL запросов (True для дебага)
-    connect_args={'check_same_thread': False} if 'sqlite' in config.DATABASE_URL else {}
-)
+engine = create_engine(config.DATABASE_URL, **get_engine_options(config.DATABASE_URL))
+if engine.dialect.name == 'sqlite':
+    event.listen(engine, 'connect', set_sqlite_pragmas)
 
 # Фабрика сессий
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Движок чтения для аналитики создаётся при первом запросе
+_read_engine = None
+_ReadSessionLocal = None
+
+# Асинхронный движок создаётся лениво: драйверы aiosqlite/asyncpg нужны только asyncio-рантайму
+_async_engine = None
+_AsyncSessionLocal = None
+_async_read_engine = None
+_AsyncReadSessionLocal = None
+
+
+def get_async_database_url(url: str) -> str:
+    """
+    Преобразование URL базы данных в URL с асинхронным драйвером
+    
+    Args:
+        url: Синхронный URL (sqlite:///..., postgresql://...)
+        
+    Returns:
+        URL для create_async_engine
+    """
+    if url.startswith('sqlite:'):
+        return url.replace('sqlite:', 'sqlite+aiosqlite:', 1)
+    if url.startswith('postgresql://') or url.startswith('postgres://'):
+        return 'postgresql+asyncpg://' + url.split('://', 1)[1]
+    return url
+
+
+def get_async_engine():
+    """
+    Получение асинхронного движка базы данных
+    """
+    global _async_engine, _AsyncSessionLocal
+    
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        
+        async_url = get_async_database_url(config.DATABASE_URL)
+        _async_engine = create_async_engine(async_url, **get_engine_options(async_url))
+        if _async_engine.dialect.name == 'sqlite':
+            event.listen(_async_engine.sync_engine, 'connect', set_sqlite_pragmas)
+        _AsyncSessionLocal = async_sessionmaker(
+            bind=_async_engine,
+            autoflush=False,
+            expire_on_commit=False
+        )
+    
+    return _async_engine
+
+
+def get_read_engine():
+    """
+    Движок для тяжёлых запросов на чтение (метрики, аналитика)
+    
+    Без реплики и для SQLite в памяти возвращается основной движок.
+    """
+    global _read_engine, _ReadSessionLocal
+    
+    if _read_engine is None:
+        read_url = get_read_database_url(config.DATABASE_URL)
+        _read_engine = create_read_engine(read_url) if read_url else engine
+        _ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=_read_engine)
+    
+    return _read_engine
+
+
+def get_async_read_engine():
+    """
+    Асинхронный движок для тяжёлых запросов на чтение (админ-панель)
+    
+    Без реплики и для SQLite в памяти возвращается основной асинхронный движок.
+    """
+    global _async_read_engine, _AsyncReadSessionLocal
+    
+    if _async_read_engine is None:
+        read_url = get_read_database_url(config.DATABASE_URL)
+        if read_url:
+            from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+            
+            _async_read_engine = create_read_engine(get_async_database_url(read_url), create_async_engine)
+            _AsyncReadSessionLocal = async_sessionmaker(
+                bind=_async_read_engine,
+                autoflush=False,
+                expire_on_commit=False
+            )
+        else:
+            _async_read_engine = get_async_engine()
+            _AsyncReadSessionLocal = _AsyncSessionLocal
+    
+    return _async_read_engine
+
 
 def init_db():
     """
@@ -26,10 +236,160 @@ def init_db():
     print("✅ База данных инициализирована")
 
 
+def close_db():
+    """
+    Закрытие всех соединений пула (при остановке бота)
+    """
+    if _read_engine is not None and _read_engine is not engine:
+        _read_engine.dispose()
+    engine.dispose()
+    print("✅ Соединения с базой данных закрыты")
+
+
+async def close_async_db():
+    """
+    Закрытие соединений асинхронного движка (при остановке asyncio-рантайма)
+    
+    Соединения aiosqlite держат собственные потоки: без закрытия
+    процесс не завершится.
+    """
+    global _async_engine, _AsyncSessionLocal, _async_read_engine, _AsyncReadSessionLocal
+    
+    if _async_read_engine is not None and _async_read_engine is not _async_engine:
+        await _async_read_engine.dispose()
+    _async_read_engine = None
+    _AsyncReadSessionLocal = None
+    
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _AsyncSessionLocal = None
+
+
+# Единица работы текущего потока (обработка одного обновления или запуск задачи)
+_unit_of_work = threading.local()
+
+
+class UnitSession:
+    """
+    Сессия единицы работы для кода, написанного под отдельные сессии
+    
+    commit() только отправляет изменения в БД (flush): фиксация одна,
+    в конце единицы работы. rollback() откатывает всю единицу работы,
+    close() ничего не делает: сессия закрывается в конце единицы работы.
+    """
+    
+    def __init__(self, session: Session):
+        self._session = session
+    
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+    
+    def commit(self):
+        self._session.flush()
+    
+    def rollback(self):
+        self._session.rollback()
+    
+    def close(self):
+        pass
+
+
+@contextmanager
+def unit_of_work():
+    """
+    Единица работы: одна сессия на обновление или задачу
+    
+    Все вызовы get_session() внутри блока (обработчик, контекст пользователя)
+    работают в этой сессии и одном соединении пула. В конце блока выполняются
+    отложенные записи (метрики) и всё фиксируется одним commit, при исключении -
+    откат. Вложенный unit_of_work() присоединяется к внешнему.
+    
+    Транзакция записи открывается при первом изменении и держит блокировку
+    SQLite до конца блока. Обработчик, который после записи обращается к API,
+    фиксирует изменения заранее через commit_unit().
+    
+    Использование:
+    ```python
+    with unit_of_work() as session:
+        session.add(obj)
+        handler(message)
+    ```
+    """
+    session = getattr(_unit_of_work, 'session', None)
+    if session is not None:
+        yield session
+        return
+    
+    session = SessionLocal()
+    _unit_of_work.session = session
+    _unit_of_work.deferred_writes = []
+    try:
+        yield session
+        for write in _unit_of_work.deferred_writes:
+            try:
+                write(session)
+            except Exception as e:
+                print(f"❌ Ошибка отложенной записи в БД: {e}")
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        _unit_of_work.session = None
+        _unit_of_work.deferred_writes = None
+        session.close()
+
+
+def defer_write(write: Callable[[Session], None]):
+    """
+    Запись в БД в конце единицы работы, перед её фиксацией
+    
+    Для метрик и журналов активности: запись входит в ту же транзакцию,
+    что и изменения обработчика, но не открывает транзакцию записи раньше
+    времени (пока обработчик ждёт API). Запись должна выполняться запросами
+    session.execute(), а не session.add(): ошибка в ней не откатывает
+    изменения обработчика. Вне unit_of_work() запись выполняется сразу
+    в отдельной сессии.
+    
+    Args:
+        write: Функция write(session)
+    """
+    writes = getattr(_unit_of_work, 'deferred_writes', None)
+    if writes is not None:
+        writes.append(write)
+        return
+    
+    session = SessionLocal()
+    try:
+        write(session)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def commit_unit():
+    """
+    Досрочная фиксация изменений единицы работы
+    
+    Для обработчиков, которые после записи обращаются к API: транзакция
+    записи SQLite не должна оставаться открытой во время сетевого запроса,
+    иначе другие чаты ждут блокировку. Вне unit_of_work() ничего не делает.
+    """
+    session = getattr(_unit_of_work, 'session', None)
+    if session is not None:
+        session.commit()
+
+
 def get_session() -> Session:
     """
     Получение сессии базы данных
     
+    Внутри unit_of_work() возвращается сессия единицы работы.
+    
     Использование:
     ```python
     session = get_session()
@@ -43,9 +403,52 @@ def get_session() -> Session:
         session.close()
     ```
     """
+    session = getattr(_unit_of_work, 'session', None)
+    if session is not None:
+        return UnitSession(session)
     return SessionLocal()
 
 
+def get_async_session():
+    """
+    Получение асинхронной сессии базы данных
+    
+    Использование:
+    ```python
+    async with get_async_session() as session:
+        result = await session.execute(select(User))
+        await session.commit()
+    ```
+    """
+    get_async_engine()
+    return _AsyncSessionLocal()
+
+
+def get_read_session() -> Session:
+    """
+    Сессия для тяжёлых запросов на чтение (метрики, аналитика)
+    
+    Работает через движок чтения, поэтому не занимает соединения бота
+    и не видит незафиксированные изменения текущей единицы работы.
+    """
+    get_read_engine()
+    return _ReadSessionLocal()
+
+
+def get_async_read_session():
+    """
+    Асинхронная сессия для тяжёлых запросов на чтение (метрики и списки админки)
+    
+    Использование:
+    ```python
+    async with get_async_read_session() as session:
+        result = await session.execute(select(func.count(User.id)))
+    ```
+    """
+    get_async_read_engine()
+    return _AsyncReadSessionLocal()
+
+
 def get_db():
     """
     Генератор сессии для использования в контекстном менеджере
@@ -0,0 +1,162 @@
+"""
+Скрипт миграции индексов под частые запросы
+
+Применяет миграции (индексы создаются версией 4 в database/migrations.py),
+обновляет статистику планировщика и проверяет через EXPLAIN, что частые
+запросы используют нужные индексы.
+"""
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Добавляем родительскую директорию в путь для импорта
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import text, select, func
+from database.database import engine
+from database.migrations import run_migrations
+from database.models import User, Player, TeamApplication, UserActivity
+
+
+def analyze():
+    """Обновление статистики планировщика запросов"""
+    print("\n📈 Обновление статистики (ANALYZE)...")
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    print("  ✅ Статистика обновлена")
+
+
+def get_query_plan_checks():
+    """
+    Частые запросы и индексы, которые они должны использовать
+    
+    Returns:
+        Список (описание, запрос, имя индекса)
+    """
+    cutoff = datetime.utcnow() - timedelta(days=7)
+    
+    return [
+        (
+            "Активные пользователи",
+            select(func.count(User.id)).where(User.last_activity >= cutoff),
+            'ix_users_last_activity'
+        ),
+        (
+            "Новые пользователи",
+            select(func.count(User.id)).where(User.created_at >= cutoff),
+            'ix_users_created_at_last_activity'
+        ),
+        (
+            "Удержание",
+            select(func.count(User.id)).where(User.created_at < cutoff, User.last_activity >= cutoff),
+            'ix_users_created_at_last_activity'
+        ),
+        (
+            "Подписчики для рассылки",
+            select(User).where(User.notifications_enabled == True),
+            'ix_users_subscribers'
+        ),
+        (
+            "Топ действий",
+            select(UserActivity.action, func.count(UserActivity.id))
+            .where(UserActivity.timestamp >= cutoff)
+            .group_by(UserActivity.action),
+            'ix_user_activity_timestamp_action'
+        ),
+        (
+            "Количество взаимодействий",
+            select(func.count(UserActivity.id)).where(UserActivity.timestamp >= cutoff),
+            'ix_user_activity_timestamp_action'
+        ),
+        (
+            "Анкеты пользователя",
+            select(Player).where(Player.telegram_id == 1).order_by(Player.created_at),
+            'ix_players_telegram_id_created_at'
+        ),
+        (
+            "Заявки пользователя",
+            select(TeamApplication).where(TeamApplication.telegram_id == 1).order_by(TeamApplication.created_at),
+            'ix_team_applications_telegram_id_created_at'
+        ),
+    ]
+
+
+def explain(conn, statement) -> str:
+    """
+    План выполнения запроса
+    
+    Args:
+        conn: Соединение
+        statement: Запрос SQLAlchemy
+    
+    Returns:
+        План в виде текста
+    """
+    compiled = statement.compile(dialect=engine.dialect)
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == 'sqlite' else "EXPLAIN "
+    rows = conn.exec_driver_sql(prefix + str(compiled), params).fetchall()
+    return "\n".join(" ".join(str(value) for value in row) for row in rows)
+
+
+def verify_query_plans():
+    """
+    Проверка через EXPLAIN, что частые запросы используют индексы
+    
+    Returns:
+        True, если все запросы используют ожидаемые индексы
+    """
+    print("\n✓ Проверка планов запросов...")
+    ok = True
+    
+    with engine.connect() as conn:
+        for description, statement, index_name in get_query_plan_checks():
+            plan = explain(conn, statement)
+            if index_name in plan:
+                print(f"  ✅ {description}: {index_name}")
+            else:
+                ok = False
+                print(f"  ❌ {description}: ожидался {index_name}, план:")
+                for line in plan.splitlines():
+                    print(f"       {line}")
+    
+    return ok
+
+
+def main():
+    """Главная функция миграции"""
+    print("=" * 60)
+    print("🔄 Миграция индексов базы данных")
+    print("=" * 60)
+    print()
+    
+    try:
+        if not run_migrations():
+            return False
+        analyze()
+        ok = verify_query_plans()
+        
+        print("\n" + "=" * 60)
+        if ok:
+            print("✅ Миграция завершена успешно!")
+        else:
+            print("⚠️ Индексы созданы, но некоторые запросы их не используют")
+        print("=" * 60)
+        return ok
+    except Exception as e:
+        print("\n" + "=" * 60)
+        print("❌ Ошибка при миграции!")
+        print("=" * 60)
+        print(f"\n{e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == '__main__':
+    success = main()
+    sys.exit(0 if success else 1)
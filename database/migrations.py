@@ -0,0 +1,325 @@
+"""
+Версионные миграции базы данных
+
+Каждая миграция имеет номер версии и применяется один раз: применённые
+версии записываются в таблицу schema_migrations. Шаги миграций
+идемпотентны (проверяют, есть ли уже колонка или индекс), поэтому
+на новой БД, созданной по моделям, они просто отмечаются как применённые.
+
+Заполнение данных (backfill) идёт короткими транзакциями по пачкам
+первичного ключа: таблица не блокируется надолго, бот продолжает писать
+во время миграции, прерванное заполнение продолжается с места остановки.
+
+Использование:
+    python database/migrations.py           # применить новые миграции
+    python database/migrations.py status    # применённые и ожидающие версии
+"""
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+# Добавляем родительскую директорию в путь для импорта
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import Index, inspect, text
+from sqlalchemy.schema import CreateIndex
+from config import config
+from database.database import engine, init_db
+from database.models import Player, SchemaMigration, TeamApplication, User, UserActivity
+
+
+# Зарегистрированные миграции: [(версия, имя, функция)]
+MIGRATIONS: List[Tuple[int, str, Callable]] = []
+
+# Одиночные индексы, которые заменены составными (имя -> таблица)
+OBSOLETE_INDEXES = {
+    'ix_players_telegram_id': 'players',
+    'ix_team_applications_telegram_id': 'team_applications',
+    'ix_user_activity_telegram_id': 'user_activity',
+    'ix_user_activity_action': 'user_activity',
+    'ix_user_activity_timestamp': 'user_activity',
+}
+
+
+def migration(version: int, name: str):
+    """
+    Регистрация миграции
+    
+    Args:
+        version: Номер версии (миграции применяются по возрастанию)
+        name: Короткое имя для журнала
+    """
+    def decorator(func: Callable):
+        MIGRATIONS.append((version, name, func))
+        return func
+    return decorator
+
+
+class MigrationContext:
+    """Операции над схемой и данными, безопасные для повторного запуска"""
+    
+    def __init__(self, engine, batch_size: int, batch_pause: float):
+        """
+        Args:
+            engine: Движок БД
+            batch_size: Сколько строк обновлять в одной транзакции
+            batch_pause: Пауза между пачками (секунды), чтобы не мешать боту
+        """
+        self.engine = engine
+        self.dialect = engine.dialect.name
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+    
+    def column_exists(self, table: str, column: str) -> bool:
+        """Проверка, есть ли колонка в таблице"""
+        return any(col['name'] == column for col in inspect(self.engine).get_columns(table))
+    
+    def index_exists(self, table: str, index_name: str) -> bool:
+        """Проверка, есть ли индекс у таблицы"""
+        return any(index['name'] == index_name for index in inspect(self.engine).get_indexes(table))
+    
+    def add_column(self, table: str, column: str, ddl: str):
+        """
+        Добавление колонки, если её ещё нет
+        
+        Args:
+            table: Таблица
+            column: Имя колонки
+            ddl: Тип и ограничения (например, "INTEGER DEFAULT 0")
+        """
+        if self.column_exists(table, column):
+            print(f"  ℹ️ Поле {table}.{column} уже существует")
+            return
+        with self.engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+        print(f"  ✅ Добавлено поле: {table}.{column}")
+    
+    def create_index(self, index: Index):
+        """
+        Построение индекса без долгой блокировки записи
+        
+        PostgreSQL строит индекс CONCURRENTLY (вне транзакции), MySQL -
+        с LOCK=NONE. SQLite так не умеет: индекс строится одной короткой
+        транзакцией, в режиме WAL чтение при этом не блокируется.
+        
+        Args:
+            index: Индекс из моделей
+        """
+        table = index.table.name
+        if self.index_exists(table, index.name):
+            print(f"  ℹ️ Индекс {index.name} уже существует")
+            return
+        
+        ddl = str(CreateIndex(index).compile(dialect=self.engine.dialect))
+        started_at = time.monotonic()
+        
+        if self.dialect == 'postgresql':
+            ddl = ddl.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+            with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                conn.execute(text(ddl))
+        else:
+            if self.dialect == 'mysql':
+                ddl += " ALGORITHM=INPLACE LOCK=NONE"
+            with self.engine.begin() as conn:
+                conn.execute(text(ddl))
+        
+        print(f"  ✅ Создан индекс: {index.name} ({time.monotonic() - started_at:.1f} с)")
+    
+    def drop_index(self, table: str, index_name: str):
+        """Удаление индекса, если он есть"""
+        if not self.index_exists(table, index_name):
+            return
+        with self.engine.begin() as conn:
+            if self.dialect == 'mysql':
+                conn.execute(text(f"DROP INDEX {index_name} ON {table}"))
+            else:
+                conn.execute(text(f"DROP INDEX {index_name}"))
+        print(f"  ✅ Удалён индекс: {index_name}")
+    
+    def backfill(self, table: str, assignments: str, where: str, params: Optional[dict] = None, key: str = 'id') -> int:
+        """
+        Заполнение данных пачками по первичному ключу
+        
+        Каждая пачка - отдельная короткая транзакция. Условие where должно
+        отбирать только ещё не заполненные строки: тогда повторный запуск
+        продолжит с того места, где заполнение прервалось.
+        
+        Args:
+            table: Таблица
+            assignments: SET-часть UPDATE (например, "last_activity = :now")
+            where: Условие для строк, которые нужно заполнить
+            params: Параметры для assignments и where
+            key: Целочисленный первичный ключ
+        
+        Returns:
+            Количество обновлённых строк
+        """
+        params = dict(params or {})
+        with self.engine.connect() as conn:
+            total = conn.execute(text(f"SELECT COUNT(*) FROM {table} WHERE {where}"), params).scalar()
+        
+        if not total:
+            print(f"  ℹ️ {table}: заполнять нечего")
+            return 0
+        
+        done = 0
+        last_key = None
+        while True:
+            with self.engine.begin() as conn:
+                key_filter = f"{key} > :last_key AND " if last_key is not None else ""
+                keys = conn.execute(
+                    text(f"SELECT {key} FROM {table} WHERE {key_filter}({where}) ORDER BY {key} LIMIT :batch_size"),
+                    {**params, 'last_key': last_key, 'batch_size': self.batch_size}
+                ).scalars().all()
+                if not keys:
+                    break
+                
+                conn.execute(
+                    text(f"UPDATE {table} SET {assignments} WHERE {key} >= :first_key AND {key} <= :last_key AND ({where})"),
+                    {**params, 'first_key': keys[0], 'last_key': keys[-1]}
+                )
+            
+            last_key = keys[-1]
+            done += len(keys)
+            print(f"  ⏳ {table}: {done}/{total} ({done * 100 // total}%)")
+            if len(keys) < self.batch_size:
+                break
+            time.sleep(self.batch_pause)
+        
+        print(f"  ✅ {table}: заполнено строк: {done}")
+        return done
+
+
+@migration(1, 'admins_role')
+def add_admin_role(ctx: MigrationContext):
+    """Роль администратора (бывший migrate_db.py)"""
+    ctx.add_column('admins', 'role', "VARCHAR(50) DEFAULT 'manager'")
+    # Администраторы, созданные до появления ролей, получают полные права
+    ctx.backfill('admins', "role = 'admin'", "role IS NULL OR role = ''")
+
+
+@migration(2, 'users_metrics')
+def add_user_metrics(ctx: MigrationContext):
+    """Поля метрик пользователя (бывший migrate_metrics.py)"""
+    ctx.add_column('users', 'username', "VARCHAR(255)")
+    ctx.add_column('users', 'first_name', "VARCHAR(255)")
+    ctx.add_column('users', 'last_name', "VARCHAR(255)")
+    # В SQLite нельзя добавить колонку с неконстантным DEFAULT, время заполняется отдельно
+    ctx.add_column('users', 'last_activity', "DATETIME")
+    ctx.add_column('users', 'total_interactions', "INTEGER DEFAULT 0")
+    
+    ctx.backfill('users', "last_activity = :now", "last_activity IS NULL", {'now': datetime.utcnow()})
+
+
+@migration(3, 'users_total_interactions')
+def backfill_total_interactions(ctx: MigrationContext):
+    """Счётчик взаимодействий по уже записанной активности"""
+    ctx.backfill(
+        'users',
+        "total_interactions = (SELECT COUNT(*) FROM user_activity WHERE user_activity.telegram_id = users.telegram_id)",
+        "(total_interactions IS NULL OR total_interactions = 0) "
+        "AND EXISTS (SELECT 1 FROM user_activity WHERE user_activity.telegram_id = users.telegram_id)"
+    )
+
+
+@migration(4, 'hot_query_indexes')
+def create_hot_query_indexes(ctx: MigrationContext):
+    """Индексы под аналитику, рассылку и списки анкет"""
+    for model in (User, UserActivity, Player, TeamApplication):
+        for index in sorted(model.__table__.indexes, key=lambda index: index.name):
+            ctx.create_index(index)
+    
+    for index_name, table in OBSOLETE_INDEXES.items():
+        ctx.drop_index(table, index_name)
+
+
+def get_applied_versions() -> dict:
+    """
+    Применённые миграции
+    
+    Returns:
+        {версия: время применения}
+    """
+    SchemaMigration.__table__.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT version, applied_at FROM schema_migrations")).all()
+    return {version: applied_at for version, applied_at in rows}
+
+
+def run_migrations(target: Optional[int] = None) -> bool:
+    """
+    Применение ожидающих миграций по возрастанию версии
+    
+    Args:
+        target: Применить миграции только до этой версии включительно
+    
+    Returns:
+        True, если все миграции применены без ошибок
+    """
+    # Недостающие таблицы создаются сразу по моделям
+    init_db()
+    applied = get_applied_versions()
+    ctx = MigrationContext(engine, config.MIGRATION_BATCH_SIZE, config.MIGRATION_BATCH_PAUSE)
+    
+    pending = [
+        (version, name, func) for version, name, func in sorted(MIGRATIONS, key=lambda item: item[0])
+        if version not in applied and (target is None or version <= target)
+    ]
+    if not pending:
+        print("✅ Все миграции уже применены")
+        return True
+    
+    for version, name, func in pending:
+        print(f"\n🔄 Миграция {version}: {name}")
+        started_at = time.monotonic()
+        try:
+            func(ctx)
+        except Exception as e:
+            print(f"❌ Ошибка в миграции {version} ({name}): {e}")
+            return False
+        
+        with engine.begin() as conn:
+            conn.execute(SchemaMigration.__table__.insert().values(
+                version=version,
+                name=name,
+                applied_at=datetime.utcnow(),
+                duration_ms=int((time.monotonic() - started_at) * 1000)
+            ))
+        print(f"✅ Миграция {version} применена")
+    
+    return True
+
+
+def print_status():
+    """Вывод применённых и ожидающих миграций"""
+    init_db()
+    applied = get_applied_versions()
+    for version, name, _ in sorted(MIGRATIONS, key=lambda item: item[0]):
+        if version in applied:
+            print(f"  ✅ {version:>3} {name} ({applied[version]})")
+        else:
+            print(f"  ⏳ {version:>3} {name}")
+
+
+def main():
+    """Главная функция"""
+    print("=" * 60)
+    print("🔄 Миграции базы данных")
+    print("=" * 60)
+    
+    if len(sys.argv) > 1 and sys.argv[1] == 'status':
+        print_status()
+        return True
+    
+    success = run_migrations()
+    print("\n" + "=" * 60)
+    print("✅ Миграция завершена успешно!" if success else "❌ Ошибка при миграции!")
+    print("=" * 60)
+    return success
+
+
+if __name__ == '__main__':
+    success = main()
+    sys.exit(0 if success else 1)
@@ -1,8 +1,12 @@
 """
 Модели базы данных для хоккейной лиги
+
+Индексы под частые запросы (аналитика, рассылка, списки анкет пользователя)
+описаны в __table_args__; в существующую БД их добавляет
+database/migrate_indexes.py.
 """
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, BigInteger, Boolean, DateTime, Text
+from sqlalchemy import Column, Integer, String, BigInteger, Boolean, DateTime, Text, Index, text
 from sqlalchemy.orm import declarative_base
 import hashlib
 
@@ -23,6 +27,19 @@ class User(Base):
     last_activity = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Последняя активность
     total_interactions = Column(Integer, default=0)  # Общее количество взаимодействий
     
+    __table_args__ = (
+        # Активные пользователи за период
+        Index('ix_users_last_activity', 'last_activity'),
+        # Новые пользователи за период и удержание (created_at < X and last_activity >= X)
+        Index('ix_users_created_at_last_activity', 'created_at', 'last_activity'),
+        # Подписчики для рассылки: частичный индекс только по включившим уведомления
+        Index(
+            'ix_users_subscribers', 'telegram_id',
+            sqlite_where=text('notifications_enabled = 1'),
+            postgresql_where=text('notifications_enabled'),
+        ),
+    )
+    
     def __repr__(self):
         return f"<User {self.telegram_id}>"
     
@@ -35,7 +52,7 @@ class Player(Base):
     __tablename__ = 'players'
     
     id = Column(Integer, primary_key=True)
-    telegram_id = Column(BigInteger, nullable=False, index=True)
+    telegram_id = Column(BigInteger, nullable=False)
     username = Column(String(255), nullable=True)
     full_name = Column(String(255), nullable=False)
     birth_year = Column(Integer, nullable=True)
@@ -46,6 +63,11 @@ class Player(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        # Анкеты пользователя в порядке создания ("Мои анкеты")
+        Index('ix_players_telegram_id_created_at', 'telegram_id', 'created_at'),
+    )
+    
     def __repr__(self):
         return f"<Player {self.full_name} (@{self.username})>"
     
@@ -59,7 +81,7 @@ class TeamApplication(Base):
     __tablename__ = 'team_applications'
     
     id = Column(Integer, primary_key=True)
-    telegram_id = Column(BigInteger, nullable=False, index=True)  # ID подавшего заявку
+    telegram_id = Column(BigInteger, nullable=False)  # ID подавшего заявку
     team_name = Column(String(255), nullable=False)
     captain_name = Column(String(255), nullable=False)
     captain_phone = Column(String(20), nullable=False)
@@ -69,6 +91,11 @@ class TeamApplication(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     admin_comment = Column(Text, nullable=True)  # Комментарий администратора
     
+    __table_args__ = (
+        # Заявки пользователя в порядке создания ("Мои заявки")
+        Index('ix_team_applications_telegram_id_created_at', 'telegram_id', 'created_at'),
+    )
+    
     def __repr__(self):
         return f"<TeamApplication {self.team_name} ({self.status})>"
     
@@ -133,14 +160,65 @@ class UserActivity(Base):
     __tablename__ = 'user_activity'
     
     id = Column(Integer, primary_key=True)
-    telegram_id = Column(BigInteger, nullable=False, index=True)
+    telegram_id = Column(BigInteger, nullable=False)
     username = Column(String(255), nullable=True)
-    action = Column(String(100), nullable=False, index=True)  # Тип действия
+    action = Column(String(100), nullable=False)  # Тип действия
     details = Column(Text, nullable=True)  # Дополнительная информация
-    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    timestamp = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # Топ действий за период: диапазон по времени и группировка без чтения таблицы
+        Index('ix_user_activity_timestamp_action', 'timestamp', 'action'),
+        # История действий пользователя
+        Index('ix_user_activity_telegram_id_timestamp', 'telegram_id', 'timestamp'),
+    )
     
     def __repr__(self):
         return f"<UserActivity {self.telegram_id} - {self.action} at {self.timestamp}>"
     
     def __str__(self):
         return f"{self.telegram_id}: {self.action}"
+
+
+class BotState(Base):
+    """Служебное состояние бота (ключ - значение), например offset обновлений"""
+    __tablename__ = 'bot_state'
+    
+    key = Column(String(100), primary_key=True)
+    value = Column(Text, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<BotState {self.key}={self.value}>"
+
+
+class FsmState(Base):
+    """Состояния незавершённых сценариев (utils/state_store.py)"""
+    __tablename__ = 'fsm_state'
+    
+    # Первичный ключ (key, store): состояния пользователя во всех хранилищах читаются одним запросом
+    key = Column(BigInteger, primary_key=True)  # Telegram ID пользователя
+    store = Column(String(50), primary_key=True)  # Имя хранилища (сценария)
+    value = Column(Text, nullable=False)  # Состояние в JSON
+    expires_at = Column(DateTime, nullable=False)  # После этого момента (UTC) сценарий сброшен
+    
+    __table_args__ = (
+        # Очистка истёкших и вытеснение самых старых записей хранилища
+        Index('ix_fsm_state_store_expires_at', 'store', 'expires_at'),
+    )
+    
+    def __repr__(self):
+        return f"<FsmState {self.store}:{self.key}>"
+
+
+class SchemaMigration(Base):
+    """Применённые версии миграций (database/migrations.py)"""
+    __tablename__ = 'schema_migrations'
+    
+    version = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+    duration_ms = Column(Integer, nullable=True)
+    
+    def __repr__(self):
+        return f"<SchemaMigration {self.version} {self.name}>"
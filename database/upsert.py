@@ -0,0 +1,109 @@
+"""
+Регистрация пользователя по /start одним запросом
+
+INSERT ... ON CONFLICT (telegram_id) DO UPDATE создаёт пользователя или
+обновляет его данные, счётчик взаимодействий и время активности.
+Одновременные /start одного пользователя не упираются в уникальный индекс.
+"""
+from datetime import datetime
+from typing import Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from .models import User
+
+
+_INSERTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+    'mysql': mysql.insert,
+}
+
+
+def build_user_upsert(dialect_name: str, telegram_id: int, username: Optional[str],
+                      first_name: Optional[str], last_name: Optional[str]):
+    """
+    Запрос регистрации пользователя для диалекта БД
+    
+    Args:
+        dialect_name: Имя диалекта (sqlite, postgresql, mysql)
+        telegram_id: ID пользователя в Telegram
+        username: Username пользователя
+        first_name: Имя пользователя
+        last_name: Фамилия пользователя
+    
+    Returns:
+        Запрос; для sqlite и postgresql он возвращает id и notifications_enabled
+    """
+    insert = _INSERTS.get(dialect_name)
+    if insert is None:
+        raise ValueError(f"Upsert пользователя не поддерживается для {dialect_name}")
+    
+    now = datetime.utcnow()
+    changes = {
+        'username': username,
+        'first_name': first_name,
+        'last_name': last_name,
+        'last_activity': now,
+    }
+    statement = insert(User).values(
+        telegram_id=telegram_id,
+        notifications_enabled=False,
+        created_at=now,
+        total_interactions=1,
+        **changes
+    )
+    
+    if dialect_name == 'mysql':
+        return statement.on_duplicate_key_update(
+            total_interactions=User.total_interactions + 1,
+            **changes
+        )
+    
+    return statement.on_conflict_do_update(
+        index_elements=[User.telegram_id],
+        set_={'total_interactions': User.total_interactions + 1, **changes}
+    ).returning(User.id, User.notifications_enabled)
+
+
+def upsert_user(session, telegram_id: int, username: Optional[str],
+                first_name: Optional[str], last_name: Optional[str]) -> Tuple[int, bool]:
+    """
+    Создание или обновление пользователя по /start
+    
+    Args:
+        session: Сессия БД
+        telegram_id: ID пользователя в Telegram
+        username: Username пользователя
+        first_name: Имя пользователя
+        last_name: Фамилия пользователя
+    
+    Returns:
+        (id пользователя в БД, включены ли у пользователя уведомления)
+    """
+    dialect_name = session.get_bind().dialect.name
+    statement = build_user_upsert(dialect_name, telegram_id, username, first_name, last_name)
+    result = session.execute(statement)
+    
+    # MySQL не поддерживает RETURNING
+    if dialect_name == 'mysql':
+        result = session.execute(select(User.id, User.notifications_enabled).filter_by(telegram_id=telegram_id))
+    user_id, notifications_enabled = result.one()
+    return user_id, bool(notifications_enabled)
+
+
+async def upsert_user_async(session, telegram_id: int, username: Optional[str],
+                            first_name: Optional[str], last_name: Optional[str]) -> Tuple[int, bool]:
+    """
+    Создание или обновление пользователя по /start для asyncio-рантайма
+    
+    Returns:
+        (id пользователя в БД, включены ли у пользователя уведомления)
+    """
+    dialect_name = session.get_bind().dialect.name
+    statement = build_user_upsert(dialect_name, telegram_id, username, first_name, last_name)
+    result = await session.execute(statement)
+    
+    if dialect_name == 'mysql':
+        result = await session.execute(select(User.id, User.notifications_enabled).filter_by(telegram_id=telegram_id))
+    user_id, notifications_enabled = result.one()
+    return user_id, bool(notifications_enabled)
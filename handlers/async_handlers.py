@@ -0,0 +1,268 @@
+"""
+Асинхронные обработчики для рантайма на AsyncTeleBot
+
+Здесь собраны самые частые сценарии (/start, главное меню, раздел матчей),
+которые работают с БД и API лиги без блокировки потоков.
+"""
+import asyncio
+from sqlalchemy import update
+from telebot.async_telebot import AsyncTeleBot
+from telebot.asyncio_helper import ApiTelegramException
+from telebot.types import Message, CallbackQuery
+from database import get_async_session, upsert_user_async, User
+from keyboards.reply_keyboards import get_main_menu, get_back_to_menu, get_matches_menu
+from utils.async_api_service import async_api_service
+from utils.executor import get_chat_key
+from utils.metrics import metrics_service
+from utils.user_context import (
+    UserContext,
+    attach_user_context_async,
+    get_notifications_enabled_async,
+    notification_state,
+    user_cache
+)
+from keyboards.inline_keyboards import MATCHES_PAGE_PREFIX, parse_matches_page
+from .notifications import STATIC_REPLIES, MATCHES_FIRST_OFFSET, build_matches_page
+from .router import Router, router
+from utils.runtime_stats import register_stats_provider
+from utils.user_locks import async_user_locks
+
+
+USER_NOT_FOUND_TEXT = "⚠️ Ошибка: пользователь не найден. Попробуйте /start"
+
+# Маршрутизатор асинхронных обработчиков
+async_router = Router(user_lock=async_user_locks)
+async_router.middleware(attach_user_context_async)
+register_stats_provider('async_routes', async_router.get_hit_counts)
+register_stats_provider('async_user_locks', async_user_locks.get_stats)
+
+
+def register_async_handlers(bot: AsyncTeleBot):
+    """Регистрация асинхронных обработчиков"""
+    
+    # Контекст пользователя строится из результата upsert, отдельный SELECT не нужен
+    @async_router.command('start', skip_middlewares=True)
+    async def start_command(message: Message):
+        """Обработка команды /start"""
+        user_id = message.from_user.id
+        username = message.from_user.username
+        first_name = message.from_user.first_name
+        last_name = message.from_user.last_name
+        
+        # Создание/обновление пользователя и его счётчика активности одним запросом
+        async with get_async_session() as session:
+            try:
+                db_id, notifications_enabled = await upsert_user_async(session, user_id, username, first_name, last_name)
+                await session.commit()
+                message.user_context = UserContext(db_id, user_id, username, notifications_enabled)
+                user_cache.put(message.user_context)
+                notification_state.set(user_id, notifications_enabled)
+                
+                # Логируем активность (счётчик пользователя уже обновлён upsert)
+                await metrics_service.log_activity_async(
+                    telegram_id=user_id,
+                    username=username,
+                    action='start',
+                    details='Команда /start',
+                    update_user=False
+                )
+            except Exception as e:
+                await session.rollback()
+                print(f"Ошибка при сохранении пользователя: {e}")
+        
+        welcome_text = (
+            f"🏒 Добро пожаловать, {first_name}!\n\n"
+            "Это бот хоккейной лиги Time of the Stars.\n\n"
+            "Здесь вы можете:\n"
+            "🏒 Смотреть расписание матчей и включать уведомления\n"
+            "👥 Зарегистрировать свою команду в лиге\n"
+            "👤️ Записаться в команду как игрок\n\n"
+            "Выберите действие из меню ниже:"
+        )
+        
+        await bot.send_message(message.chat.id, welcome_text, reply_markup=get_main_menu())
+    
+    @async_router.text("🏠 Главное меню")
+    async def main_menu(message: Message):
+        """Возврат в главное меню"""
+        await metrics_service.track_message_async(message, 'main_menu')
+        
+        await bot.send_message(
+            message.chat.id,
+            "🏠 Главное меню\n\nВыберите нужное действие:",
+            reply_markup=get_main_menu()
+        )
+    
+    @async_router.text("🏒 Матчи")
+    async def matches_menu(message: Message):
+        """Меню матчей - показываем ближайший матч"""
+        await metrics_service.track_message_async(message, 'view_matches')
+        
+        user = message.user_context
+        
+        if not user:
+            await bot.send_message(message.chat.id, USER_NOT_FOUND_TEXT)
+            return
+        
+        upcoming = await async_api_service.get_upcoming_games(days_ahead=90)
+        
+        if not upcoming:
+            await bot.send_message(
+                message.chat.id,
+                "📅 Нет информации о предстоящих матчах.",
+                reply_markup=get_matches_menu(user.notifications_enabled)
+            )
+            return
+        
+        game_message = "🏒 <b>Ближайший матч:</b>\n\n" + async_api_service.format_game_message(upcoming[0])
+        
+        if user.notifications_enabled:
+            game_message += "\n\n🔔 Уведомления включены"
+        else:
+            game_message += "\n\n🔕 Уведомления отключены"
+        
+        await bot.send_message(
+            message.chat.id,
+            game_message,
+            parse_mode='HTML',
+            reply_markup=get_matches_menu(user.notifications_enabled)
+        )
+    
+    @async_router.text("🔔 Включить уведомления", "🔕 Отключить уведомления")
+    async def toggle_notifications(message: Message):
+        """Переключение уведомлений"""
+        user = message.user_context
+        
+        if not user:
+            await bot.send_message(message.chat.id, USER_NOT_FOUND_TEXT)
+            return
+        
+        notifications_enabled = message.text == "🔔 Включить уведомления"
+        
+        async with get_async_session() as session:
+            try:
+                await session.execute(
+                    update(User).where(User.id == user.id).values(notifications_enabled=notifications_enabled)
+                )
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                user_cache.invalidate(user.telegram_id)
+                await bot.send_message(message.chat.id, f"❌ Ошибка: {e}", reply_markup=get_back_to_menu())
+                return
+        
+        user.notifications_enabled = notifications_enabled
+        user_cache.put(user)
+        notification_state.set(user.telegram_id, notifications_enabled)
+        
+        action = 'enable_notifications' if notifications_enabled else 'disable_notifications'
+        await metrics_service.track_message_async(message, action)
+        
+        if notifications_enabled:
+            response = "✅ Уведомления включены!\n\nВы будете получать уведомления о предстоящих матчах."
+        else:
+            response = "🔕 Уведомления отключены."
+        
+        await bot.send_message(
+            message.chat.id,
+            response,
+            reply_markup=get_matches_menu(notifications_enabled)
+        )
+    
+    async def send_static_reply(message: Message, key: str):
+        """Отправка заранее подготовленного ответа без обращения к БД"""
+        notifications_enabled = await get_notifications_enabled_async(message)
+        
+        if notifications_enabled is None:
+            await bot.send_message(message.chat.id, USER_NOT_FOUND_TEXT)
+            return
+        
+        text, keyboard = STATIC_REPLIES[key][notifications_enabled]
+        await bot.send_message(message.chat.id, text, parse_mode='HTML', reply_markup=keyboard)
+    
+    @async_router.text("📊 Турнирная таблица", skip_middlewares=True)
+    async def show_tournament_table(message: Message):
+        """Отправка ссылки на турнирную таблицу"""
+        await metrics_service.track_message_async(message, 'view_table')
+        await send_static_reply(message, 'table')
+    
+    @async_router.text("🏆 Лучшие игроки", skip_middlewares=True)
+    async def show_best_players(message: Message):
+        """Отправка ссылки на статистику лучших игроков"""
+        await metrics_service.track_message_async(message, 'view_best_players')
+        await send_static_reply(message, 'best_players')
+    
+    @async_router.text("➡️ Следующие 3 матча", skip_middlewares=True)
+    async def show_next_matches(message: Message):
+        """Показать следующие 3 матча одной страницей с кнопками листания"""
+        await metrics_service.track_message_async(message, 'view_next_matches')
+        
+        notifications_enabled = await get_notifications_enabled_async(message)
+        
+        if notifications_enabled is None:
+            await bot.send_message(message.chat.id, USER_NOT_FOUND_TEXT)
+            return
+        
+        upcoming = await async_api_service.get_upcoming_games(days_ahead=90)
+        
+        if len(upcoming) <= MATCHES_FIRST_OFFSET:
+            text = "📅 Больше нет запланированных матчей." if upcoming else "📅 Нет информации о предстоящих матчах."
+            await bot.send_message(message.chat.id, text, reply_markup=get_matches_menu(notifications_enabled))
+            return
+        
+        text, keyboard = build_matches_page(upcoming, MATCHES_FIRST_OFFSET, async_api_service.format_game_message)
+        await bot.send_message(message.chat.id, text, parse_mode='HTML', reply_markup=keyboard)
+    
+    @bot.callback_query_handler(func=lambda call: call.data and call.data.startswith(MATCHES_PAGE_PREFIX))
+    async def turn_matches_page(call: CallbackQuery):
+        """Листание матчей: та же страница редактируется на месте"""
+        await metrics_service.log_activity_async(
+            telegram_id=call.from_user.id,
+            username=call.from_user.username,
+            action='view_next_matches',
+            details=call.data
+        )
+        
+        upcoming = await async_api_service.get_upcoming_games(days_ahead=90)
+        
+        if len(upcoming) <= MATCHES_FIRST_OFFSET:
+            text, keyboard = "📅 Больше нет запланированных матчей.", None
+        else:
+            text, keyboard = build_matches_page(
+                upcoming,
+                parse_matches_page(call.data),
+                async_api_service.format_game_message
+            )
+        
+        try:
+            await bot.edit_message_text(
+                text,
+                call.message.chat.id,
+                call.message.message_id,
+                parse_mode='HTML',
+                reply_markup=keyboard
+            )
+        except ApiTelegramException as e:
+            if 'message is not modified' not in str(e):
+                raise
+        finally:
+            await bot.answer_callback_query(call.id)
+
+
+def register_sync_bridge(bot: AsyncTeleBot, sync_bot):
+    """
+    Передача остальных сообщений синхронным обработчикам
+    
+    Сценарии регистрации команд и игроков пока остаются синхронными:
+    они выполняются в пуле потоков и отвечают через sync_bot. Как и
+    в синхронном рантайме, обработчик работает в одной транзакции
+    (unit_of_work), а его ответы отправляются после её фиксации.
+    
+    Args:
+        bot: Асинхронный бот
+        sync_bot: OrderedTeleBot с зарегистрированными обработчиками
+    """
+    
+    @async_router.fallback
+    async def sync_bridge(message: Message):
+        await asyncio.to_thread(sync_bot.run_task, get_chat_key(message), router.dispatch, message)
@@ -1,255 +1,260 @@
 """
 Обработчик матчей и уведомлений
 """
+from typing import Callable
 from telebot import TeleBot
-from telebot.types import Message
+from telebot.apihelper import ApiTelegramException
+from telebot.types import Message, CallbackQuery
 from database import get_session, User
 from keyboards.reply_keyboards import get_back_to_menu, get_matches_menu
+from keyboards.inline_keyboards import MATCHES_PAGE_PREFIX, get_matches_pagination, parse_matches_page
 from utils import api_service
 from utils.metrics import metrics_service
+from utils.user_context import get_user_context, get_notifications_enabled, notification_state, user_cache
+from .router import router
 
 
-# Хранилище состояния пагинации для каждого пользователя
-user_matches_offset = {}
+# Матчей на странице; первая страница начинается со второго матча,
+# ближайший показывается в меню матчей
+MATCHES_PAGE_SIZE = 3
+MATCHES_FIRST_OFFSET = 1
+
+TOURNAMENT_TABLE_TEXT = (
+    "📊 <b>Турнирная таблица Звезда Отечества</b>\n\n"
+    "<a href='https://timeofthestars.ru/zvezdaOtechestva?tab=table'>Перейти к таблице</a>"
+)
+
+BEST_PLAYERS_TEXT = (
+    "🏆 <b>Лучшие игроки Звезда Отечества</b>\n\n"
+    "<a href='https://timeofthestars.ru/zvezdaOtechestva?tab=bestPlayers'>Перейти к статистике</a>"
+)
+
+# Готовые пары (текст, клавиатура) для статичных ответов по состоянию уведомлений
+STATIC_REPLIES = {
+    key: {enabled: (text, get_matches_menu(enabled)) for enabled in (True, False)}
+    for key, text in (('table', TOURNAMENT_TABLE_TEXT), ('best_players', BEST_PLAYERS_TEXT))
+}
+
+
+def build_matches_page(upcoming: list, offset: int, format_game: Callable[[dict], str]):
+    """
+    Текст и кнопки страницы предстоящих матчей
+    
+    Args:
+        upcoming: Предстоящие матчи
+        offset: Смещение страницы из callback_data
+        format_game: Функция форматирования карточки матча
+    
+    Returns:
+        Кортеж (текст, inline-клавиатура или None)
+    """
+    # Матчи могли закончиться, пока пользователь листал: показываем последнюю страницу
+    last_offset = MATCHES_FIRST_OFFSET + (len(upcoming) - 1 - MATCHES_FIRST_OFFSET) // MATCHES_PAGE_SIZE * MATCHES_PAGE_SIZE
+    offset = min(max(offset, MATCHES_FIRST_OFFSET), last_offset)
+    games = upcoming[offset:offset + MATCHES_PAGE_SIZE]
+    
+    text = "\n\n➖➖➖➖➖\n\n".join(format_game(game) for game in games)
+    shown = f"{offset + 1}–{offset + len(games)}" if len(games) > 1 else f"{offset + 1}"
+    text += f"\n\n📋 Матчи {shown} из {len(upcoming)}"
+    
+    keyboard = get_matches_pagination(offset, MATCHES_PAGE_SIZE, len(upcoming), MATCHES_FIRST_OFFSET)
+    return text, keyboard
 
 
 def register_notification_handlers(bot: TeleBot):
     """Регистрация обработчиков для матчей и уведомлений"""
     
-    @bot.message_handler(func=lambda message: message.text == "🏒 Матчи")
+    @router.text("🏒 Матчи")
     def matches_menu(message: Message):
         """Меню матчей - показываем ближайший матч"""
-        user_id = message.from_user.id
-        
         # Логируем активность
         metrics_service.track_message(message, 'view_matches')
         
-        # Сброс смещения при входе в меню
-        user_matches_offset[user_id] = 0
+        user = get_user_context(message)
         
-        session = get_session()
-        try:
-            user = session.query(User).filter_by(telegram_id=user_id).first()
-            
-            if not user:
-                bot.send_message(
-                    message.chat.id,
-                    "⚠️ Ошибка: пользователь не найден. Попробуйте /start"
-                )
-                return
-            
-            # Получаем предстоящие матчи
-            upcoming = api_service.get_upcoming_games(days_ahead=90)
-            
-            if not upcoming:
-                bot.send_message(
-                    message.chat.id,
-                    "📅 Нет информации о предстоящих матчах.",
-                    reply_markup=get_matches_menu(user.notifications_enabled)
-                )
-                return
-            
-            # Показываем ближайший матч
-            next_game = upcoming[0]
-            game_message = "🏒 <b>Ближайший матч:</b>\n\n" + api_service.format_game_message(next_game)
-            
-            # Добавляем информацию о статусе уведомлений
-            if user.notifications_enabled:
-                game_message += "\n\n🔔 Уведомления включены"
-            else:
-                game_message += "\n\n🔕 Уведомления отключены"
-            
+        if not user:
             bot.send_message(
                 message.chat.id,
-                game_message,
-                parse_mode='HTML',
+                "⚠️ Ошибка: пользователь не найден. Попробуйте /start"
+            )
+            return
+        
+        # Получаем предстоящие матчи
+        upcoming = api_service.get_upcoming_games(days_ahead=90)
+        
+        if not upcoming:
+            bot.send_message(
+                message.chat.id,
+                "📅 Нет информации о предстоящих матчах.",
                 reply_markup=get_matches_menu(user.notifications_enabled)
             )
-        finally:
-            session.close()
+            return
+        
+        # Показываем ближайший матч
+        next_game = upcoming[0]
+        game_message = "🏒 <b>Ближайший матч:</b>\n\n" + api_service.format_game_message(next_game)
+        
+        # Добавляем информацию о статусе уведомлений
+        if user.notifications_enabled:
+            game_message += "\n\n🔔 Уведомления включены"
+        else:
+            game_message += "\n\n🔕 Уведомления отключены"
+        
+        bot.send_message(
+            message.chat.id,
+            game_message,
+            parse_mode='HTML',
+            reply_markup=get_matches_menu(user.notifications_enabled)
+        )
     
-    @bot.message_handler(func=lambda message: message.text in ["🔔 Включить уведомления", "🔕 Отключить уведомления"])
+    @router.text("🔔 Включить уведомления", "🔕 Отключить уведомления")
     def toggle_notifications(message: Message):
         """Переключение уведомлений"""
-        user_id = message.from_user.id
+        user = get_user_context(message)
         
-        session = get_session()
-        try:
-            user = session.query(User).filter_by(telegram_id=user_id).first()
-            
-            if not user:
-                bot.send_message(
-                    message.chat.id,
-                    "⚠️ Ошибка: пользователь не найден. Попробуйте /start"
-                )
-                return
-            
-            # Переключаем статус
-            user.notifications_enabled = not user.notifications_enabled
-            session.commit()
-            
-            # Логируем активность
-            action = 'enable_notifications' if user.notifications_enabled else 'disable_notifications'
-            metrics_service.track_message(message, action)
-            
-            if user.notifications_enabled:
-                response = "✅ Уведомления включены!\n\nВы будете получать уведомления о предстоящих матчах."
-            else:
-                response = "🔕 Уведомления отключены."
-            
+        if not user:
             bot.send_message(
                 message.chat.id,
-                response,
-                reply_markup=get_matches_menu(user.notifications_enabled)
+                "⚠️ Ошибка: пользователь не найден. Попробуйте /start"
             )
+            return
+        
+        # Новое состояние берём из нажатой кнопки, а не из кэша
+        notifications_enabled = message.text == "🔔 Включить уведомления"
+        
+        session = get_session()
+        try:
+            session.query(User).filter_by(id=user.id).update(
+                {User.notifications_enabled: notifications_enabled},
+                synchronize_session=False
+            )
+            session.commit()
+            user.notifications_enabled = notifications_enabled
+            user_cache.put(user)
+            notification_state.set(user.telegram_id, notifications_enabled)
         except Exception as e:
             session.rollback()
+            user_cache.invalidate(user.telegram_id)
             bot.send_message(
                 message.chat.id,
                 f"❌ Ошибка: {e}",
                 reply_markup=get_back_to_menu()
             )
+            return
         finally:
             session.close()
-    
-    @bot.message_handler(func=lambda message: message.text == "📊 Турнирная таблица")
-    def show_tournament_table(message: Message):
-        """Отправка ссылки на турнирную таблицу"""
+        
         # Логируем активность
-        metrics_service.track_message(message, 'view_table')
-        user_id = message.from_user.id
+        action = 'enable_notifications' if notifications_enabled else 'disable_notifications'
+        metrics_service.track_message(message, action)
         
-        session = get_session()
-        try:
-            user = session.query(User).filter_by(telegram_id=user_id).first()
-            
-            if not user:
-                bot.send_message(
-                    message.chat.id,
-                    "⚠️ Ошибка: пользователь не найден. Попробуйте /start"
-                )
-                return
-            
+        if notifications_enabled:
+            response = "✅ Уведомления включены!\n\nВы будете получать уведомления о предстоящих матчах."
+        else:
+            response = "🔕 Уведомления отключены."
+        
+        bot.send_message(
+            message.chat.id,
+            response,
+            reply_markup=get_matches_menu(notifications_enabled)
+        )
+    
+    def send_static_reply(message: Message, key: str):
+        """Отправка заранее подготовленного ответа без обращения к БД"""
+        notifications_enabled = get_notifications_enabled(message)
+        
+        if notifications_enabled is None:
             bot.send_message(
                 message.chat.id,
-                "📊 <b>Турнирная таблица Звезда Отечества</b>\n\n"
-                "<a href='https://timeofthestars.ru/zvezdaOtechestva?tab=table'>Перейти к таблице</a>",
-                parse_mode='HTML',
-                reply_markup=get_matches_menu(user.notifications_enabled)
+                "⚠️ Ошибка: пользователь не найден. Попробуйте /start"
             )
-        finally:
-            session.close()
+            return
+        
+        text, keyboard = STATIC_REPLIES[key][notifications_enabled]
+        bot.send_message(
+            message.chat.id,
+            text,
+            parse_mode='HTML',
+            reply_markup=keyboard
+        )
+    
+    @router.text("📊 Турнирная таблица", skip_middlewares=True)
+    def show_tournament_table(message: Message):
+        """Отправка ссылки на турнирную таблицу"""
+        # Логируем активность
+        metrics_service.track_message(message, 'view_table')
+        send_static_reply(message, 'table')
     
-    @bot.message_handler(func=lambda message: message.text == "🏆 Лучшие игроки")
+    @router.text("🏆 Лучшие игроки", skip_middlewares=True)
     def show_best_players(message: Message):
         """Отправка ссылки на статистику лучших игроков"""
-        user_id = message.from_user.id
-        
         # Логируем активность
         metrics_service.track_message(message, 'view_best_players')
+        send_static_reply(message, 'best_players')
+    
+    @router.text("➡️ Следующие 3 матча", skip_middlewares=True)
+    def show_next_matches(message: Message):
+        """Показать следующие 3 матча одной страницей с кнопками листания"""
+        # Логируем активность
+        metrics_service.track_message(message, 'view_next_matches')
         
-        session = get_session()
-        try:
-            user = session.query(User).filter_by(telegram_id=user_id).first()
-            
-            if not user:
-                bot.send_message(
-                    message.chat.id,
-                    "⚠️ Ошибка: пользователь не найден. Попробуйте /start"
-                )
-                return
-            
+        notifications_enabled = get_notifications_enabled(message)
+        
+        if notifications_enabled is None:
             bot.send_message(
                 message.chat.id,
-                "🏆 <b>Лучшие игроки Звезда Отечества</b>\n\n"
-                "<a href='https://timeofthestars.ru/zvezdaOtechestva?tab=bestPlayers'>Перейти к статистике</a>",
-                parse_mode='HTML',
-                reply_markup=get_matches_menu(user.notifications_enabled)
+                "⚠️ Ошибка: пользователь не найден. Попробуйте /start"
             )
-        finally:
-            session.close()
+            return
+        
+        # Получаем предстоящие матчи
+        upcoming = api_service.get_upcoming_games(days_ahead=90)
+        
+        if len(upcoming) <= MATCHES_FIRST_OFFSET:
+            text = "📅 Больше нет запланированных матчей." if upcoming else "📅 Нет информации о предстоящих матчах."
+            bot.send_message(
+                message.chat.id,
+                text,
+                reply_markup=get_matches_menu(notifications_enabled)
+            )
+            return
+        
+        text, keyboard = build_matches_page(upcoming, MATCHES_FIRST_OFFSET, api_service.format_game_message)
+        bot.send_message(
+            message.chat.id,
+            text,
+            parse_mode='HTML',
+            reply_markup=keyboard
+        )
     
-    @bot.message_handler(func=lambda message: message.text == "➡️ Следующие 3 матча")
-    def show_next_matches(message: Message):
-        """Показать следующие 3 матча"""
-        user_id = message.from_user.id
+    @bot.callback_query_handler(func=lambda call: call.data and call.data.startswith(MATCHES_PAGE_PREFIX))
+    def turn_matches_page(call: CallbackQuery):
+        """Листание матчей: та же страница редактируется на месте"""
+        metrics_service.log_activity(
+            telegram_id=call.from_user.id,
+            username=call.from_user.username,
+            action='view_next_matches',
+            details=call.data
+        )
         
-        # Логируем активность
-        metrics_service.track_message(message, 'view_next_matches')
+        upcoming = api_service.get_upcoming_games(days_ahead=90)
         
-        # Получаем текущее смещение
-        offset = user_matches_offset.get(user_id, 0)
+        if len(upcoming) <= MATCHES_FIRST_OFFSET:
+            text, keyboard = "📅 Больше нет запланированных матчей.", None
+        else:
+            text, keyboard = build_matches_page(upcoming, parse_matches_page(call.data), api_service.format_game_message)
         
-        session = get_session()
         try:
-            user = session.query(User).filter_by(telegram_id=user_id).first()
-            
-            if not user:
-                bot.send_message(
-                    message.chat.id,
-                    "⚠️ Ошибка: пользователь не найден. Попробуйте /start"
-                )
-                return
-            
-            # Получаем предстоящие матчи
-            upcoming = api_service.get_upcoming_games(days_ahead=90)
-            
-            if not upcoming:
-                bot.send_message(
-                    message.chat.id,
-                    "📅 Нет информации о предстоящих матчах.",
-                    reply_markup=get_matches_menu(user.notifications_enabled)
-                )
-                return
-            
-            # Вычисляем новое смещение (пропускаем первый матч при первом запросе)
-            if offset == 0:
-                offset = 1  # Пропускаем ближайший, который уже показан
-            else:
-                offset += 3  # Увеличиваем на 3 для следующих
-            
-            # Проверяем, есть ли еще матчи
-            if offset >= len(upcoming):
-                bot.send_message(
-                    message.chat.id,
-                    "📅 Больше нет запланированных матчей.",
-                    reply_markup=get_matches_menu(user.notifications_enabled)
-                )
-                # Сбрасываем смещение
-                user_matches_offset[user_id] = 0
-                return
-            
-            # Получаем следующие 3 матча
-            next_matches = upcoming[offset:offset+3]
-            
-            # Отправляем информацию о матчах
-            for idx, game in enumerate(next_matches, 1):
-                game_message = api_service.format_game_message(game)
-                bot.send_message(
-                    message.chat.id,
-                    game_message,
-                    parse_mode='HTML'
-                )
-            
-            # Обновляем смещение
-            user_matches_offset[user_id] = offset
-            
-            # Информируем о количестве оставшихся матчей
-            remaining = len(upcoming) - (offset + len(next_matches))
-            if remaining > 0:
-                bot.send_message(
-                    message.chat.id,
-                    f"Ещё {remaining} матчей доступно.",
-                    reply_markup=get_matches_menu(user.notifications_enabled)
-                )
-            else:
-                bot.send_message(
-                    message.chat.id,
-                    "Это все запланированные матчи.",
-                    reply_markup=get_matches_menu(user.notifications_enabled)
-                )
-                # Сбрасываем смещение для следующего раза
-                user_matches_offset[user_id] = 0
-                
+            bot.edit_message_text(
+                text,
+                call.message.chat.id,
+                call.message.message_id,
+                parse_mode='HTML',
+                reply_markup=keyboard
+            )
+        except ApiTelegramException as e:
+            # Повторное нажатие той же кнопки: текст страницы не изменился
+            if 'message is not modified' not in str(e):
+                raise
         finally:
-            session.close()
+            bot.answer_callback_query(call.id)
@@ -2,46 +2,32 @@
 Обработчик регистрации игроков
 """
 from telebot import TeleBot
-from telebot.types import Message, ReplyKeyboardRemove, ReplyKeyboardMarkup, KeyboardButton
-from database import get_session, Player
-from keyboards.reply_keyboards import get_back_to_menu, get_player_management_menu, get_confirmation_keyboard
+from telebot.types import Message
+from database import get_session, commit_unit, Player
+from keyboards.reply_keyboards import (
+    get_back_to_menu,
+    get_player_management_menu,
+    get_confirmation_keyboard,
+    get_position_keyboard,
+    get_teams_keyboard,
+    build_teams_keyboard,
+    get_keyboard_remove
+)
 from utils import api_service
 from utils.metrics import metrics_service
+from utils.state_store import create_state_store
+from .router import router
 
 
 # Хранилище состояний регистрации и редактирования игроков
-player_registration_state = {}
-player_edit_state = {}
-
-
-def get_position_keyboard():
-    """Клавиатура выбора позиции"""
-    keyboard = ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
-    keyboard.add(
-        KeyboardButton("Нападающий"),
-        KeyboardButton("Защитник"),
-        KeyboardButton("Вратарь")
-    )
-    keyboard.add(KeyboardButton("Пропустить"))
-    return keyboard
-
-
-def get_teams_keyboard():
-    """Клавиатура выбора команды"""
-    teams = api_service.get_teams()
-    keyboard = ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True, row_width=2)
-    
-    for team in teams:
-        keyboard.add(KeyboardButton(team['name']))
-    
-    keyboard.add(KeyboardButton("Пропустить"))
-    return keyboard
+player_registration_state = create_state_store('player_registration_state')
+player_edit_state = create_state_store('player_edit_state')
 
 
 def register_player_handlers(bot: TeleBot):
     """Регистрация обработчиков для игроков"""
     
-    @bot.message_handler(func=lambda message: message.text == "👤️ Записаться в команду (игрок)")
+    @router.text("👤️ Записаться в команду (игрок)")
     def start_player_registration(message: Message):
         """Начало регистрации игрока"""
         user_id = message.from_user.id
@@ -52,7 +38,7 @@ def register_player_handlers(bot: TeleBot):
         # Проверка существующих анкет
         session = get_session()
         try:
-            existing_players = session.query(Player).filter_by(telegram_id=user_id).all()
+            existing_players = session.query(Player).filter_by(telegram_id=user_id).order_by(Player.created_at).all()
             
             if existing_players:
                 # Показываем меню управления анкетами
@@ -76,19 +62,19 @@ def register_player_handlers(bot: TeleBot):
         finally:
             session.close()
     
-    @bot.message_handler(func=lambda message: message.text == "➕ Добавить анкету")
+    @router.text("➕ Добавить анкету")
     def handle_add_player(message: Message):
         """Добавление новой анкеты"""
         start_new_player_registration(bot, message)
     
-    @bot.message_handler(func=lambda message: message.text == "📋 Мои анкеты")
+    @router.text("📋 Мои анкеты")
     def handle_view_players(message: Message):
         """Просмотр всех анкет пользователя"""
         user_id = message.from_user.id
         session = get_session()
         
         try:
-            players = session.query(Player).filter_by(telegram_id=user_id).all()
+            players = session.query(Player).filter_by(telegram_id=user_id).order_by(Player.created_at).all()
             
             if not players:
                 bot.send_message(
@@ -117,14 +103,14 @@ def register_player_handlers(bot: TeleBot):
         finally:
             session.close()
     
-    @bot.message_handler(func=lambda message: message.text == "✏️ Изменить анкету")
+    @router.text("✏️ Изменить анкету")
     def handle_edit_player_start(message: Message):
         """Начало процесса редактирования анкеты"""
         user_id = message.from_user.id
         session = get_session()
         
         try:
-            players = session.query(Player).filter_by(telegram_id=user_id).all()
+            players = session.query(Player).filter_by(telegram_id=user_id).order_by(Player.created_at).all()
             
             if not players:
                 bot.send_message(
@@ -154,14 +140,14 @@ def register_player_handlers(bot: TeleBot):
         finally:
             session.close()
     
-    @bot.message_handler(func=lambda message: message.text == "🗑 Удалить анкету")
+    @router.text("🗑 Удалить анкету")
     def handle_delete_player_start(message: Message):
         """Начало процесса удаления анкеты"""
         user_id = message.from_user.id
         session = get_session()
         
         try:
-            players = session.query(Player).filter_by(telegram_id=user_id).all()
+            players = session.query(Player).filter_by(telegram_id=user_id).order_by(Player.created_at).all()
             
             if not players:
                 bot.send_message(
@@ -196,7 +182,7 @@ def register_player_handlers(bot: TeleBot):
         finally:
             session.close()
     
-    @bot.message_handler(func=lambda message: message.text in ["✅ Подтвердить", "❌ Отменить"] and message.from_user.id in player_edit_state)
+    @router.text("✅ Подтвердить", "❌ Отменить", state=player_edit_state)
     def handle_player_confirmation(message: Message):
         """Обработка подтверждения/отмены для игроков"""
         user_id = message.from_user.id
@@ -233,7 +219,7 @@ def register_player_handlers(bot: TeleBot):
             
             del player_edit_state[user_id]
     
-    @bot.message_handler(func=lambda message: message.from_user.id in player_registration_state)
+    @router.state(player_registration_state)
     def player_registration_process(message: Message):
         """Процесс регистрации игрока"""
         user_id = message.from_user.id
@@ -298,7 +284,7 @@ def register_player_handlers(bot: TeleBot):
                 bot.send_message(
                     message.chat.id,
                     "Расскажите о своём опыте игры (или пропустите - /skip):",
-                    reply_markup=ReplyKeyboardRemove()
+                    reply_markup=get_keyboard_remove()
                 )
             else:
                 bot.send_message(
@@ -328,20 +314,17 @@ def register_player_handlers(bot: TeleBot):
             state['step'] = 'team'
             bot.send_message(
                 message.chat.id,
-                "Выберите команду, в которую хотите попасть (или пропустите):",
-                reply_markup=get_teams_keyboard()
+                "Выберите команду, в которую хотите попасть, или введите начало её названия (или пропустите):",
+                reply_markup=get_teams_keyboard(api_service.get_teams())
             )
         
         elif state['step'] == 'team':
             if message.text != 'Пропустить':
-                # Найти slug команды по названию
-                teams = api_service.get_teams()
-                team_slug = None
-                for team in teams:
-                    if team['name'] == message.text:
-                        team_slug = team['slug']
-                        break
-                state['preferred_team_slug'] = team_slug
+                # Найти команду по названию или его началу
+                team = find_team(bot, message)
+                if team is None:
+                    return
+                state['preferred_team_slug'] = team['slug']
             else:
                 state['preferred_team_slug'] = None
             
@@ -360,6 +343,8 @@ def register_player_handlers(bot: TeleBot):
                 )
                 session.add(player)
                 session.commit()
+                # Дальше может понадобиться запрос к API за списком команд
+                commit_unit()
                 
                 position_text = {
                     'forward': 'Нападающий',
@@ -395,7 +380,7 @@ def register_player_handlers(bot: TeleBot):
                 session.close()
                 del player_registration_state[user_id]
     
-    @bot.message_handler(func=lambda message: message.from_user.id in player_edit_state)
+    @router.state(player_edit_state)
     def handle_player_edit_steps(message: Message):
         """Обработка шагов редактирования/удаления анкеты"""
         user_id = message.from_user.id
@@ -452,7 +437,7 @@ def register_player_handlers(bot: TeleBot):
                 '3': ('position', 'Выберите новую позицию:', get_position_keyboard()),
                 '4': ('experience', 'Введите новый опыт (или /skip):'),
                 '5': ('phone', 'Введите новый номер телефона (или /skip):'),
-                '6': ('preferred_team_slug', 'Выберите новую команду:', get_teams_keyboard())
+                '6': ('preferred_team_slug', 'Выберите новую команду:', get_teams_keyboard(api_service.get_teams()))
             }
             
             if message.text in field_map:
@@ -503,15 +488,10 @@ def register_player_handlers(bot: TeleBot):
                         if message.text == 'Пропустить':
                             new_value = None
                         else:
-                            teams = api_service.get_teams()
-                            new_value = None
-                            for team in teams:
-                                if team['name'] == message.text:
-                                    new_value = team['slug']
-                                    break
-                            if not new_value:
-                                bot.send_message(message.chat.id, "⚠️ Команда не найдена.", reply_markup=get_teams_keyboard())
+                            team = find_team(bot, message)
+                            if team is None:
                                 return
+                            new_value = team['slug']
                     
                     else:
                         # Текстовые поля
@@ -545,6 +525,35 @@ def register_player_handlers(bot: TeleBot):
             del player_edit_state[user_id]
 
 
+def find_team(bot: TeleBot, message: Message):
+    """
+    Поиск команды по нажатой кнопке или введённому началу названия
+    
+    Если команда не найдена или подходят несколько, пользователю
+    отправляется клавиатура для повторного выбора.
+    
+    Returns:
+        Команда или None
+    """
+    teams = api_service.search_teams(message.text)
+    if len(teams) == 1:
+        return teams[0]
+    
+    if teams:
+        bot.send_message(
+            message.chat.id,
+            "Найдено несколько команд, выберите нужную:",
+            reply_markup=build_teams_keyboard(teams)
+        )
+    else:
+        bot.send_message(
+            message.chat.id,
+            "⚠️ Команда не найдена. Выберите команду из списка или введите начало названия:",
+            reply_markup=get_teams_keyboard(api_service.get_teams())
+        )
+    return None
+
+
 def start_new_player_registration(bot: TeleBot, message: Message):
     """Начало процесса регистрации нового игрока"""
     user_id = message.from_user.id
@@ -554,7 +563,7 @@ def start_new_player_registration(bot: TeleBot, message: Message):
         message.chat.id,
         "👤️ Регистрация игрока\n\n"
         "Введите ваше полное имя (ФИО):",
-        reply_markup=ReplyKeyboardRemove()
+        reply_markup=get_keyboard_remove()
     )
 
 
@@ -0,0 +1,239 @@
+"""
+Центральный маршрутизатор текстовых сообщений
+
+Вместо цепочки фильтров `func=lambda message: ...`, которые telebot проверяет
+по очереди для каждого сообщения, обработчики регистрируются в словарях:
+по тексту кнопки, по команде и по хранилищу состояния пользователя.
+Обработчик находится за постоянное время.
+
+Обработчики одного пользователя выполняются под его блокировкой, поэтому
+шаги сценария не меняют состояние одновременно.
+"""
+import inspect
+import threading
+from collections import Counter
+from typing import Callable, Optional
+from telebot.types import Message
+from utils.runtime_stats import register_stats_provider
+from utils.sql_stats import sql_stats
+from utils.user_locks import user_locks
+
+
+class Router:
+    """Маршрутизатор сообщений по тексту, команде и состоянию пользователя"""
+    
+    def __init__(self, user_lock=None):
+        """
+        Args:
+            user_lock: Блокировки пользователей (StripedLock или AsyncStripedLock);
+                       None - обработчики не блокируются
+        """
+        self.user_lock = user_lock
+        self.command_routes = {}  # команда -> обработчик
+        self.text_routes = {}  # текст кнопки -> [(хранилище состояния или None, обработчик)]
+        self.state_routes = []  # [(хранилище состояния, обработчик)] в порядке регистрации
+        self.fallback_route = None
+        self.guards = []  # проверки перед обработчиком, False отменяет обработку
+        self.middlewares = []  # вызываются перед обработчиком
+        self.raw_handlers = set()  # обработчики, которым middleware не нужны
+        self._hits = Counter()
+        self._hits_lock = threading.Lock()
+    
+    def command(self, *commands: str, skip_middlewares: bool = False):
+        """
+        Регистрация обработчика команды (/start и т.п.)
+        
+        Args:
+            commands: Команды без символа '/'
+            skip_middlewares: Не вызывать middleware (обработчик сам получает пользователя)
+        """
+        def decorator(handler: Callable):
+            if skip_middlewares:
+                self.raw_handlers.add(handler)
+            for command in commands:
+                self.command_routes[command] = handler
+            return handler
+        return decorator
+    
+    def text(self, *texts: str, state: Optional[dict] = None, skip_middlewares: bool = False):
+        """
+        Регистрация обработчика текста кнопки
+        
+        Args:
+            texts: Тексты кнопок
+            state: Хранилище состояния; если указано, обработчик срабатывает
+                   только для пользователей, которые в нём есть
+            skip_middlewares: Не вызывать middleware (быстрые ответы без БД)
+        """
+        def decorator(handler: Callable):
+            if skip_middlewares:
+                self.raw_handlers.add(handler)
+            for text in texts:
+                routes = [route for route in self.text_routes.get(text, []) if route[0] is not state]
+                routes.append((state, handler))
+                self.text_routes[text] = routes
+            return handler
+        return decorator
+    
+    def state(self, store: dict):
+        """
+        Регистрация обработчика шага сценария (регистрация, редактирование)
+        
+        Args:
+            store: Хранилище состояний, ключ - Telegram ID пользователя
+                   (dict или хранилище из utils.state_store)
+        """
+        def decorator(handler: Callable):
+            self.state_routes = [route for route in self.state_routes if route[0] is not store]
+            self.state_routes.append((store, handler))
+            return handler
+        return decorator
+    
+    def fallback(self, handler: Callable):
+        """Регистрация обработчика сообщений, для которых нет маршрута"""
+        self.fallback_route = handler
+        return handler
+    
+    def guard(self, handler: Callable):
+        """
+        Регистрация проверки, вызываемой перед любым обработчиком
+        
+        Проверки выполняются и для обработчиков без middleware.
+        Если проверка вернула False, сообщение не обрабатывается.
+        """
+        self.guards.append(handler)
+        return handler
+    
+    def middleware(self, handler: Callable):
+        """
+        Регистрация middleware, вызываемого перед найденным обработчиком
+        
+        Middleware получает сообщение и может дополнить его данными
+        (например, контекстом пользователя).
+        """
+        self.middlewares.append(handler)
+        return handler
+    
+    def resolve(self, message: Message) -> Optional[Callable]:
+        """
+        Поиск обработчика для сообщения
+        
+        Порядок: команда, текст кнопки, текущий сценарий пользователя.
+        
+        Args:
+            message: Сообщение от Telegram
+        
+        Returns:
+            Обработчик или None
+        """
+        text = message.text or ''
+        user_id = message.from_user.id
+        
+        if text.startswith('/'):
+            command = text.split(maxsplit=1)[0][1:].split('@', 1)[0]
+            handler = self.command_routes.get(command)
+            if handler:
+                return handler
+        
+        for store, handler in self.text_routes.get(text, ()):
+            if store is None or user_id in store:
+                return handler
+        
+        for store, handler in self.state_routes:
+            if user_id in store:
+                return handler
+        
+        return self.fallback_route
+    
+    def in_scenario(self, user_id: int) -> bool:
+        """
+        Проверка, проходит ли пользователь сценарий (шаг router.state)
+        
+        Args:
+            user_id: Telegram ID пользователя
+        
+        Returns:
+            True, если пользователь есть в хранилище состояния одного из шагов
+        """
+        return any(user_id in store for store, _ in self.state_routes)
+    
+    def _count(self, handler: Optional[Callable]):
+        name = handler.__name__ if handler else 'unmatched'
+        with self._hits_lock:
+            self._hits[name] += 1
+    
+    def dispatch(self, message: Message):
+        """Вызов обработчика для сообщения"""
+        handler = self.resolve(message)
+        if handler is None or handler in self.raw_handlers or self.user_lock is None:
+            return self._call(handler, message)
+        
+        with self.user_lock.hold(message.from_user.id):
+            # Пока ждали блокировку, предыдущий шаг мог сменить сценарий
+            return self._call(self.resolve(message), message)
+    
+    def _call(self, handler: Optional[Callable], message: Message):
+        self._count(handler)
+        if handler:
+            with sql_stats.unit(handler.__name__):
+                for guard in self.guards:
+                    if guard(message) is False:
+                        return
+                if handler not in self.raw_handlers:
+                    for middleware in self.middlewares:
+                        middleware(message)
+                return handler(message)
+    
+    async def dispatch_async(self, message: Message):
+        """Вызов обработчика для сообщения в asyncio-рантайме"""
+        handler = self.resolve(message)
+        if handler is None or handler in self.raw_handlers or self.user_lock is None:
+            return await self._call_async(handler, message)
+        
+        async with self.user_lock.hold(message.from_user.id):
+            return await self._call_async(self.resolve(message), message)
+    
+    async def _call_async(self, handler: Optional[Callable], message: Message):
+        self._count(handler)
+        if handler:
+            with sql_stats.unit(handler.__name__):
+                for guard in self.guards:
+                    result = guard(message)
+                    if inspect.isawaitable(result):
+                        result = await result
+                    if result is False:
+                        return
+                if handler not in self.raw_handlers:
+                    for middleware in self.middlewares:
+                        result = middleware(message)
+                        if inspect.isawaitable(result):
+                            await result
+                result = handler(message)
+                if inspect.isawaitable(result):
+                    await result
+    
+    def attach(self, bot):
+        """
+        Подключение маршрутизатора к боту одним обработчиком
+        
+        Args:
+            bot: TeleBot или AsyncTeleBot
+        """
+        is_async = inspect.iscoroutinefunction(bot.send_message)
+        dispatch = self.dispatch_async if is_async else self.dispatch
+        bot.message_handler(func=lambda message: True, content_types=['text'])(dispatch)
+    
+    def get_hit_counts(self) -> dict:
+        """
+        Количество срабатываний каждого маршрута
+        
+        Returns:
+            Словарь {имя обработчика: количество}, по убыванию
+        """
+        with self._hits_lock:
+            return dict(self._hits.most_common())
+
+
+# Маршрутизатор синхронных обработчиков
+router = Router(user_lock=user_locks)
+register_stats_provider('routes', router.get_hit_counts)
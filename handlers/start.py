@@ -3,15 +3,18 @@
 """
 from telebot import TeleBot
 from telebot.types import Message
-from database import get_session, User
+from database import get_session, upsert_user
 from keyboards.reply_keyboards import get_main_menu
 from utils.metrics import metrics_service
+from utils.user_context import UserContext, notification_state, user_cache
+from .router import router
 
 
 def register_start_handlers(bot: TeleBot):
     """Регистрация обработчиков для /start"""
     
-    @bot.message_handler(commands=['start'])
+    # Контекст пользователя строится из результата upsert, отдельный SELECT не нужен
+    @router.command('start', skip_middlewares=True)
     def start_command(message: Message):
         """Обработка команды /start"""
         user_id = message.from_user.id
@@ -19,35 +22,24 @@ def register_start_handlers(bot: TeleBot):
         first_name = message.from_user.first_name
         last_name = message.from_user.last_name
         
-        # Сохранение/обновление пользователя в БД
+        # Создание/обновление пользователя и его счётчика активности одним запросом
         session = get_session()
         try:
-            user = session.query(User).filter_by(telegram_id=user_id).first()
-            
-            if not user:
-                # Создание нового пользователя
-                user = User(
-                    telegram_id=user_id,
-                    username=username,
-                    first_name=first_name,
-                    last_name=last_name,
-                    notifications_enabled=False
-                )
-                session.add(user)
-            else:
-                # Обновляем данные существующего пользователя
-                user.username = username
-                user.first_name = first_name
-                user.last_name = last_name
-            
+            db_id, notifications_enabled = upsert_user(session, user_id, username, first_name, last_name)
             session.commit()
             
-            # Логируем активность
+            # Данные пользователя изменились, кладём в кэш свежие
+            message.user_context = UserContext(db_id, user_id, username, notifications_enabled)
+            user_cache.put(message.user_context)
+            notification_state.set(user_id, notifications_enabled)
+            
+            # Логируем активность (счётчик пользователя уже обновлён upsert)
             metrics_service.log_activity(
                 telegram_id=user_id,
                 username=username,
                 action='start',
-                details='Команда /start'
+                details='Команда /start',
+                update_user=False
             )
         except Exception as e:
             session.rollback()
@@ -72,7 +64,7 @@ def register_start_handlers(bot: TeleBot):
             reply_markup=get_main_menu()
         )
     
-    @bot.message_handler(func=lambda message: message.text == "🏠 Главное меню")
+    @router.text("🏠 Главное меню")
     def main_menu(message: Message):
         """Возврат в главное меню"""
         # Логируем активность
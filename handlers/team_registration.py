@@ -2,21 +2,28 @@
 Обработчик регистрации команд в лигу
 """
 from telebot import TeleBot
-from telebot.types import Message, ReplyKeyboardRemove
+from telebot.types import Message
 from database import get_session, TeamApplication
-from keyboards.reply_keyboards import get_back_to_menu, get_team_management_menu, get_confirmation_keyboard
+from keyboards.reply_keyboards import (
+    get_back_to_menu,
+    get_team_management_menu,
+    get_confirmation_keyboard,
+    get_keyboard_remove
+)
 from utils.metrics import metrics_service
+from utils.state_store import create_state_store
+from .router import router
 
 
 # Хранилище состояний регистрации и редактирования команд
-team_registration_state = {}
-team_edit_state = {}
+team_registration_state = create_state_store('team_registration_state')
+team_edit_state = create_state_store('team_edit_state')
 
 
 def register_team_handlers(bot: TeleBot):
     """Регистрация обработчиков для команд"""
     
-    @bot.message_handler(func=lambda message: message.text == "👥 Записать команду в лигу")
+    @router.text("👥 Записать команду в лигу")
     def start_team_registration(message: Message):
         """Начало регистрации команды"""
         user_id = message.from_user.id
@@ -27,7 +34,7 @@ def register_team_handlers(bot: TeleBot):
         # Проверка существующих заявок
         session = get_session()
         try:
-            existing_apps = session.query(TeamApplication).filter_by(telegram_id=user_id).all()
+            existing_apps = session.query(TeamApplication).filter_by(telegram_id=user_id).order_by(TeamApplication.created_at).all()
             
             if existing_apps:
                 # Показываем меню управления заявками
@@ -51,19 +58,19 @@ def register_team_handlers(bot: TeleBot):
         finally:
             session.close()
     
-    @bot.message_handler(func=lambda message: message.text == "➕ Добавить команду")
+    @router.text("➕ Добавить команду")
     def handle_add_team(message: Message):
         """Добавление новой команды"""
         start_new_team_registration(bot, message)
     
-    @bot.message_handler(func=lambda message: message.text == "📋 Мои заявки")
+    @router.text("📋 Мои заявки")
     def handle_view_teams(message: Message):
         """Просмотр всех заявок пользователя"""
         user_id = message.from_user.id
         session = get_session()
         
         try:
-            apps = session.query(TeamApplication).filter_by(telegram_id=user_id).all()
+            apps = session.query(TeamApplication).filter_by(telegram_id=user_id).order_by(TeamApplication.created_at).all()
             
             if not apps:
                 bot.send_message(
@@ -92,14 +99,14 @@ def register_team_handlers(bot: TeleBot):
         finally:
             session.close()
     
-    @bot.message_handler(func=lambda message: message.text == "✏️ Изменить заявку")
+    @router.text("✏️ Изменить заявку")
     def handle_edit_team_start(message: Message):
         """Начало процесса редактирования заявки"""
         user_id = message.from_user.id
         session = get_session()
         
         try:
-            apps = session.query(TeamApplication).filter_by(telegram_id=user_id).all()
+            apps = session.query(TeamApplication).filter_by(telegram_id=user_id).order_by(TeamApplication.created_at).all()
             
             if not apps:
                 bot.send_message(
@@ -129,14 +136,14 @@ def register_team_handlers(bot: TeleBot):
         finally:
             session.close()
     
-    @bot.message_handler(func=lambda message: message.text == "🗑 Удалить заявку")
+    @router.text("🗑 Удалить заявку")
     def handle_delete_team_start(message: Message):
         """Начало процесса удаления заявки"""
         user_id = message.from_user.id
         session = get_session()
         
         try:
-            apps = session.query(TeamApplication).filter_by(telegram_id=user_id).all()
+            apps = session.query(TeamApplication).filter_by(telegram_id=user_id).order_by(TeamApplication.created_at).all()
             
             if not apps:
                 bot.send_message(
@@ -171,7 +178,7 @@ def register_team_handlers(bot: TeleBot):
         finally:
             session.close()
     
-    @bot.message_handler(func=lambda message: message.text in ["✅ Подтвердить", "❌ Отменить"])
+    @router.text("✅ Подтвердить", "❌ Отменить", state=team_edit_state)
     def handle_confirmation(message: Message):
         """Обработка подтверждения/отмены"""
         user_id = message.from_user.id
@@ -212,7 +219,7 @@ def register_team_handlers(bot: TeleBot):
             
             del team_edit_state[user_id]
     
-    @bot.message_handler(func=lambda message: message.from_user.id in team_registration_state)
+    @router.state(team_registration_state)
     def team_registration_process(message: Message):
         """Процесс регистрации команды"""
         user_id = message.from_user.id
@@ -305,7 +312,7 @@ def register_team_handlers(bot: TeleBot):
                 session.close()
                 del team_registration_state[user_id]
     
-    @bot.message_handler(func=lambda message: message.from_user.id in team_edit_state)
+    @router.state(team_edit_state)
     def handle_team_edit_steps(message: Message):
         """Обработка шагов редактирования/удаления заявки"""
         user_id = message.from_user.id
@@ -418,7 +425,7 @@ def start_new_team_registration(bot: TeleBot, message: Message):
         "👥 Регистрация команды в лигу\n\n"
         "Введите название команды:\n\n"
         "Для отмены отправьте /cancel",
-        reply_markup=ReplyKeyboardRemove()
+        reply_markup=get_keyboard_remove()
     )
 
 
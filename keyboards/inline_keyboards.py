@@ -0,0 +1,58 @@
+"""
+Inline-клавиатуры для бота
+"""
+from typing import Optional
+from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+
+# Префикс callback_data для листания матчей, после него - смещение страницы
+MATCHES_PAGE_PREFIX = 'matches:'
+
+
+def get_matches_pagination(offset: int, page_size: int, total: int, first_offset: int = 0) -> Optional[InlineKeyboardMarkup]:
+    """
+    Кнопки листания списка матчей
+    
+    Номер страницы передаётся в callback_data, поэтому на сервере
+    не нужно хранить, какую страницу смотрит пользователь.
+    
+    Args:
+        offset: Смещение текущей страницы
+        page_size: Матчей на странице
+        total: Всего матчей
+        first_offset: Смещение первой страницы
+    
+    Returns:
+        Клавиатура или None, если листать некуда
+    """
+    buttons = []
+    
+    if offset > first_offset:
+        previous_offset = max(offset - page_size, first_offset)
+        buttons.append(InlineKeyboardButton("◀️ Назад", callback_data=f"{MATCHES_PAGE_PREFIX}{previous_offset}"))
+    
+    if offset + page_size < total:
+        buttons.append(InlineKeyboardButton("Вперёд ▶️", callback_data=f"{MATCHES_PAGE_PREFIX}{offset + page_size}"))
+    
+    if not buttons:
+        return None
+    
+    keyboard = InlineKeyboardMarkup()
+    keyboard.row(*buttons)
+    return keyboard
+
+
+def parse_matches_page(data: str) -> int:
+    """
+    Смещение страницы из callback_data
+    
+    Args:
+        data: callback_data вида 'matches:4'
+    
+    Returns:
+        Смещение (0, если данные повреждены)
+    """
+    try:
+        return max(int(data[len(MATCHES_PAGE_PREFIX):]), 0)
+    except ValueError:
+        return 0
@@ -1,81 +1,146 @@
 """
 Reply-клавиатуры для бота
+
+Клавиатуры строятся один раз при импорте модуля и сразу сериализуются в JSON,
+поэтому при каждой отправке используется готовая строка.
 """
-from telebot.types import ReplyKeyboardMarkup, KeyboardButton
+from typing import Iterable, List
+from telebot.types import ReplyKeyboardMarkup, ReplyKeyboardRemove, KeyboardButton
 
 
-def get_main_menu() -> ReplyKeyboardMarkup:
+class FrozenReplyKeyboard(ReplyKeyboardMarkup):
     """
-    Главное меню бота
+    Неизменяемая reply-клавиатура с заранее подготовленным JSON
+    
+    Args:
+        rows: Ряды кнопок (тексты)
+        kwargs: Параметры ReplyKeyboardMarkup (resize_keyboard и т.п.)
     """
-    keyboard = ReplyKeyboardMarkup(resize_keyboard=True, row_width=1)
     
-    keyboard.add(
-        KeyboardButton("🏒 Матчи"),
-        KeyboardButton("👥 Записать команду в лигу"),
-        KeyboardButton("👤️ Записаться в команду (игрок)")
-    )
+    def __init__(self, rows: Iterable[Iterable[str]], **kwargs):
+        super().__init__(**kwargs)
+        for row in rows:
+            self.keyboard.append([KeyboardButton(text).to_dict() for text in row])
+        self._json = super().to_json()
     
-    return keyboard
+    def add(self, *args, row_width=None):
+        raise TypeError("Клавиатура неизменяема, создайте новую FrozenReplyKeyboard")
+    
+    def row(self, *args):
+        raise TypeError("Клавиатура неизменяема, создайте новую FrozenReplyKeyboard")
+    
+    def to_json(self) -> str:
+        return self._json
+
+
+class FrozenKeyboardRemove(ReplyKeyboardRemove):
+    """Удаление клавиатуры с заранее подготовленным JSON"""
+    
+    def __init__(self):
+        super().__init__()
+        self._json = super().to_json()
+    
+    def to_json(self) -> str:
+        return self._json
+
+
+MAIN_MENU = FrozenReplyKeyboard(
+    [
+        ["🏒 Матчи"],
+        ["👥 Записать команду в лигу"],
+        ["👤️ Записаться в команду (игрок)"]
+    ],
+    resize_keyboard=True
+)
+
+BACK_TO_MENU = FrozenReplyKeyboard([["🏠 Главное меню"]], resize_keyboard=True)
+
+TEAM_MANAGEMENT_MENU = FrozenReplyKeyboard(
+    [
+        ["➕ Добавить команду", "✏️ Изменить заявку"],
+        ["🗑 Удалить заявку", "📋 Мои заявки"],
+        ["🏠 Главное меню"]
+    ],
+    resize_keyboard=True
+)
+
+PLAYER_MANAGEMENT_MENU = FrozenReplyKeyboard(
+    [
+        ["➕ Добавить анкету", "✏️ Изменить анкету"],
+        ["🗑 Удалить анкету", "📋 Мои анкеты"],
+        ["🏠 Главное меню"]
+    ],
+    resize_keyboard=True
+)
+
+CONFIRMATION_KEYBOARD = FrozenReplyKeyboard([["✅ Подтвердить", "❌ Отменить"]], resize_keyboard=True)
+
+POSITION_KEYBOARD = FrozenReplyKeyboard(
+    [
+        ["Нападающий", "Защитник", "Вратарь"],
+        ["Пропустить"]
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=True
+)
+
+# Меню матчей в двух вариантах: кнопка вкл/выкл уведомлений зависит от статуса
+MATCHES_MENU = {
+    enabled: FrozenReplyKeyboard(
+        [
+            ["🔕 Отключить уведомления" if enabled else "🔔 Включить уведомления"],
+            ["➡️ Следующие 3 матча"],
+            ["📊 Турнирная таблица", "🏆 Лучшие игроки"],
+            ["🏠 Главное меню"]
+        ],
+        resize_keyboard=True
+    )
+    for enabled in (True, False)
+}
+
+KEYBOARD_REMOVE = FrozenKeyboardRemove()
+
+
+def get_main_menu() -> ReplyKeyboardMarkup:
+    """
+    Главное меню бота
+    """
+    return MAIN_MENU
 
 
 def get_back_to_menu() -> ReplyKeyboardMarkup:
     """
     Кнопка возврата в главное меню
     """
-    keyboard = ReplyKeyboardMarkup(resize_keyboard=True)
-    keyboard.add(KeyboardButton("🏠 Главное меню"))
-    
-    return keyboard
+    return BACK_TO_MENU
 
 
 def get_team_management_menu() -> ReplyKeyboardMarkup:
     """
     Меню управления заявками команд
     """
-    keyboard = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
-    keyboard.add(
-        KeyboardButton("➕ Добавить команду"),
-        KeyboardButton("✏️ Изменить заявку")
-    )
-    keyboard.add(
-        KeyboardButton("🗑 Удалить заявку"),
-        KeyboardButton("📋 Мои заявки")
-    )
-    keyboard.add(KeyboardButton("🏠 Главное меню"))
-    
-    return keyboard
+    return TEAM_MANAGEMENT_MENU
 
 
 def get_player_management_menu() -> ReplyKeyboardMarkup:
     """
     Меню управления анкетами игроков
     """
-    keyboard = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
-    keyboard.add(
-        KeyboardButton("➕ Добавить анкету"),
-        KeyboardButton("✏️ Изменить анкету")
-    )
-    keyboard.add(
-        KeyboardButton("🗑 Удалить анкету"),
-        KeyboardButton("📋 Мои анкеты")
-    )
-    keyboard.add(KeyboardButton("🏠 Главное меню"))
-    
-    return keyboard
+    return PLAYER_MANAGEMENT_MENU
 
 
 def get_confirmation_keyboard() -> ReplyKeyboardMarkup:
     """
     Клавиатура подтверждения действия
     """
-    keyboard = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
-    keyboard.add(
-        KeyboardButton("✅ Подтвердить"),
-        KeyboardButton("❌ Отменить")
-    )
-    
-    return keyboard
+    return CONFIRMATION_KEYBOARD
+
+
+def get_position_keyboard() -> ReplyKeyboardMarkup:
+    """
+    Клавиатура выбора позиции
+    """
+    return POSITION_KEYBOARD
 
 
 def get_matches_menu(notifications_enabled: bool) -> ReplyKeyboardMarkup:
@@ -85,19 +150,49 @@ def get_matches_menu(notifications_enabled: bool) -> ReplyKeyboardMarkup:
     Args:
         notifications_enabled: Включены ли уведомления у пользователя
     """
-    keyboard = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
+    return MATCHES_MENU[bool(notifications_enabled)]
+
+
+def get_keyboard_remove() -> ReplyKeyboardRemove:
+    """
+    Удаление reply-клавиатуры
+    """
+    return KEYBOARD_REMOVE
+
+
+# Клавиатура выбора команды для последнего снимка списка команд
+_teams_keyboard = (None, None)  # (список команд, клавиатура)
+
+
+def get_teams_keyboard(teams: List[dict]) -> ReplyKeyboardMarkup:
+    """
+    Клавиатура выбора команды
     
-    # Кнопка вкл/выкл уведомлений в зависимости от статуса
-    if notifications_enabled:
-        keyboard.add(KeyboardButton("🔕 Отключить уведомления"))
-    else:
-        keyboard.add(KeyboardButton("🔔 Включить уведомления"))
+    Клавиатура строится один раз для каждого снимка списка команд:
+    пока кэш API не обновился, возвращается готовый объект.
     
-    keyboard.add(KeyboardButton("➡️ Следующие 3 матча"))
-    keyboard.add(
-        KeyboardButton("📊 Турнирная таблица"),
-        KeyboardButton("🏆 Лучшие игроки")
-    )
-    keyboard.add(KeyboardButton("🏠 Главное меню"))
+    Args:
+        teams: Список команд из API
+    """
+    global _teams_keyboard
+    
+    cached_teams, keyboard = _teams_keyboard
+    if cached_teams is not teams:
+        keyboard = build_teams_keyboard(teams)
+        _teams_keyboard = (teams, keyboard)
     
     return keyboard
+
+
+def build_teams_keyboard(teams: List[dict]) -> ReplyKeyboardMarkup:
+    """
+    Новая клавиатура с кнопками команд (например, найденных по части названия)
+    
+    Args:
+        teams: Команды для кнопок
+    """
+    return FrozenReplyKeyboard(
+        [[team['name']] for team in teams] + [["Пропустить"]],
+        resize_keyboard=True,
+        one_time_keyboard=True
+    )
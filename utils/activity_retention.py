@@ -0,0 +1,149 @@
+"""
+Архивация старых записей активности пользователей
+
+Каждое нажатие пишет строку в user_activity, а метрики смотрят не дальше
+30 дней. Записи старше ACTIVITY_RETENTION_DAYS переносятся в сжатые файлы
+(по файлу на день, JSON Lines в gzip) и удаляются из таблицы небольшими
+пачками: каждая пачка - отдельная короткая транзакция, бот продолжает
+писать активность во время архивации.
+
+Пачка сначала дописывается в архив и только потом удаляется из БД, поэтому
+при сбое записи не теряются: в худшем случае они попадут в архив дважды.
+"""
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+from database import get_session, UserActivity
+from config import config
+from utils.runtime_stats import register_stats_provider
+
+
+class ActivityRetention:
+    """Перенос старой активности из user_activity в архивные файлы"""
+    
+    def __init__(self, retention_days: int, archive_dir: str, batch_size: int, batch_pause: float):
+        """
+        Args:
+            retention_days: Сколько дней хранить активность в БД (0 - не архивировать)
+            archive_dir: Каталог архивных файлов
+            batch_size: Сколько записей удалять в одной транзакции
+            batch_pause: Пауза между пачками (секунды), чтобы не занимать БД подряд
+        """
+        self.retention_days = retention_days
+        self.archive_dir = archive_dir
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self._stats_lock = threading.Lock()
+        self._runs = 0
+        self._archived_total = 0
+        self._last_run = None
+    
+    def get_archive_path(self, day) -> str:
+        """Путь к архиву записей за день"""
+        return os.path.join(self.archive_dir, f"user_activity-{day.isoformat()}.jsonl.gz")
+    
+    def _write_archive(self, activities):
+        """Дописывание записей в архивы по дням"""
+        by_day = {}
+        for activity in activities:
+            by_day.setdefault(activity.timestamp.date(), []).append(activity)
+        
+        for day, day_activities in by_day.items():
+            # Дозапись добавляет в файл новый gzip-блок, gzip читает такие файлы целиком
+            with gzip.open(self.get_archive_path(day), 'at', encoding='utf-8') as archive:
+                for activity in day_activities:
+                    archive.write(json.dumps({
+                        'id': activity.id,
+                        'telegram_id': activity.telegram_id,
+                        'username': activity.username,
+                        'action': activity.action,
+                        'details': activity.details,
+                        'timestamp': activity.timestamp.isoformat(),
+                    }, ensure_ascii=False) + "\n")
+    
+    def run(self, should_stop: Optional[Callable[[], bool]] = None) -> int:
+        """
+        Архивация записей старше горизонта хранения
+        
+        Args:
+            should_stop: Функция, возвращающая True, если пора прерваться
+                         (оставшиеся записи заархивируются при следующем запуске)
+        
+        Returns:
+            Количество перенесённых в архив записей
+        """
+        if self.retention_days <= 0:
+            return 0
+        
+        os.makedirs(self.archive_dir, exist_ok=True)
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        started_at = time.monotonic()
+        archived = 0
+        
+        session = get_session()
+        try:
+            while should_stop is None or not should_stop():
+                activities = session.query(UserActivity).filter(
+                    UserActivity.timestamp < cutoff
+                ).order_by(UserActivity.timestamp).limit(self.batch_size).all()
+                if not activities:
+                    break
+                
+                self._write_archive(activities)
+                session.query(UserActivity).filter(
+                    UserActivity.id.in_([activity.id for activity in activities])
+                ).delete(synchronize_session=False)
+                session.commit()
+                session.expunge_all()
+                
+                archived += len(activities)
+                if len(activities) < self.batch_size:
+                    break
+                time.sleep(self.batch_pause)
+        except Exception as e:
+            session.rollback()
+            print(f"❌ Ошибка при архивации активности: {e}")
+        finally:
+            session.close()
+        
+        with self._stats_lock:
+            self._runs += 1
+            self._archived_total += archived
+            self._last_run = {
+                'at': datetime.utcnow().isoformat(timespec='seconds'),
+                'archived': archived,
+                'duration_ms': round((time.monotonic() - started_at) * 1000, 1),
+            }
+        
+        if archived:
+            print(f"🗄 Активность старше {self.retention_days} дн. перенесена в архив: {archived} записей")
+        return archived
+    
+    def get_stats(self) -> dict:
+        """
+        Статистика архивации
+        
+        Returns:
+            Горизонт хранения, число запусков и перенесённых записей
+        """
+        with self._stats_lock:
+            return {
+                'retention_days': self.retention_days,
+                'runs': self._runs,
+                'archived_total': self._archived_total,
+                'last_run': self._last_run,
+            }
+
+
+# Глобальный экземпляр архивации активности
+activity_retention = ActivityRetention(
+    config.ACTIVITY_RETENTION_DAYS,
+    config.ACTIVITY_ARCHIVE_DIR,
+    config.ACTIVITY_RETENTION_BATCH_SIZE,
+    config.MIGRATION_BATCH_PAUSE
+)
+register_stats_provider('activity_retention', activity_retention.get_stats)
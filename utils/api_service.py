@@ -6,6 +6,7 @@ from typing import List, Dict, Optional
 from config import config
 from datetime import datetime
 import pytz
+from utils.team_index import TeamIndex
 
 
 class APIService:
@@ -16,6 +17,7 @@ class APIService:
         self.games_url = config.API_GAMES
         self._teams_cache = None
         self._games_cache = None
+        self._team_index = TeamIndex([])
     
     def get_teams(self, force_refresh: bool = False) -> List[Dict]:
         """
@@ -48,11 +50,7 @@ class APIService:
         Returns:
             Информация о команде или None
         """
-        teams = self.get_teams()
-        for team in teams:
-            if team.get('id') == team_id:
-                return team
-        return None
+        return self.get_team_index().by_id.get(team_id)
     
     def get_team_by_slug(self, slug: str) -> Optional[Dict]:
         """
@@ -64,11 +62,48 @@ class APIService:
         Returns:
             Информация о команде или None
         """
-        teams = self.get_teams()
-        for team in teams:
-            if team.get('slug') == slug:
-                return team
-        return None
+        return self.get_team_index().by_slug.get(slug)
+    
+    def get_team_by_name(self, name: str) -> Optional[Dict]:
+        """
+        Получение команды по названию (без учёта регистра и кавычек)
+        
+        Args:
+            name: Название команды
+            
+        Returns:
+            Информация о команде или None
+        """
+        return self.get_team_index().get_by_name(name)
+    
+    def search_teams(self, query: str) -> List[Dict]:
+        """
+        Поиск команд по названию или его началу
+        
+        Args:
+            query: Текст, введённый пользователем
+            
+        Returns:
+            Одна команда при точном совпадении, иначе все подходящие по началу
+        """
+        return self.get_team_index().search(query)
+    
+    def get_team_index(self, teams: Optional[List[Dict]] = None) -> TeamIndex:
+        """
+        Индекс текущего снимка списка команд
+        
+        Индекс перестраивается, только когда кэш команд заменён новым списком.
+        
+        Args:
+            teams: Уже загруженный список команд (без него список берётся
+                   через get_teams(), который может обратиться к API)
+        """
+        if teams is None:
+            teams = self.get_teams()
+        index = self._team_index
+        if index.teams is not teams:
+            index = self._team_index = TeamIndex(teams)
+        return index
     
     def get_games(self, force_refresh: bool = False) -> List[Dict]:
         """
@@ -118,11 +153,26 @@ class APIService:
             Список предстоящих игр с информацией о командах
         """
         games = self.get_games(force_refresh=True)
+        return self.build_upcoming_games(games)
+    
+    def build_upcoming_games(self, games: List[Dict], teams: Optional[List[Dict]] = None) -> List[Dict]:
+        """
+        Отбор будущих игр из списка и дополнение их информацией о командах
+        
+        Args:
+            games: Список игр из API
+            teams: Уже загруженный список команд (asyncio-рантайм передаёт его,
+                   чтобы не выполнять синхронный запрос в event loop)
+            
+        Returns:
+            Список предстоящих игр, отсортированный по времени
+        """
         upcoming = []
         
         # Используем московское время
         moscow_tz = pytz.timezone('Europe/Moscow')
         now = datetime.now(moscow_tz)
+        team_index = self.get_team_index(teams)
         
         for game in games:
             try:
@@ -134,8 +184,8 @@ class APIService:
                 # Проверяем, что игра ещё не прошла
                 if game_datetime > now:
                     # Добавляем информацию о командах
-                    team_a = self.get_team_by_id(game['team_a_id'])
-                    team_b = self.get_team_by_id(game['team_b_id'])
+                    team_a = team_index.by_id.get(game['team_a_id'])
+                    team_b = team_index.by_id.get(game['team_b_id'])
                     
                     game_info = game.copy()
                     game_info['team_a'] = team_a
@@ -0,0 +1,98 @@
+"""
+Асинхронный клиент API лиги для asyncio-рантайма бота
+"""
+from typing import List, Dict, Optional
+import aiohttp
+from utils.api_service import APIService, api_service
+
+
+class AsyncAPIService:
+    """
+    Асинхронная загрузка данных API Time of the Stars
+    
+    Кэш общий с синхронным APIService, поэтому форматирование сообщений
+    и поиск команд работают с тем же снимком данных.
+    """
+    
+    def __init__(self, service: APIService):
+        self.service = service
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Ленивое создание HTTP-сессии (внутри работающего event loop)"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        return self._session
+    
+    async def _fetch_json(self, url: str):
+        session = await self._get_session()
+        async with session.get(url) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+    
+    async def get_teams(self, force_refresh: bool = False) -> List[Dict]:
+        """
+        Получение списка команд
+        
+        Args:
+            force_refresh: Принудительно обновить кэш
+        
+        Returns:
+            Список команд
+        """
+        if self.service._teams_cache is None or force_refresh:
+            try:
+                self.service._teams_cache = await self._fetch_json(self.service.teams_url)
+            except Exception as e:
+                print(f"❌ Ошибка при получении команд: {e}")
+                return []
+        
+        return self.service._teams_cache or []
+    
+    async def get_games(self, force_refresh: bool = False) -> List[Dict]:
+        """
+        Получение списка игр
+        
+        Args:
+            force_refresh: Принудительно обновить кэш
+        
+        Returns:
+            Список игр
+        """
+        if self.service._games_cache is None or force_refresh:
+            try:
+                self.service._games_cache = await self._fetch_json(self.service.games_url)
+            except Exception as e:
+                print(f"❌ Ошибка при получении игр: {e}")
+                return []
+        
+        return self.service._games_cache or []
+    
+    async def get_upcoming_games(self, days_ahead: int = 7) -> List[Dict]:
+        """
+        Получение предстоящих игр
+        
+        Args:
+            days_ahead: На сколько дней вперед смотреть
+        
+        Returns:
+            Список предстоящих игр с информацией о командах
+        """
+        # Команды для подстановки названий загружаются без блокировки и передаются явно:
+        # если загрузка не удалась, синхронный клиент не должен повторять её в event loop
+        teams = await self.get_teams()
+        games = await self.get_games(force_refresh=True)
+        return self.service.build_upcoming_games(games, teams)
+    
+    def format_game_message(self, game: Dict) -> str:
+        """Форматирование информации об игре (без обращений к сети)"""
+        return self.service.format_game_message(game)
+    
+    async def close(self):
+        """Закрытие HTTP-сессии"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+# Глобальный экземпляр асинхронного клиента
+async_api_service = AsyncAPIService(api_service)
@@ -0,0 +1,325 @@
+"""
+Выполнение обработчиков telebot с сохранением порядка внутри чата
+
+Обновления одного чата выполняются строго по очереди, разные чаты
+обрабатываются параллельно в общем пуле потоков.
+"""
+import threading
+import time
+import traceback
+from collections import deque
+from queue import Queue
+from typing import Callable, Hashable, Optional
+import telebot
+from telebot.types import Chat, Message
+from config import config
+from database import unit_of_work
+from utils.outbox import create_outbox
+from utils.runtime_stats import register_stats_provider
+from utils.sql_stats import sql_stats
+
+
+# Ответ вместо отменённых сообщений обработчика, завершившегося ошибкой
+TASK_ERROR_TEXT = "❌ Не удалось выполнить действие. Попробуйте ещё раз."
+
+
+class ChatOrderedExecutor:
+    """
+    Пул потоков с отдельной очередью задач для каждого чата
+    
+    В общую очередь попадают не задачи, а чаты, у которых есть работа.
+    Поток берёт чат, выполняет одну его задачу и, если задачи остались,
+    возвращает чат в конец общей очереди. Поэтому один чат никогда
+    не выполняется в двух потоках сразу и не занимает пул целиком.
+    """
+    
+    def __init__(self, num_workers: int, on_exception: Optional[Callable[[Exception], bool]] = None):
+        """
+        Args:
+            num_workers: Количество потоков
+            on_exception: Обработчик ошибок задачи; возвращает True, если ошибка обработана
+        """
+        self.num_workers = num_workers
+        self.on_exception = on_exception
+        self._chat_queues = {}  # ключ чата -> deque[(время постановки, функция, args, kwargs)]
+        self._ready = Queue()  # ключи чатов, у которых есть задачи
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)  # сигнал, что все очереди пусты
+        
+        # Метрики
+        self._pending = 0
+        self._max_pending = 0
+        self._processed = 0
+        self._failed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._recent_waits = deque(maxlen=1000)
+        
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"chat-worker-{i}", daemon=True)
+            for i in range(num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+    
+    def submit(self, key: Hashable, func: Callable, *args, **kwargs):
+        """
+        Постановка задачи в очередь чата
+        
+        Args:
+            key: Ключ очереди (обычно ID чата)
+            func: Функция обработчика
+        """
+        with self._lock:
+            chat_queue = self._chat_queues.get(key)
+            is_new = chat_queue is None
+            if is_new:
+                chat_queue = self._chat_queues[key] = deque()
+            chat_queue.append((time.monotonic(), func, args, kwargs))
+            
+            self._pending += 1
+            self._max_pending = max(self._max_pending, self._pending)
+        
+        # Чат попадает в общую очередь, только если он ещё не ждёт и не выполняется
+        if is_new:
+            self._ready.put(key)
+    
+    def _worker(self):
+        while True:
+            key = self._ready.get()
+            
+            with self._lock:
+                enqueued_at, func, args, kwargs = self._chat_queues[key].popleft()
+                self._pending -= 1
+            
+            wait = time.monotonic() - enqueued_at
+            failed = False
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                failed = True
+                if not (self.on_exception and self.on_exception(e)):
+                    print(f"❌ Ошибка в обработчике: {e}")
+                    traceback.print_exc()
+            
+            with self._lock:
+                self._processed += 1
+                self._failed += failed
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+                self._recent_waits.append(wait)
+                
+                if self._chat_queues[key]:
+                    has_more = True
+                else:
+                    del self._chat_queues[key]
+                    has_more = False
+                    if not self._chat_queues:
+                        self._idle.notify_all()
+            
+            if has_more:
+                self._ready.put(key)
+    
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        Ожидание выполнения всех поставленных задач
+        
+        Args:
+            timeout: Максимальное время ожидания (секунды), None - без ограничения
+        
+        Returns:
+            True, если все очереди опустели до истечения времени
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._chat_queues, timeout)
+    
+    def get_stats(self) -> dict:
+        """
+        Статистика очередей
+        
+        Returns:
+            Глубина очередей, число задач и время ожидания (мс)
+        """
+        with self._lock:
+            chat_depths = [len(chat_queue) for chat_queue in self._chat_queues.values()]
+            recent = sorted(self._recent_waits)
+            processed = self._processed
+            
+            return {
+                'workers': self.num_workers,
+                'pending': self._pending,
+                'max_pending': self._max_pending,
+                'active_chats': len(chat_depths),
+                'max_chat_depth': max(chat_depths, default=0),
+                'processed': processed,
+                'failed': self._failed,
+                'wait_avg_ms': round(self._wait_total / processed * 1000, 2) if processed else 0.0,
+                'wait_p95_ms': round(recent[int(len(recent) * 0.95)] * 1000, 2) if recent else 0.0,
+                'wait_max_ms': round(self._wait_max * 1000, 2),
+            }
+
+
+def get_chat_key(update) -> Hashable:
+    """
+    Ключ очереди для объекта обновления
+    
+    Args:
+        update: Message, CallbackQuery или другой объект Telegram
+    
+    Returns:
+        ID чата, ID пользователя или None для обновлений без отправителя
+    """
+    chat = getattr(update, 'chat', None)
+    if chat is None:
+        message = getattr(update, 'message', None)
+        chat = getattr(message, 'chat', None)
+    if chat is not None:
+        return chat.id
+    
+    user = getattr(update, 'from_user', None)
+    return user.id if user is not None else None
+
+
+def get_update_chat_key(update) -> Hashable:
+    """
+    Ключ очереди для целого обновления (тот же, что у его обработчиков)
+    
+    Args:
+        update: Update от Telegram
+    
+    Returns:
+        Ключ очереди чата
+    """
+    for name, value in vars(update).items():
+        if name != 'update_id' and value is not None:
+            return get_chat_key(value)
+    return None
+
+
+def _buffered_message(chat_id: int, text: str) -> Message:
+    """Заготовка Message для сообщения, которое ещё лежит в буфере"""
+    return Message(
+        message_id=None,
+        from_user=None,
+        date=int(time.time()),
+        chat=Chat(chat_id, 'private'),
+        content_type='text',
+        options={'text': text},
+        json_string=None
+    )
+
+
+class OrderedTeleBot(telebot.TeleBot):
+    """
+    TeleBot, выполняющий обработчики в ChatOrderedExecutor
+    
+    Стандартный пул telebot берёт задачи из одной общей очереди, поэтому
+    два быстрых сообщения одного пользователя могут обработаться в разном
+    порядке и сломать пошаговую регистрацию.
+    """
+    
+    def __init__(self, token: str, num_threads: int = None, update_tracker=None, **kwargs):
+        """
+        Args:
+            token: Токен бота
+            num_threads: Количество потоков (по умолчанию config.WORKER_THREADS)
+            update_tracker: UpdateTracker для отбрасывания повторных обновлений
+        """
+        # Собственный пул telebot не нужен: обновления только ставятся в очереди
+        kwargs['threaded'] = False
+        super().__init__(token, **kwargs)
+        
+        self.executor = ChatOrderedExecutor(
+            num_threads or config.WORKER_THREADS,
+            on_exception=self._on_task_exception
+        )
+        register_stats_provider('executor', self.executor.get_stats)
+        self.update_tracker = update_tracker
+        
+        # Сообщения, которые обработчик отправляет в свой чат, склеиваются
+        self.outbox = create_outbox(self._send_message_now, config.OUTBOX_ENABLED)
+        self._task_context = threading.local()
+    
+    def _on_task_exception(self, exception: Exception) -> bool:
+        if self.exception_handler is not None:
+            return bool(self.exception_handler.handle(exception))
+        return False
+    
+    def process_new_updates(self, updates):
+        if self.update_tracker is None or not updates:
+            return super().process_new_updates(updates)
+        
+        # offset двигаем по полученным обновлениям (и по повторам), иначе getUpdates
+        # будет возвращать их снова; следующий запрос подтверждает Telegram всю пачку,
+        # поэтому обновления в очередях при аварийном завершении теряются
+        self.last_update_id = max(self.last_update_id, max(update.update_id for update in updates))
+        updates = self.update_tracker.filter(updates)
+        super().process_new_updates(updates)
+        
+        # Отметка об обработке встаёт в очередь чата после его обработчиков
+        # (и для обновлений, на которые не нашлось обработчика)
+        update_ids = {}
+        for update in updates:
+            update_ids.setdefault(get_update_chat_key(update), []).append(update.update_id)
+        for key, ids in update_ids.items():
+            self.executor.submit(key, self.update_tracker.complete, ids)
+    
+    def _exec_task(self, task, *args, **kwargs):
+        key = get_chat_key(args[0]) if args else None
+        self.executor.submit(key, self.run_task, key, task, *args, **kwargs)
+    
+    def run_task(self, key, task, *args, **kwargs):
+        """
+        Выполнение обработчика в текущем потоке
+        
+        Обработчик работает в одной сессии БД (unit_of_work), его
+        сообщения в свой чат уходят только после успешной фиксации.
+        Если обработчик или фиксация завершились ошибкой, накопленные
+        ответы отменяются и пользователь получает сообщение об ошибке.
+        
+        Вызывается из очередей чатов; asyncio-рантайм вызывает его
+        напрямую для синхронных обработчиков (bot_async.py).
+        
+        Args:
+            key: Ключ чата (get_chat_key), в который обработчик отвечает
+            task: Обработчик
+        """
+        # Маршрутизатор уточнит имя единицы работы именем обработчика
+        name = getattr(task, '__name__', 'task')
+        if self.outbox is None:
+            with sql_stats.unit(name), unit_of_work():
+                task(*args, **kwargs)
+            return
+        
+        self._task_context.chat_id = key
+        try:
+            with sql_stats.unit(name), unit_of_work():
+                task(*args, **kwargs)
+        except Exception:
+            self._task_context.chat_id = None
+            if self.outbox.discard(key) and key is not None:
+                try:
+                    self._send_message_now(key, TASK_ERROR_TEXT)
+                except Exception as e:
+                    print(f"❌ Ошибка при отправке сообщения в чат {key}: {e}")
+            raise
+        
+        self._task_context.chat_id = None
+        self.outbox.flush(key)
+    
+    def send_message(self, chat_id, text, *args, **kwargs):
+        """
+        Отправка сообщения
+        
+        Текст в чат текущего обработчика уходит через буфер склейки.
+        Реальное сообщение появится только после завершения обработчика,
+        поэтому возвращается заготовка с chat и text, но без message_id.
+        Остальные сообщения (рассылки, другие чаты) отправляются сразу.
+        """
+        if self.outbox is not None and not args and getattr(self._task_context, 'chat_id', None) == chat_id:
+            self.outbox.send_message(chat_id, text, **kwargs)
+            return _buffered_message(chat_id, text)
+        return self._send_message_now(chat_id, text, *args, **kwargs)
+    
+    def _send_message_now(self, chat_id, text, *args, **kwargs):
+        return super().send_message(chat_id, text, *args, **kwargs)
@@ -1,10 +1,13 @@
 """
 Система метрик и аналитики активности пользователей
+
+Запись активности идёт через основной движок, аналитические запросы -
+через движок чтения (реплика или соединения SQLite только для чтения).
 """
 from datetime import datetime, timedelta
 from typing import Optional
-from sqlalchemy import func, and_
-from database import get_session, User, UserActivity
+from sqlalchemy import func, and_, insert, select, update
+from database import defer_write, get_async_session, get_read_session, get_async_read_session, User, UserActivity
 from telebot.types import Message
 
 
@@ -12,7 +15,8 @@ class MetricsService:
     """Сервис для сбора и анализа метрик"""
     
     @staticmethod
-    def log_activity(telegram_id: int, username: Optional[str], action: str, details: Optional[str] = None):
+    def log_activity(telegram_id: int, username: Optional[str], action: str, details: Optional[str] = None,
+                     update_user: bool = True):
         """
         Логирование активности пользователя
         
@@ -21,30 +25,36 @@ class MetricsService:
             username: Username пользователя
             action: Тип действия
             details: Дополнительная информация
+            update_user: Обновить счётчик и время активности пользователя
+                         (False, если это уже сделал upsert при /start)
         """
-        session = get_session()
-        try:
+        def write(session):
             # Создаем запись активности
-            activity = UserActivity(
+            session.execute(insert(UserActivity).values(
                 telegram_id=telegram_id,
                 username=username,
                 action=action,
                 details=details
-            )
-            session.add(activity)
-            
-            # Обновляем счетчик и время последней активности у пользователя
-            user = session.query(User).filter_by(telegram_id=telegram_id).first()
-            if user:
-                user.last_activity = datetime.utcnow()
-                user.total_interactions += 1
+            ))
             
-            session.commit()
+            # Обновляем счетчик и время последней активности одним UPDATE,
+            # без повторной загрузки пользователя (он уже есть в контексте обновления)
+            if update_user:
+                session.execute(
+                    update(User)
+                    .where(User.telegram_id == telegram_id)
+                    .values(
+                        last_activity=datetime.utcnow(),
+                        total_interactions=User.total_interactions + 1
+                    )
+                )
+        
+        # Внутри обработки обновления запись попадает в её транзакцию
+        # и выполняется в конце, перед единственной фиксацией
+        try:
+            defer_write(write)
         except Exception as e:
-            session.rollback()
             print(f"❌ Ошибка при логировании активности: {e}")
-        finally:
-            session.close()
     
     @staticmethod
     def track_message(message: Message, action: str):
@@ -66,10 +76,64 @@ class MetricsService:
             details=text
         )
     
+    @staticmethod
+    async def log_activity_async(telegram_id: int, username: Optional[str], action: str, details: Optional[str] = None,
+                                 update_user: bool = True):
+        """
+        Логирование активности пользователя для asyncio-рантайма
+        
+        Args:
+            telegram_id: ID пользователя в Telegram
+            username: Username пользователя
+            action: Тип действия
+            details: Дополнительная информация
+            update_user: Обновить счётчик и время активности пользователя
+        """
+        async with get_async_session() as session:
+            try:
+                session.add(UserActivity(
+                    telegram_id=telegram_id,
+                    username=username,
+                    action=action,
+                    details=details
+                ))
+                
+                # Обновляем счетчик одним UPDATE без предварительного SELECT
+                if update_user:
+                    await session.execute(
+                        update(User)
+                        .where(User.telegram_id == telegram_id)
+                        .values(
+                            last_activity=datetime.utcnow(),
+                            total_interactions=User.total_interactions + 1
+                        )
+                    )
+                
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                print(f"❌ Ошибка при логировании активности: {e}")
+    
+    @staticmethod
+    async def track_message_async(message: Message, action: str):
+        """
+        Отслеживание сообщения пользователя для asyncio-рантайма
+        
+        Args:
+            message: Объект сообщения от Telegram
+            action: Описание действия
+        """
+        await MetricsService.log_activity_async(
+            telegram_id=message.from_user.id,
+            username=message.from_user.username,
+            action=action,
+            details=message.text[:100] if message.text else None
+        )
+    
     @staticmethod
     def get_total_users() -> int:
         """Получить общее количество пользователей"""
-        session = get_session()
+        session = get_read_session()
         try:
             return session.query(User).count()
         finally:
@@ -86,7 +150,7 @@ class MetricsService:
         Returns:
             Количество активных пользователей
         """
-        session = get_session()
+        session = get_read_session()
         try:
             cutoff_date = datetime.utcnow() - timedelta(days=days)
             return session.query(User).filter(
@@ -106,7 +170,7 @@ class MetricsService:
         Returns:
             Количество новых пользователей
         """
-        session = get_session()
+        session = get_read_session()
         try:
             cutoff_date = datetime.utcnow() - timedelta(days=days)
             return session.query(User).filter(
@@ -118,7 +182,7 @@ class MetricsService:
     @staticmethod
     def get_subscribers_count() -> int:
         """Получить количество пользователей с включенными уведомлениями"""
-        session = get_session()
+        session = get_read_session()
         try:
             return session.query(User).filter_by(notifications_enabled=True).count()
         finally:
@@ -136,7 +200,7 @@ class MetricsService:
         Returns:
             Список кортежей (действие, количество)
         """
-        session = get_session()
+        session = get_read_session()
         try:
             cutoff_date = datetime.utcnow() - timedelta(days=days)
             results = session.query(
@@ -165,7 +229,7 @@ class MetricsService:
         Returns:
             Количество взаимодействий
         """
-        session = get_session()
+        session = get_read_session()
         try:
             cutoff_date = datetime.utcnow() - timedelta(days=days)
             return session.query(UserActivity).filter(
@@ -185,7 +249,7 @@ class MetricsService:
         Returns:
             Словарь {час: количество}
         """
-        session = get_session()
+        session = get_read_session()
         try:
             cutoff_date = datetime.utcnow() - timedelta(days=days)
             activities = session.query(UserActivity).filter(
@@ -212,7 +276,7 @@ class MetricsService:
         Returns:
             Процент удержания (0-100)
         """
-        session = get_session()
+        session = get_read_session()
         try:
             cutoff_date = datetime.utcnow() - timedelta(days=days)
             
@@ -236,6 +300,65 @@ class MetricsService:
         finally:
             session.close()
 
+    
+    @staticmethod
+    async def get_dashboard_async(top_actions_limit: int = 10) -> dict:
+        """
+        Метрики для страницы /metrics админ-панели без блокировки event loop
+        
+        Все запросы выполняются в одной асинхронной сессии движка чтения,
+        поэтому не занимают соединения, через которые пишет бот.
+        
+        Args:
+            top_actions_limit: Сколько действий вернуть в топе за 7 дней
+            
+        Returns:
+            Словарь с количеством пользователей, активностью и удержанием
+        """
+        now = datetime.utcnow()
+        cutoff_7d = now - timedelta(days=7)
+        cutoff_30d = now - timedelta(days=30)
+        
+        def count_users(*conditions):
+            return select(func.count(User.id)).where(*conditions)
+        
+        def count_activity(cutoff):
+            return select(func.count(UserActivity.id)).where(UserActivity.timestamp >= cutoff)
+        
+        async with get_async_read_session() as session:
+            async def scalar(statement) -> int:
+                return (await session.execute(statement)).scalar() or 0
+            
+            async def retention(cutoff) -> float:
+                # Пользователи, зарегистрированные до cutoff, и активные из них
+                old_users = await scalar(count_users(User.created_at < cutoff))
+                if old_users == 0:
+                    return 0.0
+                active_old_users = await scalar(count_users(User.created_at < cutoff, User.last_activity >= cutoff))
+                return (active_old_users / old_users) * 100
+            
+            top_actions = (await session.execute(
+                select(UserActivity.action, func.count(UserActivity.id).label('count'))
+                .where(UserActivity.timestamp >= cutoff_7d)
+                .group_by(UserActivity.action)
+                .order_by(func.count(UserActivity.id).desc())
+                .limit(top_actions_limit)
+            )).all()
+            
+            return {
+                'total_users': await scalar(select(func.count(User.id))),
+                'active_7d': await scalar(count_users(User.last_activity >= cutoff_7d)),
+                'active_30d': await scalar(count_users(User.last_activity >= cutoff_30d)),
+                'new_7d': await scalar(count_users(User.created_at >= cutoff_7d)),
+                'new_30d': await scalar(count_users(User.created_at >= cutoff_30d)),
+                'subscribers': await scalar(count_users(User.notifications_enabled == True)),
+                'interactions_7d': await scalar(count_activity(cutoff_7d)),
+                'interactions_30d': await scalar(count_activity(cutoff_30d)),
+                'retention_7d': await retention(cutoff_7d),
+                'retention_30d': await retention(cutoff_30d),
+                'top_actions': top_actions,
+            }
+
 
 # Глобальный экземпляр сервиса метрик
 metrics_service = MetricsService()
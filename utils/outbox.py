@@ -0,0 +1,188 @@
+"""
+Склейка исходящих сообщений в один чат
+
+Текстовые сообщения, которые обработчик отправляет в свой чат, копятся
+в буфере и уходят после завершения обработчика, склеенные в как можно
+меньше вызовов Bot API (до лимита Telegram в 4096 символов; длина
+считается, как в Telegram, в кодовых единицах UTF-16). Если
+обработчик завершился ошибкой (в том числе при фиксации транзакции),
+накопленные сообщения не отправляются: пользователь не увидит
+"✅ сохранено" для несохранённых данных.
+"""
+import threading
+from typing import Any, Callable, Optional
+from telebot.types import InlineKeyboardMarkup
+from utils.runtime_stats import register_stats_provider
+
+
+# Лимит длины текста сообщения в Telegram
+MAX_MESSAGE_LENGTH = 4096
+
+# Разделитель склеенных сообщений
+SEPARATOR = "\n\n"
+
+
+def message_length(text: str) -> int:
+    """
+    Длина текста так, как её считает Telegram: в кодовых единицах UTF-16
+    
+    Эмодзи вне базовой плоскости Unicode (🏒, 📅) занимают две единицы,
+    поэтому len() занижает длину текста с эмодзи.
+    
+    Args:
+        text: Текст сообщения
+    
+    Returns:
+        Длина в кодовых единицах UTF-16
+    """
+    return len(text.encode('utf-16-le')) // 2
+
+
+_SEPARATOR_LENGTH = message_length(SEPARATOR)
+
+
+class _Batch:
+    """Сообщения одного чата, которые уйдут одним вызовом API"""
+    
+    __slots__ = ('texts', 'length', 'options', 'reply_markup')
+    
+    def __init__(self, text: str, options: dict, reply_markup: Any):
+        self.texts = [text]
+        self.length = message_length(text)  # в кодовых единицах UTF-16
+        self.options = options
+        self.reply_markup = reply_markup
+    
+    def accepts(self, text: str, options: dict, reply_markup: Any, max_length: int) -> bool:
+        """Можно ли дописать сообщение в эту пачку"""
+        # Inline-кнопки относятся к своему тексту, такое сообщение не дополняем
+        if isinstance(self.reply_markup, InlineKeyboardMarkup):
+            return False
+        # Сообщение с inline-кнопками не должно заменить reply-клавиатуру пачки
+        if isinstance(reply_markup, InlineKeyboardMarkup) and self.reply_markup is not None:
+            return False
+        return options == self.options and self.length + _SEPARATOR_LENGTH + message_length(text) <= max_length
+    
+    def add(self, text: str, reply_markup: Any):
+        self.texts.append(text)
+        self.length += _SEPARATOR_LENGTH + message_length(text)
+        # Reply-клавиатура относится к чату: действует последняя присланная
+        if reply_markup is not None:
+            self.reply_markup = reply_markup
+
+
+class CoalescingOutbox:
+    """Буфер исходящих сообщений с отдельной очередью для каждого чата"""
+    
+    def __init__(self, send: Callable[..., Any], max_length: int = MAX_MESSAGE_LENGTH):
+        """
+        Args:
+            send: Функция отправки send(chat_id, text, **kwargs) без буфера
+            max_length: Максимальная длина склеенного текста (в кодовых единицах UTF-16)
+        """
+        self._send = send
+        self.max_length = max_length
+        self._batches = {}  # chat_id -> [пачки в порядке отправки]
+        self._lock = threading.Lock()
+        
+        # Метрики
+        self._messages = 0
+        self._api_calls = 0
+        self._failed = 0
+        self._discarded = 0
+    
+    def send_message(self, chat_id: int, text: str, **kwargs):
+        """
+        Постановка текстового сообщения в буфер чата
+        
+        Args:
+            chat_id: ID чата
+            text: Текст сообщения
+            kwargs: Параметры send_message (parse_mode, reply_markup и т.п.)
+        """
+        reply_markup = kwargs.pop('reply_markup', None)
+        
+        with self._lock:
+            self._messages += 1
+            batches = self._batches.setdefault(chat_id, [])
+            if batches and batches[-1].accepts(text, kwargs, reply_markup, self.max_length):
+                batches[-1].add(text, reply_markup)
+            else:
+                batches.append(_Batch(text, kwargs, reply_markup))
+    
+    def flush(self, chat_id: int):
+        """
+        Отправка накопленных сообщений чата по порядку
+        
+        Args:
+            chat_id: ID чата
+        """
+        with self._lock:
+            batches = self._batches.pop(chat_id, [])
+        
+        for batch in batches:
+            try:
+                self._send(
+                    chat_id,
+                    SEPARATOR.join(batch.texts),
+                    reply_markup=batch.reply_markup,
+                    **batch.options
+                )
+            except Exception as e:
+                with self._lock:
+                    self._failed += 1
+                print(f"❌ Ошибка при отправке сообщения в чат {chat_id}: {e}")
+            finally:
+                with self._lock:
+                    self._api_calls += 1
+    
+    def discard(self, chat_id: int) -> int:
+        """
+        Отмена накопленных сообщений чата
+        
+        Args:
+            chat_id: ID чата
+        
+        Returns:
+            Количество отменённых сообщений
+        """
+        with self._lock:
+            discarded = sum(len(batch.texts) for batch in self._batches.pop(chat_id, []))
+            self._discarded += discarded
+        return discarded
+    
+    def get_stats(self) -> dict:
+        """
+        Статистика буфера
+        
+        Returns:
+            Число сообщений, вызовов API и сэкономленных вызовов
+        """
+        with self._lock:
+            pending = sum(len(batch.texts) for batches in self._batches.values() for batch in batches)
+            return {
+                'messages': self._messages,
+                'api_calls': self._api_calls,
+                'saved_calls': self._messages - self._api_calls - self._discarded - pending,
+                'failed': self._failed,
+                'discarded': self._discarded,
+                'pending_chats': len(self._batches),
+            }
+
+
+def create_outbox(send: Callable[..., Any], enabled: bool) -> Optional[CoalescingOutbox]:
+    """
+    Создание буфера исходящих сообщений
+    
+    Args:
+        send: Функция отправки без буфера
+        enabled: Включена ли склейка
+    
+    Returns:
+        CoalescingOutbox или None
+    """
+    if not enabled:
+        return None
+    
+    outbox = CoalescingOutbox(send)
+    register_stats_provider('outbox', outbox.get_stats)
+    return outbox
@@ -0,0 +1,35 @@
+"""
+Сбор оперативной статистики работающего процесса бота
+"""
+from typing import Callable, Dict
+
+
+# Источники статистики: имя -> функция без аргументов, возвращающая dict
+_providers: Dict[str, Callable[[], dict]] = {}
+
+
+def register_stats_provider(name: str, provider: Callable[[], dict]):
+    """
+    Регистрация источника статистики
+    
+    Args:
+        name: Имя раздела в отчёте
+        provider: Функция, возвращающая словарь со статистикой
+    """
+    _providers[name] = provider
+
+
+def collect_runtime_stats() -> dict:
+    """
+    Сбор статистики со всех зарегистрированных источников
+    
+    Returns:
+        Словарь {раздел: статистика}
+    """
+    stats = {}
+    for name, provider in list(_providers.items()):
+        try:
+            stats[name] = provider()
+        except Exception as e:
+            stats[name] = {'error': str(e)}
+    return stats
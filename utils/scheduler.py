@@ -1,13 +1,16 @@
 """
 Планировщик уведомлений о предстоящих матчах
 """
+import json
+import threading
+import time
 from datetime import datetime, timedelta
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.interval import IntervalTrigger
 import pytz
 from telebot import TeleBot
-from database import get_session, User, GameNotification
+from database import unit_of_work, User, GameNotification, BotState
 from utils.api_service import api_service
+from utils.activity_retention import activity_retention
+from utils.sql_stats import sql_stats
 from config import config
 
 
@@ -16,11 +19,18 @@ class NotificationScheduler:
     
     def __init__(self, bot: TeleBot):
         self.bot = bot
-        self.scheduler = BackgroundScheduler(timezone=pytz.timezone('Europe/Moscow'))
+        self.scheduler = None  # создаётся в start(), APScheduler импортируется только при запуске
         self.notification_hours = config.NOTIFICATION_HOURS_BEFORE
+        self._stop_deadline = None  # после этого момента рассылка прерывается
     
     def start(self):
         """Запуск планировщика"""
+        from apscheduler.schedulers.background import BackgroundScheduler
+        from apscheduler.triggers.cron import CronTrigger
+        from apscheduler.triggers.interval import IntervalTrigger
+        
+        self.scheduler = BackgroundScheduler(timezone=pytz.timezone('Europe/Moscow'))
+        
         # Проверяем матчи каждые 10 минут
         self.scheduler.add_job(
             self.check_upcoming_games,
@@ -30,14 +40,57 @@ class NotificationScheduler:
             replace_existing=True
         )
         
+        # Раз в сутки ночью переносим старую активность в архив
+        if activity_retention.retention_days > 0:
+            self.scheduler.add_job(
+                self.archive_activity,
+                trigger=CronTrigger(hour=4, minute=0, timezone=self.scheduler.timezone),
+                id='archive_activity',
+                name='Архивация старой активности',
+                replace_existing=True
+            )
+        
         self.scheduler.start()
         print(f"✅ Планировщик уведомлений запущен (проверка каждые 10 минут)")
         print(f"⏰ Уведомления будут отправляться за {self.notification_hours} часа до матча")
     
-    def stop(self):
-        """Остановка планировщика"""
-        self.scheduler.shutdown()
-        print("⛔ Планировщик уведомлений остановлен")
+    def stop(self, timeout: float = None):
+        """
+        Остановка планировщика
+        
+        Новые проверки не запускаются, текущей рассылке даётся timeout секунд
+        на завершение. Если время вышло, рассылка прерывается и сохраняет,
+        до какого пользователя дошла: после перезапуска она продолжится
+        с того же места без повторов.
+        
+        Args:
+            timeout: Время на завершение текущей рассылки (None - ждать до конца)
+        """
+        if self.scheduler is None:
+            return
+        
+        if timeout is not None:
+            self._stop_deadline = time.monotonic() + timeout
+        
+        stopper = threading.Thread(target=self.scheduler.shutdown, kwargs={'wait': True}, daemon=True)
+        stopper.start()
+        stopper.join(timeout)
+        
+        if stopper.is_alive():
+            print("⚠️ Планировщик не успел завершить текущую задачу")
+        else:
+            print("⛔ Планировщик уведомлений остановлен")
+    
+    def _should_stop(self) -> bool:
+        """Истекло ли время, данное текущей задаче на завершение при остановке"""
+        return self._stop_deadline is not None and time.monotonic() > self._stop_deadline
+    
+    def archive_activity(self):
+        """Перенос активности старше горизонта хранения в архив"""
+        # Архивация не срочная: при остановке бота прерывается сразу, остаток - в следующую ночь
+        # Одинаковые запросы пачек - не N+1
+        with sql_stats.unit('archive_activity', detect_n_plus_one=False):
+            activity_retention.run(should_stop=lambda: self._stop_deadline is not None)
     
     def check_upcoming_games(self):
         """Проверка предстоящих игр и отправка уведомлений"""
@@ -51,8 +104,8 @@ class NotificationScheduler:
                 print("   Нет предстоящих матчей")
                 return
             
-            session = get_session()
-            try:
+            # Одна сессия на запуск задачи; отметка о рассылке фиксируется сразу после неё
+            with sql_stats.unit('check_upcoming_games'), unit_of_work() as session:
                 # Текущее время
                 now = datetime.now(pytz.timezone('Europe/Moscow'))
                 
@@ -93,9 +146,6 @@ class NotificationScheduler:
                     except Exception as e:
                         print(f"   ❌ Ошибка при обработке игры {game.get('id')}: {e}")
                         continue
-            
-            finally:
-                session.close()
         
         except Exception as e:
             print(f"   ❌ Ошибка при проверке предстоящих матчей: {e}")
@@ -104,15 +154,33 @@ class NotificationScheduler:
         """
         Отправка уведомления о предстоящей игре всем подписанным пользователям
         
+        Пользователи обходятся по возрастанию Telegram ID. Если рассылку
+        прервала остановка бота, в bot_state сохраняется последний ID,
+        и следующий запуск продолжает рассылку после него. Отметка
+        GameNotification ставится только после рассылки всем.
+        
         Args:
             game: Информация об игре
             session: Сессия БД
         """
+        progress_key = f"notification_progress:{game['id']}"
         try:
-            # Получаем всех пользователей с включенными уведомлениями
-            users = session.query(User).filter_by(notifications_enabled=True).all()
+            # Рассылка, прерванная при прошлой остановке, продолжается с места остановки
+            progress = session.get(BotState, progress_key)
+            if progress is not None and progress.value:
+                progress_data = json.loads(progress.value)
+                last_telegram_id, sent_before = progress_data['last_telegram_id'], progress_data['sent']
+                print(f"   ↩️ Продолжение рассылки после пользователя {last_telegram_id}")
+            else:
+                last_telegram_id, sent_before = None, 0
             
-            if not users:
+            # Получаем пользователей с включенными уведомлениями, ещё не получивших сообщение
+            query = session.query(User).filter_by(notifications_enabled=True)
+            if last_telegram_id is not None:
+                query = query.filter(User.telegram_id > last_telegram_id)
+            users = query.order_by(User.telegram_id).all()
+            
+            if not users and not sent_before:
                 print(f"   ⚠️ Нет пользователей с включенными уведомлениями")
                 return
             
@@ -123,6 +191,17 @@ class NotificationScheduler:
             # Отправляем уведомления
             success_count = 0
             for user in users:
+                if self._should_stop():
+                    # Отметку о рассылке не ставим: оставшиеся получат сообщение после перезапуска
+                    session.merge(BotState(key=progress_key, value=json.dumps({
+                        'last_telegram_id': last_telegram_id,
+                        'sent': sent_before + success_count,
+                    })))
+                    session.commit()
+                    print(f"   ⚠️ Рассылка прервана остановкой бота, отправлено {success_count} из {len(users)}, "
+                          f"остальные получат уведомление после перезапуска")
+                    return
+                
                 try:
                     self.bot.send_message(
                         user.telegram_id,
@@ -132,16 +211,20 @@ class NotificationScheduler:
                     success_count += 1
                 except Exception as e:
                     print(f"   ❌ Ошибка при отправке уведомления пользователю {user.telegram_id}: {e}")
+                last_telegram_id = user.telegram_id
             
             # Сохраняем информацию об отправленном уведомлении
             notification = GameNotification(
                 game_id=game['id'],
-                users_count=success_count
+                users_count=sent_before + success_count
             )
             session.add(notification)
+            if progress is not None:
+                session.delete(progress)
+            # Рассылку нельзя отменить: отметка фиксируется сразу, а не в конце задачи
             session.commit()
             
-            print(f"   ✅ Уведомления отправлены {success_count} пользователям")
+            print(f"   ✅ Уведомления отправлены {sent_before + success_count} пользователям")
         
         except Exception as e:
             print(f"   ❌ Ошибка при отправке уведомлений: {e}")
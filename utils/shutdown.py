@@ -0,0 +1,95 @@
+"""
+Согласованная остановка бота
+
+Порядок: перестаём принимать обновления, даём текущим обработчикам
+и рассылке завершиться в пределах общего срока, выполняем зарегистрированные
+хуки (сброс буферов, закрытие соединений) и подтверждаем Telegram
+последнее обработанное обновление.
+
+Если обработчики не успели завершиться, подтверждение пропускается, и
+Telegram пришлёт повторно только последнюю полученную пачку (её ещё не
+подтвердил следующий getUpdates). Обновления из более ранних пачек,
+которые не успели обработаться, теряются.
+"""
+import time
+from typing import Callable, List, Tuple
+from telebot import TeleBot
+from config import config
+
+
+# Хуки остановки: (имя, функция без аргументов) в порядке регистрации
+_shutdown_hooks: List[Tuple[str, Callable[[], None]]] = []
+
+
+def register_shutdown_hook(name: str, hook: Callable[[], None]):
+    """
+    Регистрация действия, выполняемого при остановке бота
+    
+    Args:
+        name: Имя для логов
+        hook: Функция без аргументов
+    """
+    _shutdown_hooks.append((name, hook))
+
+
+def confirm_update_offset(bot: TeleBot):
+    """
+    Подтверждение Telegram обработанных обновлений
+    
+    getUpdates с offset = last_update_id + 1 помечает все предыдущие
+    обновления доставленными, и после перезапуска они не придут повторно.
+    
+    Args:
+        bot: Экземпляр бота
+    """
+    if not bot.last_update_id:
+        return
+    
+    try:
+        bot.get_updates(offset=bot.last_update_id + 1, limit=1, timeout=1, long_polling_timeout=0)
+        print(f"✅ Подтверждены обновления до #{bot.last_update_id}")
+    except Exception as e:
+        print(f"⚠️ Не удалось подтвердить обновления: {e}")
+
+
+def graceful_shutdown(bot: TeleBot, scheduler=None, timeout: float = None, confirm_offset: bool = True):
+    """
+    Остановка бота без потери начатой работы
+    
+    Args:
+        bot: Экземпляр бота
+        scheduler: NotificationScheduler (если запущен)
+        timeout: Общий срок на завершение работы (по умолчанию config.SHUTDOWN_TIMEOUT)
+        confirm_offset: Подтвердить offset getUpdates (только для polling)
+    """
+    timeout = config.SHUTDOWN_TIMEOUT if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    
+    print("\n\n⛔ Остановка бота...")
+    
+    # 1. Новые обновления больше не запрашиваются
+    bot.stop_polling()
+    
+    # 2. Текущая рассылка уведомлений (обработчики продолжают работать параллельно)
+    if scheduler is not None:
+        scheduler.stop(timeout=max(deadline - time.monotonic(), 0))
+    
+    # 3. Обработчики, уже поставленные в очереди чатов
+    executor = getattr(bot, 'executor', None)
+    if executor is not None:
+        if executor.drain(max(deadline - time.monotonic(), 0)):
+            print("✅ Все обработчики завершены")
+        else:
+            print(f"⚠️ Не дождались обработчиков: в очереди {executor.get_stats()['pending']}")
+            confirm_offset = False
+    
+    # 4. Сброс буферов и закрытие ресурсов
+    for name, hook in _shutdown_hooks:
+        try:
+            hook()
+        except Exception as e:
+            print(f"⚠️ Ошибка при остановке ({name}): {e}")
+    
+    # 5. Telegram не будет повторно присылать обработанные обновления
+    if confirm_offset:
+        confirm_update_offset(bot)
@@ -0,0 +1,219 @@
+"""
+Статистика SQL-запросов и поиск N+1
+
+Слушатели событий SQLAlchemy на всех движках (основной, чтения,
+асинхронные) замеряют время каждого запроса. Запросы группируются
+по единице работы - обработке одного обновления или запуску задачи
+планировщика - под именем обработчика или задачи.
+
+Если в одной единице работы один и тот же запрос (с точностью до
+параметров) выполнился SQL_N_PLUS_ONE_THRESHOLD раз и больше, это признак
+N+1: запрос в цикле вместо одного запроса на все объекты. Такие запросы
+и запросы дольше SQL_SLOW_QUERY_MS пишутся в лог.
+"""
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from config import config
+from utils.runtime_stats import register_stats_provider
+
+
+# Сколько разных запросов и случаев N+1 хранить в статистике
+_MAX_STATEMENTS = 200
+_MAX_N_PLUS_ONE = 50
+
+# Имя для запросов вне единицы работы (админ-панель, запуск бота)
+_UNSCOPED = 'unscoped'
+
+
+def shorten_statement(statement: str, limit: int = 200) -> str:
+    """Запрос в одну строку для лога и статистики"""
+    return ' '.join(statement.split())[:limit]
+
+
+class _Unit:
+    """Запросы одной единицы работы"""
+    
+    def __init__(self, name: str, detect_n_plus_one: bool):
+        self.name = name
+        self.detect_n_plus_one = detect_n_plus_one
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.duration = 0.0
+        self.repeats = Counter()
+
+
+class SQLStats:
+    """Время SQL-запросов по обработчикам и задачам"""
+    
+    def __init__(self, slow_query_ms: float, n_plus_one_threshold: int):
+        """
+        Args:
+            slow_query_ms: Запросы дольше этого времени пишутся в лог (0 - не писать)
+            n_plus_one_threshold: Сколько повторов запроса в единице работы считать N+1
+        """
+        self.slow_query_ms = slow_query_ms
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self._current = ContextVar('sql_stats_unit', default=None)
+        self._lock = threading.Lock()
+        self._statements = {}  # запрос -> [количество, суммарное время, максимальное время]
+        self._scopes = {}  # имя -> [единиц работы, запросов, суммарное время, максимум запросов]
+        self._n_plus_one = {}  # (имя, запрос) -> максимум повторов
+        self._slow_queries = 0
+    
+    def install(self):
+        """Подключение к событиям всех движков SQLAlchemy"""
+        event.listen(Engine, 'before_cursor_execute', self._before_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_execute)
+    
+    @contextmanager
+    def unit(self, name: str, detect_n_plus_one: bool = True):
+        """
+        Единица работы для группировки запросов
+        
+        Вложенный вызов (маршрутизатор внутри задачи пула) не начинает
+        новую единицу, а уточняет имя текущей.
+        
+        Args:
+            name: Имя обработчика или задачи
+            detect_n_plus_one: False для задач, которые намеренно повторяют
+                               запрос (обработка пачками)
+        
+        Использование:
+        ```python
+        with sql_stats.unit('check_games'):
+            ...
+        ```
+        """
+        current = self._current.get()
+        if current is not None:
+            current.name = name
+            yield current
+            return
+        
+        unit = _Unit(name, detect_n_plus_one)
+        token = self._current.set(unit)
+        try:
+            yield unit
+        finally:
+            self._current.reset(token)
+            self._finish(unit)
+    
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._sql_stats_started_at = time.perf_counter()
+    
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started_at = getattr(context, '_sql_stats_started_at', None)
+        if started_at is None:
+            return
+        duration = time.perf_counter() - started_at
+        unit = self._current.get()
+        
+        with self._lock:
+            stats = self._statements.get(statement)
+            if stats is None and len(self._statements) < _MAX_STATEMENTS:
+                stats = self._statements[statement] = [0, 0.0, 0.0]
+            if stats is not None:
+                stats[0] += 1
+                stats[1] += duration
+                stats[2] = max(stats[2], duration)
+            
+            if unit is None:
+                scope = self._scopes.setdefault(_UNSCOPED, [0, 0, 0.0, 0])
+                scope[1] += 1
+                scope[2] += duration
+        
+        if unit is not None:
+            with unit.lock:
+                unit.queries += 1
+                unit.duration += duration
+                unit.repeats[statement] += 1
+        
+        if self.slow_query_ms and duration * 1000 >= self.slow_query_ms:
+            with self._lock:
+                self._slow_queries += 1
+            name = unit.name if unit is not None else _UNSCOPED
+            print(f"🐢 Медленный запрос {duration * 1000:.1f} мс [{name}]: {shorten_statement(statement)}")
+    
+    def _finish(self, unit: _Unit):
+        """Учёт завершённой единицы работы"""
+        repeated = []
+        if unit.detect_n_plus_one:
+            repeated = [
+                (statement, count) for statement, count in unit.repeats.items()
+                if count >= self.n_plus_one_threshold
+            ]
+        
+        with self._lock:
+            scope = self._scopes.setdefault(unit.name, [0, 0, 0.0, 0])
+            scope[0] += 1
+            scope[1] += unit.queries
+            scope[2] += unit.duration
+            scope[3] = max(scope[3], unit.queries)
+            
+            for statement, count in repeated:
+                key = (unit.name, statement)
+                if key in self._n_plus_one or len(self._n_plus_one) < _MAX_N_PLUS_ONE:
+                    self._n_plus_one[key] = max(self._n_plus_one.get(key, 0), count)
+        
+        for statement, count in repeated:
+            print(f"⚠️ Возможен N+1 в {unit.name}: запрос выполнен {count} раз: {shorten_statement(statement)}")
+    
+    def get_stats(self, top: int = 10) -> dict:
+        """
+        Статистика запросов
+        
+        Args:
+            top: Сколько самых затратных запросов вернуть
+        
+        Returns:
+            Запросы по обработчикам и задачам, случаи N+1 и самые затратные запросы
+        """
+        with self._lock:
+            scopes = {
+                name: {
+                    'units': units,
+                    'queries': queries,
+                    'queries_per_unit': round(queries / units, 2) if units else None,
+                    'max_queries': max_queries if units else None,
+                    'total_ms': round(duration * 1000, 1),
+                    'avg_query_ms': round(duration / queries * 1000, 2) if queries else 0.0,
+                }
+                for name, (units, queries, duration, max_queries) in sorted(self._scopes.items())
+            }
+            n_plus_one = [
+                {'scope': name, 'statement': shorten_statement(statement), 'repeats': repeats}
+                for (name, statement), repeats in sorted(self._n_plus_one.items(), key=lambda item: -item[1])
+            ]
+            statements = sorted(self._statements.items(), key=lambda item: -item[1][1])[:top]
+            top_statements = [
+                {
+                    'statement': shorten_statement(statement),
+                    'count': count,
+                    'avg_ms': round(total / count * 1000, 2),
+                    'max_ms': round(longest * 1000, 2),
+                    'total_ms': round(total * 1000, 1),
+                }
+                for statement, (count, total, longest) in statements
+            ]
+            slow_queries = self._slow_queries
+        
+        return {
+            'slow_query_ms': self.slow_query_ms,
+            'slow_queries': slow_queries,
+            'n_plus_one_threshold': self.n_plus_one_threshold,
+            'scopes': scopes,
+            'n_plus_one': n_plus_one,
+            'top_statements': top_statements,
+        }
+
+
+# Глобальная статистика SQL-запросов
+sql_stats = SQLStats(config.SQL_SLOW_QUERY_MS, config.SQL_N_PLUS_ONE_THRESHOLD)
+sql_stats.install()
+register_stats_provider('sql', sql_stats.get_stats)
@@ -0,0 +1,108 @@
+"""
+Замер и ускорение запуска бота
+
+Независимые шаги прогрева (БД, снимок API, клавиатуры) выполняются
+параллельно, длительность каждого шага записывается для отчёта
+`python bot.py --profile-startup`.
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+from utils.runtime_stats import register_stats_provider
+
+
+class StartupProfiler:
+    """Журнал шагов запуска с длительностями"""
+    
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self._phases = []  # [(имя, момент начала, длительность, поток)]
+        self._lock = threading.Lock()
+    
+    def record(self, name: str, started_at: float, duration: float):
+        """
+        Запись шага, замеренного вручную
+        
+        Args:
+            name: Имя шага
+            started_at: Момент начала (time.perf_counter)
+            duration: Длительность (секунды)
+        """
+        with self._lock:
+            # Шаги, начатые до создания профиля (импорты), сдвигают точку отсчёта
+            self.started_at = min(self.started_at, started_at)
+            self._phases.append((name, started_at, duration, threading.current_thread().name))
+    
+    @contextmanager
+    def phase(self, name: str):
+        """
+        Замер шага запуска
+        
+        Использование:
+        ```python
+        with startup_profiler.phase('init_db'):
+            init_db()
+        ```
+        """
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, started_at, time.perf_counter() - started_at)
+    
+    def start_background(self, tasks: Dict[str, Callable[[], Any]]) -> Dict[str, Future]:
+        """
+        Параллельный запуск шагов прогрева в фоновых потоках
+        
+        Args:
+            tasks: {имя шага: функция без аргументов}
+        
+        Returns:
+            {имя шага: Future с результатом функции}
+        """
+        pool = ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix='warmup')
+        futures = {name: pool.submit(self._run_phase, name, task) for name, task in tasks.items()}
+        pool.shutdown(wait=False)
+        return futures
+    
+    def _run_phase(self, name: str, task: Callable[[], None]):
+        with self.phase(name):
+            return task()
+    
+    def get_stats(self) -> dict:
+        """
+        Длительности шагов запуска
+        
+        Returns:
+            {имя шага: длительность в мс}
+        """
+        with self._lock:
+            return {name: round(duration * 1000, 1) for name, _, duration, _ in self._phases}
+    
+    def report(self) -> str:
+        """
+        Текстовый отчёт о запуске: шаги в порядке начала
+        
+        Returns:
+            Таблица с началом, длительностью и потоком каждого шага
+        """
+        with self._lock:
+            phases = sorted(self._phases, key=lambda phase: phase[1])
+        total = time.perf_counter() - self.started_at
+        
+        lines = [
+            "⏱ Профиль запуска",
+            f"{'шаг':<28}{'старт, мс':>12}{'время, мс':>12}  поток",
+        ]
+        for name, started_at, duration, thread_name in phases:
+            offset = started_at - self.started_at
+            lines.append(f"{name:<28}{offset * 1000:>12.1f}{duration * 1000:>12.1f}  {thread_name}")
+        lines.append(f"{'всего':<28}{'':>12}{total * 1000:>12.1f}")
+        return "\n".join(lines)
+
+
+# Глобальный профиль запуска
+startup_profiler = StartupProfiler()
+register_stats_provider('startup', startup_profiler.get_stats)
@@ -0,0 +1,410 @@
+"""
+Хранилища состояний пошаговых сценариев (регистрация, редактирование)
+
+Хранилище ведёт себя как словарь {Telegram ID: состояние}, поэтому
+обработчики и маршрутизатор работают с ним так же, как с обычным dict.
+Записи живут ограниченное время (TTL), размер хранилища ограничен:
+брошенные сценарии не копятся.
+
+Состояние - изменяемый dict: шаги сценария меняют его на месте
+(state['full_name'] = ...). Хранилище возвращает его обёрнутым
+в ScenarioState, который сохраняет каждое такое изменение сразу.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Optional
+from sqlalchemy import delete, event, func, insert, select, update
+from sqlalchemy.orm import Session
+from config import config
+from database import get_session, FsmState
+from utils.runtime_stats import register_stats_provider
+
+
+_MISSING = object()
+
+
+class ScenarioState(dict):
+    """Состояние сценария, которое сохраняется в хранилище при каждом изменении"""
+    
+    def __init__(self, store, key, value: dict):
+        super().__init__(value)
+        self._store = store
+        self._key = key
+    
+    def _changed(self):
+        self._store._save(self._key, self)
+    
+    def __setitem__(self, name, value):
+        super().__setitem__(name, value)
+        self._changed()
+    
+    def __delitem__(self, name):
+        super().__delitem__(name)
+        self._changed()
+    
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._changed()
+    
+    def setdefault(self, name, default=None):
+        if name in self:
+            return self[name]
+        self[name] = default
+        return default
+    
+    def pop(self, name, *default):
+        value = super().pop(name, *default)
+        self._changed()
+        return value
+    
+    def clear(self):
+        super().clear()
+        self._changed()
+
+
+class MemoryStateStore:
+    """
+    Хранилище состояний в памяти с TTL и ограничением размера
+    
+    Срок жизни записи продлевается при каждом изменении. При превышении
+    размера вытесняются записи, которые дольше всего не менялись.
+    Состояния видны только текущему процессу.
+    """
+    
+    def __init__(self, name: str, ttl: float, max_size: int):
+        """
+        Args:
+            name: Имя хранилища (для статистики)
+            ttl: Время жизни записи без изменений (секунды)
+            max_size: Максимальное количество записей
+        """
+        self.name = name
+        self.ttl = ttl
+        self.max_size = max_size
+        self._items = OrderedDict()  # ключ -> (срок действия, состояние), от старых к новым
+        self._lock = threading.RLock()
+        self._expired = 0
+        self._evicted = 0
+    
+    def __contains__(self, key) -> bool:
+        return self._get(key) is not _MISSING
+    
+    def __getitem__(self, key) -> Any:
+        value = self._get(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+    
+    def __setitem__(self, key, value: Any):
+        if isinstance(value, dict):
+            value = ScenarioState(self, key, value)
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            self._evict()
+    
+    def __delitem__(self, key):
+        with self._lock:
+            del self._items[key]
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._items)
+    
+    def get(self, key, default: Any = None) -> Any:
+        value = self._get(key)
+        return default if value is _MISSING else value
+    
+    def pop(self, key, default: Any = None) -> Any:
+        with self._lock:
+            value = self._get(key)
+            if value is _MISSING:
+                return default
+            del self[key]
+            return value
+    
+    def _save(self, key, value: ScenarioState):
+        """Продление срока жизни состояния, изменённого на месте"""
+        with self._lock:
+            item = self._items.get(key)
+            # Состояние, уже удалённое из хранилища, не восстанавливается
+            if item is not None and item[1] is value:
+                self._items[key] = (time.monotonic() + self.ttl, value)
+                self._items.move_to_end(key)
+    
+    def _get(self, key) -> Any:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return _MISSING
+            
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._items[key]
+                self._expired += 1
+                return _MISSING
+            return value
+    
+    def _evict(self):
+        now = time.monotonic()
+        while self._items:
+            key, (expires_at, _) = next(iter(self._items.items()))
+            if expires_at < now:
+                self._expired += 1
+            elif len(self._items) > self.max_size:
+                self._evicted += 1
+            else:
+                break
+            del self._items[key]
+    
+    def get_stats(self) -> dict:
+        """
+        Статистика хранилища
+        
+        Returns:
+            Размер, число истёкших и вытесненных записей
+        """
+        with self._lock:
+            return {
+                'size': len(self._items),
+                'max_size': self.max_size,
+                'expired': self._expired,
+                'evicted': self._evicted,
+            }
+
+
+class DatabaseStateStore:
+    """
+    Хранилище состояний в таблице fsm_state основной БД
+    
+    Кэша в памяти нет: каждое чтение идёт в БД, каждое изменение (в том
+    числе изменение состояния на месте) сразу записывается. Поэтому
+    незавершённые сценарии переживают перезапуск бота и видны всем
+    процессам, работающим с одной БД (несколько воркеров webhook).
+    
+    Внутри unit_of_work() запись входит в транзакцию обновления: если
+    обработчик упал, шаг сценария откатывается вместе с его изменениями.
+    """
+    
+    # Как часто удалять истёкшие записи и вытеснять лишние (секунды)
+    CLEANUP_INTERVAL = 60
+    
+    # Имена всех хранилищ процесса (для чтения состояний пользователя одним запросом)
+    _names = set()
+    
+    def __init__(self, name: str, ttl: float, max_size: int):
+        """
+        Args:
+            name: Имя хранилища (столбец store таблицы fsm_state)
+            ttl: Время жизни записи без изменений (секунды)
+            max_size: Максимальное количество записей
+        """
+        self.name = name
+        self.ttl = ttl
+        self.max_size = max_size
+        DatabaseStateStore._names.add(name)
+        self._lock = threading.Lock()
+        self._expired = 0
+        self._evicted = 0
+        self._next_cleanup = 0.0
+    
+    def __contains__(self, key) -> bool:
+        return self._get(key) is not _MISSING
+    
+    def __getitem__(self, key) -> Any:
+        value = self._get(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+    
+    def __setitem__(self, key, value: Any):
+        self._write(key, value, create=True)
+        self._cleanup()
+    
+    def __delitem__(self, key):
+        if not self._write(key, None):
+            raise KeyError(key)
+    
+    def __len__(self) -> int:
+        session = get_session()
+        try:
+            return session.execute(
+                select(func.count()).select_from(FsmState)
+                .where(FsmState.store == self.name, FsmState.expires_at >= datetime.utcnow())
+            ).scalar()
+        finally:
+            session.close()
+    
+    def get(self, key, default: Any = None) -> Any:
+        value = self._get(key)
+        return default if value is _MISSING else value
+    
+    def pop(self, key, default: Any = None) -> Any:
+        value = self._get(key)
+        if value is _MISSING:
+            return default
+        self._write(key, None)
+        return value
+    
+    def _save(self, key, value: ScenarioState):
+        """Запись состояния, изменённого на месте"""
+        # Без INSERT: состояние, уже удалённое из хранилища, не восстанавливается
+        self._write(key, value)
+    
+    def _get(self, key) -> Any:
+        session = get_session()
+        try:
+            cache = _session_cache(session)
+            if (self.name, key) not in cache:
+                # Одним запросом читаются состояния пользователя во всех хранилищах:
+                # маршрутизатор проверяет их по очереди
+                rows = session.execute(
+                    select(FsmState.store, FsmState.value, FsmState.expires_at).where(FsmState.key == key)
+                ).all()
+                cache.update(((name, key), None) for name in DatabaseStateStore._names)
+                cache.update(((store, key), (value, expires_at)) for store, value, expires_at in rows)
+            row = cache.get((self.name, key))
+        finally:
+            session.close()
+        
+        # Истёкшие записи удаляет _cleanup(): чтение не открывает транзакцию записи
+        if row is None or row[1] < datetime.utcnow():
+            return _MISSING
+        return ScenarioState(self, key, json.loads(row[0]))
+    
+    def _write(self, key, value: Any, create: bool = False) -> bool:
+        """
+        Запись или удаление (value=None) состояния
+        
+        Returns:
+            True, если запись была (или создана при create=True)
+        """
+        if value is None:
+            row = None
+            statement = delete(FsmState).where(*self._where(key))
+        else:
+            row = (json.dumps(value, ensure_ascii=False), datetime.utcnow() + timedelta(seconds=self.ttl))
+            statement = update(FsmState).where(*self._where(key)).values(value=row[0], expires_at=row[1])
+        
+        session = get_session()
+        try:
+            found = session.execute(statement).rowcount > 0
+            if not found and create:
+                session.execute(insert(FsmState).values(store=self.name, key=key, value=row[0], expires_at=row[1]))
+                found = True
+            session.commit()
+            _session_cache(session)[(self.name, key)] = row if found else None
+            return found
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+    
+    def _where(self, key) -> tuple:
+        return FsmState.store == self.name, FsmState.key == key
+    
+    def _cleanup(self):
+        """Удаление истёкших записей и вытеснение самых старых сверх max_size"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._next_cleanup:
+                return
+            self._next_cleanup = now + self.CLEANUP_INTERVAL
+        
+        session = get_session()
+        try:
+            expired = session.execute(
+                delete(FsmState).where(FsmState.store == self.name, FsmState.expires_at < datetime.utcnow())
+            ).rowcount
+            
+            size = session.execute(
+                select(func.count()).select_from(FsmState).where(FsmState.store == self.name)
+            ).scalar()
+            evicted = 0
+            if size > self.max_size:
+                oldest = session.execute(
+                    select(FsmState.key).where(FsmState.store == self.name)
+                    .order_by(FsmState.expires_at).limit(size - self.max_size)
+                ).scalars().all()
+                evicted = session.execute(
+                    delete(FsmState).where(FsmState.store == self.name, FsmState.key.in_(oldest))
+                ).rowcount
+            
+            session.commit()
+            # Удалённые записи могли остаться в кэше чтений сессии
+            session.info.pop(_CACHE_KEY, None)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+        
+        with self._lock:
+            self._expired += expired
+            self._evicted += evicted
+    
+    def get_stats(self) -> dict:
+        """
+        Статистика хранилища
+        
+        Returns:
+            Размер, число удалённых истёкших и вытесненных записей
+        """
+        size = len(self)
+        with self._lock:
+            return {
+                'size': size,
+                'max_size': self.max_size,
+                'expired': self._expired,
+                'evicted': self._evicted,
+            }
+
+
+# Ключ кэша прочитанных состояний в session.info
+_CACHE_KEY = 'fsm_state'
+
+
+def _session_cache(session) -> dict:
+    """
+    Кэш состояний, прочитанных и записанных в этой сессии
+    
+    Внутри unit_of_work() сессия одна на обновление, поэтому маршрутизатор,
+    ограничение частоты и обработчик читают строку состояния один раз.
+    Отдельные сессии вне unit_of_work() живут один вызов, и кэш не нужен.
+    """
+    return session.info.setdefault(_CACHE_KEY, {})
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_cached_states(session, previous_transaction):
+    """После отката кэш мог разойтись с БД"""
+    session.info.pop(_CACHE_KEY, None)
+
+
+def create_state_store(name: str, backend: Optional[str] = None):
+    """
+    Создание хранилища состояний по настройкам из config
+    
+    Args:
+        name: Имя хранилища
+        backend: 'database' или 'memory' (по умолчанию config.FSM_STORAGE)
+    
+    Returns:
+        Хранилище состояний
+    """
+    backend = backend or config.FSM_STORAGE
+    
+    # 'sqlite' - прежнее название: состояния хранились в отдельном файле
+    if backend in ('database', 'sqlite'):
+        store = DatabaseStateStore(name, config.FSM_STATE_TTL, config.FSM_STATE_MAX_SIZE)
+    elif backend == 'memory':
+        store = MemoryStateStore(name, config.FSM_STATE_TTL, config.FSM_STATE_MAX_SIZE)
+    else:
+        raise ValueError(f"Неизвестное хранилище состояний: {backend}")
+    
+    register_stats_provider(f'state_store.{name}', store.get_stats)
+    return store
@@ -0,0 +1,92 @@
+"""
+Публикация статистики процесса бота для админ-панели
+
+Бот и админ-панель обычно запущены отдельными процессами (start.sh),
+а статистика (маршруты, очереди, блокировки, SQL-запросы и N+1) живёт
+в памяти процесса бота. Поэтому бот периодически записывает снимок
+статистики в таблицу bot_state, а админ-панель читает его оттуда.
+"""
+import json
+import threading
+from datetime import datetime
+from typing import Optional
+from config import config
+from database import get_session, BotState
+from utils.runtime_stats import collect_runtime_stats
+
+
+RUNTIME_STATS_KEY = 'runtime_stats'
+
+
+class RuntimeStatsExporter:
+    """Периодическая запись снимка статистики в bot_state"""
+    
+    def __init__(self, interval: float):
+        """
+        Args:
+            interval: Как часто записывать снимок (секунды), 0 - не записывать
+        """
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Запуск фонового потока записи"""
+        if self.interval <= 0 or self._thread is not None:
+            return
+        
+        self._thread = threading.Thread(target=self._run, name="stats-export", daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.export()
+    
+    def export(self):
+        """Запись текущего снимка статистики"""
+        value = json.dumps(collect_runtime_stats(), ensure_ascii=False, default=str)
+        
+        session = get_session()
+        try:
+            session.merge(BotState(key=RUNTIME_STATS_KEY, value=value, updated_at=datetime.utcnow()))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"⚠️ Не удалось сохранить статистику бота: {e}")
+        finally:
+            session.close()
+    
+    def stop(self):
+        """Остановка потока и запись последнего снимка"""
+        if self._thread is None:
+            return
+        
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+        self.export()
+
+
+def load_exported_stats() -> Optional[dict]:
+    """
+    Последний снимок статистики процесса бота
+    
+    Returns:
+        {'updated_at': время записи, 'stats': статистика} или None,
+        если бот ещё не публиковал статистику
+    """
+    session = get_session()
+    try:
+        state = session.get(BotState, RUNTIME_STATS_KEY)
+        if state is None or not state.value:
+            return None
+        return {
+            'updated_at': state.updated_at.isoformat(timespec='seconds') if state.updated_at else None,
+            'stats': json.loads(state.value),
+        }
+    finally:
+        session.close()
+
+
+# Глобальный экспорт статистики процесса бота
+stats_exporter = RuntimeStatsExporter(config.RUNTIME_STATS_EXPORT_INTERVAL)
@@ -0,0 +1,77 @@
+"""
+Индекс команд для поиска по названию
+
+Индекс строится один раз для каждого снимка списка команд из API.
+Названия нормализуются (регистр, «ё», кавычки, лишние пробелы), поэтому
+пользователь может ввести название вручную или только его начало.
+"""
+from typing import Dict, List, Optional
+
+
+_QUOTES = str.maketrans('', '', '"\'«»„“”')
+
+
+def normalize_team_name(name: str) -> str:
+    """
+    Нормализация названия команды для сравнения
+    
+    Args:
+        name: Название или введённый текст
+    
+    Returns:
+        Название в нижнем регистре без кавычек и лишних пробелов
+    """
+    name = name.casefold().replace('ё', 'е').translate(_QUOTES)
+    return ' '.join(name.split())
+
+
+class TeamIndex:
+    """Словари команд по ID, slug, названию и началу названия"""
+    
+    def __init__(self, teams: List[Dict]):
+        """
+        Args:
+            teams: Снимок списка команд из API
+        """
+        self.teams = teams
+        self.by_id = {}
+        self.by_slug = {}
+        self.by_name = {}
+        self.by_prefix = {}  # начало названия или любого его слова -> [команды]
+        
+        for team in teams:
+            self.by_id.setdefault(team.get('id'), team)
+            self.by_slug.setdefault(team.get('slug'), team)
+            
+            name = normalize_team_name(team.get('name') or '')
+            if not name:
+                continue
+            self.by_name.setdefault(name, team)
+            
+            prefixes = set()
+            words = name.split(' ')
+            for i in range(len(words)):
+                tail = ' '.join(words[i:])
+                prefixes.update(tail[:length] for length in range(1, len(tail) + 1))
+            for prefix in prefixes:
+                self.by_prefix.setdefault(prefix, []).append(team)
+    
+    def get_by_name(self, name: str) -> Optional[Dict]:
+        """Команда с точно таким названием (без учёта регистра)"""
+        return self.by_name.get(normalize_team_name(name))
+    
+    def search(self, query: str) -> List[Dict]:
+        """
+        Поиск команд по названию или его началу
+        
+        Args:
+            query: Введённый текст
+        
+        Returns:
+            [команда] при точном совпадении, иначе команды, название
+            или слово названия которых начинается с query
+        """
+        team = self.get_by_name(query)
+        if team is not None:
+            return [team]
+        return list(self.by_prefix.get(normalize_team_name(query), ()))
@@ -0,0 +1,165 @@
+"""
+Ограничение частоты сообщений от одного пользователя
+
+Каждому пользователю выделяется "ведро токенов": одно сообщение - один токен,
+токены восстанавливаются с постоянной скоростью. Повторное нажатие той же
+кнопки в коротком окне склеивается с предыдущим и не обрабатывается.
+Ввод на шаге сценария (например, /skip два раза подряд) повтором
+не считается: одинаковый текст там - это разные ответы.
+"""
+import asyncio
+import inspect
+import threading
+import time
+from telebot.types import Message
+from config import config
+from utils.runtime_stats import register_stats_provider
+
+
+THROTTLE_TEXT = "⏳ Слишком много запросов. Подождите пару секунд."
+
+# Решения ограничителя
+ALLOW = 'allow'
+DUPLICATE = 'duplicate'  # повтор того же сообщения - молча пропускаем
+THROTTLED = 'throttled'  # токены закончились - предупреждаем пользователя
+THROTTLED_SILENT = 'throttled_silent'  # предупреждение уже отправлено недавно
+
+
+class _Bucket:
+    __slots__ = ('tokens', 'updated_at', 'last_text', 'last_text_at', 'warned_at')
+    
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.updated_at = now
+        self.last_text = None
+        self.last_text_at = 0.0
+        self.warned_at = 0.0
+
+
+class FloodThrottler:
+    """Ограничитель частоты сообщений по Telegram ID пользователя"""
+    
+    # После такого числа пользователей из памяти удаляются неактивные
+    PRUNE_THRESHOLD = 10000
+    
+    def __init__(self, rate: float, burst: int, duplicate_window: float):
+        """
+        Args:
+            rate: Скорость восстановления токенов (сообщений в секунду)
+            burst: Размер ведра (сколько сообщений подряд разрешено)
+            duplicate_window: Окно склейки одинаковых сообщений (секунды)
+        """
+        self.rate = rate
+        self.burst = burst
+        self.duplicate_window = duplicate_window
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._stats = {ALLOW: 0, DUPLICATE: 0, THROTTLED: 0, THROTTLED_SILENT: 0}
+    
+    def check(self, user_id: int, text: str, skip_duplicates: bool = True) -> str:
+        """
+        Решение по очередному сообщению пользователя
+        
+        Args:
+            user_id: Telegram ID пользователя
+            text: Текст сообщения
+            skip_duplicates: Отбрасывать повтор того же текста (False для шагов сценария)
+        
+        Returns:
+            ALLOW, DUPLICATE, THROTTLED или THROTTLED_SILENT
+        """
+        now = time.monotonic()
+        
+        with self._lock:
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                if len(self._buckets) >= self.PRUNE_THRESHOLD:
+                    self._prune(now)
+                bucket = self._buckets[user_id] = _Bucket(self.burst, now)
+            
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated_at) * self.rate)
+            bucket.updated_at = now
+            
+            if skip_duplicates and text == bucket.last_text and now - bucket.last_text_at < self.duplicate_window:
+                decision = DUPLICATE
+            elif bucket.tokens < 1:
+                # Предупреждаем не чаще, чем раз в окно восстановления одного токена
+                if now - bucket.warned_at < max(1 / self.rate, self.duplicate_window):
+                    decision = THROTTLED_SILENT
+                else:
+                    bucket.warned_at = now
+                    decision = THROTTLED
+            else:
+                bucket.tokens -= 1
+                bucket.last_text = text
+                bucket.last_text_at = now
+                decision = ALLOW
+            
+            self._stats[decision] += 1
+            return decision
+    
+    def _prune(self, now: float):
+        """Удаление пользователей, чьё ведро уже полностью восстановилось"""
+        idle_after = self.burst / self.rate
+        self._buckets = {
+            user_id: bucket for user_id, bucket in self._buckets.items()
+            if now - bucket.updated_at < idle_after
+        }
+    
+    def get_stats(self) -> dict:
+        """
+        Статистика ограничителя
+        
+        Returns:
+            Количество решений каждого типа и число отслеживаемых пользователей
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['tracked_users'] = len(self._buckets)
+            return stats
+
+
+# Глобальный ограничитель
+flood_throttler = FloodThrottler(
+    rate=config.THROTTLE_RATE,
+    burst=config.THROTTLE_BURST,
+    duplicate_window=config.THROTTLE_DUPLICATE_WINDOW
+)
+register_stats_provider('throttling', flood_throttler.get_stats)
+
+
+def create_throttle_guard(bot, scenario_router):
+    """
+    Проверка для маршрутизатора, отбрасывающая слишком частые сообщения
+    
+    Args:
+        bot: TeleBot или AsyncTeleBot (для async бота проверка тоже асинхронная)
+        scenario_router: Маршрутизатор с шагами сценариев (router.state); пока
+                         пользователь на шаге, одинаковые сообщения не склеиваются
+    
+    Returns:
+        Функция-проверка для Router.guard
+    """
+    
+    def decide(message: Message, in_scenario: bool) -> str:
+        return flood_throttler.check(message.from_user.id, message.text, not in_scenario)
+    
+    if inspect.iscoroutinefunction(bot.send_message):
+        async def async_throttle_guard(message: Message):
+            # Состояния сценариев читаются из БД, поэтому не в event loop
+            in_scenario = await asyncio.to_thread(scenario_router.in_scenario, message.from_user.id)
+            decision = decide(message, in_scenario)
+            if decision == THROTTLED:
+                await bot.send_message(message.chat.id, THROTTLE_TEXT)
+                return False
+            return decision == ALLOW
+        return async_throttle_guard
+    
+    def throttle_guard(message: Message):
+        decision = decide(message, scenario_router.in_scenario(message.from_user.id))
+        if decision == THROTTLED:
+            bot.send_message(message.chat.id, THROTTLE_TEXT)
+            return False
+        return decision == ALLOW
+    
+    return throttle_guard
@@ -0,0 +1,171 @@
+"""
+Учёт полученных обновлений Telegram
+
+Последний обработанный update_id сохраняется в БД, поэтому после
+перезапуска бот продолжает с того же места и не выполняет обработанные
+обновления повторно. Обработанным считается обновление, все обработчики
+которого завершились, и все обновления до него. Недавние update_id хранятся
+в ограниченном LRU: повторная доставка (ретраи webhook, повтор getUpdates)
+отбрасывается до вызова обработчиков.
+
+Offset getUpdates при этом двигается по полученным обновлениям: каждый
+следующий запрос подтверждает Telegram всю предыдущую пачку. Поэтому при
+аварийном завершении (без graceful_shutdown) обновления, которые стояли
+в очередях или обрабатывались, теряются: Telegram их не пришлёт повторно.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, List
+from telebot.types import Update
+from config import config
+from database import get_session, BotState
+from utils.runtime_stats import register_stats_provider
+
+
+LAST_UPDATE_ID_KEY = 'last_update_id'
+
+
+class UpdateTracker:
+    """Сохранённый offset и защита от повторной обработки обновлений"""
+    
+    def __init__(self, capacity: int, save_interval: float):
+        """
+        Args:
+            capacity: Сколько последних update_id помнить
+            save_interval: Как часто (секунды) сохранять offset в БД при работе
+        """
+        self.capacity = capacity
+        self.save_interval = save_interval
+        self._recent = OrderedDict()  # update_id -> None, в порядке получения
+        self._lock = threading.Lock()
+        self._floor = 0  # update_id, сохранённый при прошлом запуске
+        self._in_flight = set()  # принятые, но ещё не обработанные update_id
+        self._last_update_id = 0
+        self._processed_update_id = 0
+        self._saved_update_id = 0
+        self._saved_at = time.monotonic()
+        self._accepted = 0
+        self._duplicates = 0
+    
+    def load(self) -> int:
+        """
+        Загрузка последнего обработанного update_id из БД
+        
+        Returns:
+            update_id или 0, если бот запускается впервые
+        """
+        session = get_session()
+        try:
+            state = session.get(BotState, LAST_UPDATE_ID_KEY)
+            update_id = int(state.value) if state and state.value else 0
+        finally:
+            session.close()
+        
+        with self._lock:
+            self._floor = self._last_update_id = self._processed_update_id = self._saved_update_id = update_id
+        if update_id:
+            print(f"✅ Продолжаем с обновления #{update_id + 1}")
+        return update_id
+    
+    def save(self):
+        """
+        Сохранение последнего обработанного update_id в БД
+        
+        Запись в БД блокирующая: вызывается из потоков обработчиков
+        и при остановке, но не из цикла событий webhook.
+        """
+        with self._lock:
+            update_id = self._processed_update_id
+            if update_id <= self._saved_update_id:
+                return
+            self._saved_update_id = update_id
+            self._saved_at = time.monotonic()
+        
+        session = get_session()
+        try:
+            session.merge(BotState(key=LAST_UPDATE_ID_KEY, value=str(update_id)))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"⚠️ Не удалось сохранить offset обновлений: {e}")
+        finally:
+            session.close()
+    
+    def filter(self, updates: List[Update]) -> List[Update]:
+        """
+        Отбор обновлений, которые ещё не обрабатывались
+        
+        Args:
+            updates: Полученные обновления
+        
+        Returns:
+            Новые обновления в исходном порядке
+        """
+        fresh = []
+        with self._lock:
+            for update in updates:
+                update_id = update.update_id
+                # Окно ниже сохранённого offset: после долгого простоя Telegram
+                # может начать нумерацию заново, такие обновления не отбрасываем
+                replayed = self._floor - self.capacity < update_id <= self._floor
+                if replayed or update_id in self._recent:
+                    self._duplicates += 1
+                    continue
+                
+                self._recent[update_id] = None
+                if len(self._recent) > self.capacity:
+                    self._recent.popitem(last=False)
+                
+                self._in_flight.add(update_id)
+                self._last_update_id = max(self._last_update_id, update_id)
+                self._accepted += 1
+                fresh.append(update)
+        
+        return fresh
+    
+    def complete(self, update_ids: Iterable[int]):
+        """
+        Отметка о завершении обработки обновлений
+        
+        Сохранённый offset двигается только до первого незавершённого
+        обновления. Раз в save_interval offset записывается в БД.
+        
+        Args:
+            update_ids: update_id, все обработчики которых завершились
+        """
+        with self._lock:
+            self._in_flight.difference_update(update_ids)
+            processed = min(self._in_flight) - 1 if self._in_flight else self._last_update_id
+            self._processed_update_id = max(self._processed_update_id, processed)
+            need_save = time.monotonic() - self._saved_at >= self.save_interval
+        
+        if need_save:
+            self.save()
+    
+    def get_stats(self) -> dict:
+        """
+        Статистика обновлений
+        
+        Returns:
+            Число принятых и повторных обновлений, последний полученный,
+            обработанный и сохранённый update_id
+        """
+        with self._lock:
+            return {
+                'accepted': self._accepted,
+                'duplicates': self._duplicates,
+                'last_update_id': self._last_update_id,
+                'processed_update_id': self._processed_update_id,
+                'saved_update_id': self._saved_update_id,
+                'in_flight': len(self._in_flight),
+                'recent_size': len(self._recent),
+            }
+
+
+# Глобальный учёт обновлений
+update_tracker = UpdateTracker(
+    capacity=config.UPDATE_DEDUP_SIZE,
+    save_interval=config.UPDATE_OFFSET_SAVE_INTERVAL
+)
+register_stats_provider('updates', update_tracker.get_stats)
@@ -0,0 +1,240 @@
+"""
+Контекст пользователя на время обработки обновления
+
+Пользователь загружается один раз (из кэша или одним запросом) и прикрепляется
+к сообщению как `message.user_context`, поэтому обработчикам и метрикам
+не нужно повторно искать его в БД.
+"""
+import threading
+import time
+from typing import Optional
+from sqlalchemy import select
+from telebot.types import Message
+from config import config
+from database import get_session, get_async_session, User
+
+
+class UserContext:
+    """Снимок данных пользователя, достаточный для обработчиков"""
+    
+    __slots__ = ('id', 'telegram_id', 'username', 'notifications_enabled')
+    
+    def __init__(self, id: int, telegram_id: int, username: Optional[str], notifications_enabled: bool):
+        self.id = id
+        self.telegram_id = telegram_id
+        self.username = username
+        self.notifications_enabled = bool(notifications_enabled)
+    
+    @classmethod
+    def from_model(cls, user: User) -> 'UserContext':
+        return cls(user.id, user.telegram_id, user.username, user.notifications_enabled)
+    
+    def __repr__(self):
+        return f"<UserContext {self.telegram_id}>"
+
+
+class UserIdentityCache:
+    """Короткоживущий кэш пользователей по Telegram ID"""
+    
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._items = {}  # telegram_id -> (срок действия, UserContext)
+        self._lock = threading.Lock()
+    
+    def get(self, telegram_id: int) -> Optional[UserContext]:
+        """Пользователь из кэша, если запись ещё не устарела"""
+        with self._lock:
+            item = self._items.get(telegram_id)
+            if item is None:
+                return None
+            expires_at, context = item
+            if expires_at < time.monotonic():
+                del self._items[telegram_id]
+                return None
+            return context
+    
+    def put(self, context: UserContext):
+        """Сохранение пользователя в кэш"""
+        with self._lock:
+            self._items[context.telegram_id] = (time.monotonic() + self.ttl, context)
+    
+    def invalidate(self, telegram_id: int):
+        """Удаление пользователя из кэша"""
+        with self._lock:
+            self._items.pop(telegram_id, None)
+    
+    def resolve(self, telegram_id: int) -> Optional[UserContext]:
+        """
+        Получение пользователя: из кэша или одним запросом к БД
+        
+        Args:
+            telegram_id: ID пользователя в Telegram
+        
+        Returns:
+            UserContext или None, если пользователь не зарегистрирован
+        """
+        context = self.get(telegram_id)
+        if context is not None:
+            return context
+        
+        session = get_session()
+        try:
+            user = session.query(User).filter_by(telegram_id=telegram_id).first()
+            if user is None:
+                return None
+            context = UserContext.from_model(user)
+        finally:
+            session.close()
+        
+        self.put(context)
+        return context
+    
+    async def resolve_async(self, telegram_id: int) -> Optional[UserContext]:
+        """То же, что resolve, для asyncio-рантайма"""
+        context = self.get(telegram_id)
+        if context is not None:
+            return context
+        
+        async with get_async_session() as session:
+            result = await session.execute(select(User).filter_by(telegram_id=telegram_id))
+            user = result.scalars().first()
+            if user is None:
+                return None
+            context = UserContext.from_model(user)
+        
+        self.put(context)
+        return context
+
+
+class NotificationStateCache:
+    """
+    Состояние уведомлений всех пользователей в памяти
+    
+    Загружается одним запросом при старте и обновляется при переключении,
+    поэтому для выбора варианта меню матчей не нужна БД. Устаревшая запись
+    перечитывается из БД (load): так изменения из других процессов
+    (админ-панель, второй экземпляр бота) подхватываются не позже чем
+    через ttl, независимо от срока записей в кэше пользователей.
+    """
+    
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._states = {}  # telegram_id -> (срок действия, notifications_enabled)
+        self._lock = threading.Lock()
+    
+    def warm(self):
+        """Загрузка состояния всех пользователей одним запросом"""
+        session = get_session()
+        try:
+            rows = session.query(User.telegram_id, User.notifications_enabled).all()
+        finally:
+            session.close()
+        
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._states = {telegram_id: (expires_at, bool(enabled)) for telegram_id, enabled in rows}
+        print(f"✅ Состояние уведомлений загружено в память ({len(rows)} пользователей)")
+    
+    def get(self, telegram_id: int) -> Optional[bool]:
+        """
+        Состояние уведомлений пользователя
+        
+        Returns:
+            True/False или None, если пользователь неизвестен или запись устарела
+        """
+        with self._lock:
+            item = self._states.get(telegram_id)
+            if item is None:
+                return None
+            expires_at, enabled = item
+            if expires_at < time.monotonic():
+                del self._states[telegram_id]
+                return None
+            return enabled
+    
+    def set(self, telegram_id: int, enabled: bool):
+        """Обновление состояния пользователя"""
+        with self._lock:
+            self._states[telegram_id] = (time.monotonic() + self.ttl, bool(enabled))
+    
+    def load(self, telegram_id: int) -> Optional[bool]:
+        """
+        Чтение состояния пользователя из БД
+        
+        Returns:
+            True/False или None, если пользователь не зарегистрирован
+        """
+        session = get_session()
+        try:
+            enabled = session.execute(
+                select(User.notifications_enabled).filter_by(telegram_id=telegram_id)
+            ).scalar_one_or_none()
+        finally:
+            session.close()
+        return self._loaded(telegram_id, enabled)
+    
+    async def load_async(self, telegram_id: int) -> Optional[bool]:
+        """То же, что load, для asyncio-рантайма"""
+        async with get_async_session() as session:
+            enabled = (await session.execute(
+                select(User.notifications_enabled).filter_by(telegram_id=telegram_id)
+            )).scalar_one_or_none()
+        return self._loaded(telegram_id, enabled)
+    
+    def _loaded(self, telegram_id: int, enabled: Optional[bool]) -> Optional[bool]:
+        if enabled is None:
+            return None
+        self.set(telegram_id, enabled)
+        return bool(enabled)
+
+
+# Глобальный кэш пользователей
+user_cache = UserIdentityCache(config.USER_CACHE_TTL)
+
+# Глобальный кэш состояния уведомлений
+notification_state = NotificationStateCache(config.USER_CACHE_TTL)
+
+
+def attach_user_context(message: Message):
+    """Middleware: загрузка пользователя и прикрепление к сообщению"""
+    message.user_context = user_cache.resolve(message.from_user.id)
+
+
+async def attach_user_context_async(message: Message):
+    """Middleware для asyncio-рантайма"""
+    message.user_context = await user_cache.resolve_async(message.from_user.id)
+
+
+def get_notifications_enabled(message: Message) -> Optional[bool]:
+    """
+    Состояние уведомлений автора сообщения без обращения к БД
+    
+    Если пользователя нет в кэше (зарегистрирован другим процессом) или
+    запись устарела, состояние перечитывается из БД одним запросом.
+    
+    Returns:
+        True/False или None, если пользователь не зарегистрирован
+    """
+    enabled = notification_state.get(message.from_user.id)
+    if enabled is not None:
+        return enabled
+    return notification_state.load(message.from_user.id)
+
+
+async def get_notifications_enabled_async(message: Message) -> Optional[bool]:
+    """То же, что get_notifications_enabled, для asyncio-рантайма"""
+    enabled = notification_state.get(message.from_user.id)
+    if enabled is not None:
+        return enabled
+    return await notification_state.load_async(message.from_user.id)
+
+
+def get_user_context(message: Message) -> Optional[UserContext]:
+    """
+    Пользователь текущего обновления
+    
+    Если middleware не подключен, пользователь загружается здесь же.
+    """
+    if not hasattr(message, 'user_context'):
+        attach_user_context(message)
+    return message.user_context
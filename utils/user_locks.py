@@ -0,0 +1,121 @@
+"""
+Блокировки по пользователю для обработчиков, меняющих состояние
+
+Шаги одного сценария (регистрация, подтверждение удаления) не должны
+выполняться одновременно: иначе они читают и меняют одно состояние
+и могут записать в БД дубликаты. Блокировки разбиты на фиксированное
+число полос (striped lock): пользователь всегда попадает в одну и ту же
+полосу, память не растёт с числом пользователей.
+"""
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Hashable
+from config import config
+from utils.runtime_stats import register_stats_provider
+
+
+class _LockStats:
+    """Метрики ожидания блокировок"""
+    
+    def __init__(self, stripes: int):
+        self.stripes = stripes
+        self._stats_lock = threading.Lock()
+        self._acquired = 0
+        self._contended = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+    
+    def _record(self, contended: bool, wait: float):
+        with self._stats_lock:
+            self._acquired += 1
+            if contended:
+                self._contended += 1
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+    
+    def get_stats(self) -> dict:
+        """
+        Статистика блокировок
+        
+        Returns:
+            Число захватов, сколько из них ждали и время ожидания
+        """
+        with self._stats_lock:
+            return {
+                'stripes': self.stripes,
+                'acquired': self._acquired,
+                'contended': self._contended,
+                'contention_rate': round(self._contended / self._acquired, 4) if self._acquired else 0.0,
+                'wait_avg_ms': round(self._wait_total / self._contended * 1000, 2) if self._contended else 0.0,
+                'wait_max_ms': round(self._wait_max * 1000, 2),
+            }
+
+
+class StripedLock(_LockStats):
+    """Набор блокировок для потоков, ключ - Telegram ID пользователя"""
+    
+    def __init__(self, stripes: int):
+        """
+        Args:
+            stripes: Количество полос (блокировок)
+        """
+        super().__init__(stripes)
+        # RLock: обработчик может вызвать другой обработчик того же пользователя
+        self._locks = [threading.RLock() for _ in range(stripes)]
+    
+    @contextmanager
+    def hold(self, key: Hashable):
+        """
+        Захват блокировки пользователя
+        
+        Использование:
+        ```python
+        with user_locks.hold(message.from_user.id):
+            ...
+        ```
+        """
+        lock = self._locks[hash(key) % self.stripes]
+        contended = not lock.acquire(blocking=False)
+        wait = 0.0
+        if contended:
+            started_at = time.monotonic()
+            lock.acquire()
+            wait = time.monotonic() - started_at
+        self._record(contended, wait)
+        try:
+            yield
+        finally:
+            lock.release()
+
+
+class AsyncStripedLock(_LockStats):
+    """Набор блокировок для asyncio-рантайма, ключ - Telegram ID пользователя"""
+    
+    def __init__(self, stripes: int):
+        """
+        Args:
+            stripes: Количество полос (блокировок)
+        """
+        super().__init__(stripes)
+        self._locks = [asyncio.Lock() for _ in range(stripes)]
+    
+    @asynccontextmanager
+    async def hold(self, key: Hashable):
+        """Захват блокировки пользователя (async with)"""
+        lock = self._locks[hash(key) % self.stripes]
+        contended = lock.locked()
+        started_at = time.monotonic()
+        await lock.acquire()
+        self._record(contended, time.monotonic() - started_at)
+        try:
+            yield
+        finally:
+            lock.release()
+
+
+# Глобальные блокировки пользователей
+user_locks = StripedLock(config.USER_LOCK_STRIPES)
+async_user_locks = AsyncStripedLock(config.USER_LOCK_STRIPES)
+register_stats_provider('user_locks', user_locks.get_stats)
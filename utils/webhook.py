@@ -0,0 +1,135 @@
+"""
+Приём обновлений Telegram через webhook (ASGI)
+"""
+import hmac
+from telebot import TeleBot
+from telebot.types import Update
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from config import config
+from utils.runtime_stats import collect_runtime_stats
+
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+def is_valid_secret(request: Request) -> bool:
+    """
+    Проверка секретного токена, который Telegram передаёт в заголовке
+    
+    Args:
+        request: Входящий запрос
+    
+    Returns:
+        True, если токен совпадает (без настроенного секрета - никогда)
+    """
+    if not config.WEBHOOK_SECRET:
+        return False
+    
+    received = request.headers.get(SECRET_HEADER, '')
+    return hmac.compare_digest(received.encode(), config.WEBHOOK_SECRET.encode())
+
+
+def require_secret():
+    """
+    Проверка, что секрет webhook настроен
+    
+    Без секрета любой, кто знает адрес, сможет присылать боту поддельные обновления.
+    """
+    if not config.WEBHOOK_SECRET:
+        raise ValueError("WEBHOOK_SECRET не найден в .env файле! Он обязателен в режиме webhook")
+
+
+def dispatch_update(bot: TeleBot, update: Update):
+    """
+    Передача обновления в пул обработчиков бота без ожидания результата
+    
+    Args:
+        bot: Экземпляр бота
+        update: Обновление от Telegram
+    """
+    # OrderedTeleBot сам раскладывает обновления по очередям чатов
+    if bot.threaded and bot.worker_pool:
+        bot.worker_pool.put(bot.process_new_updates, [update])
+    else:
+        bot.process_new_updates([update])
+
+
+def create_webhook_route(bot: TeleBot, path: str = None) -> Route:
+    """
+    Создание маршрута webhook для подключения в любое Starlette приложение
+    
+    Args:
+        bot: Экземпляр бота
+        path: Путь webhook (по умолчанию из config.WEBHOOK_PATH)
+    
+    Returns:
+        Маршрут Starlette
+    """
+    require_secret()
+    
+    async def webhook(request: Request):
+        """Приём обновления: проверяем секрет и сразу отвечаем 200"""
+        if not is_valid_secret(request):
+            return Response("Forbidden", status_code=403)
+        
+        try:
+            body = await request.body()
+            update = Update.de_json(body.decode('utf-8'))
+        except Exception as e:
+            print(f"⚠️ Некорректное обновление webhook: {e}")
+            return Response(status_code=400)
+        
+        if update is not None:
+            dispatch_update(bot, update)
+        
+        return Response(status_code=200)
+    
+    return Route(path or config.WEBHOOK_PATH, webhook, methods=['POST'])
+
+
+def create_webhook_app(bot: TeleBot) -> Starlette:
+    """
+    Создание отдельного ASGI приложения только с webhook
+    
+    Args:
+        bot: Экземпляр бота
+    
+    Returns:
+        Starlette app для запуска через uvicorn
+    """
+    
+    async def runtime_metrics(request: Request):
+        """Оперативная статистика процесса (доступ по секрету webhook)"""
+        if not is_valid_secret(request):
+            return Response("Forbidden", status_code=403)
+        
+        return JSONResponse(collect_runtime_stats())
+    
+    return Starlette(routes=[
+        create_webhook_route(bot),
+        Route('/metrics/runtime', runtime_metrics),
+    ])
+
+
+def setup_webhook(bot: TeleBot):
+    """
+    Регистрация webhook в Telegram
+    
+    Args:
+        bot: Экземпляр бота
+    """
+    if not config.WEBHOOK_URL:
+        raise ValueError("WEBHOOK_URL не найден в .env файле!")
+    require_secret()
+    
+    url = config.WEBHOOK_URL.rstrip('/') + config.WEBHOOK_PATH
+    bot.remove_webhook()
+    bot.set_webhook(
+        url=url,
+        secret_token=config.WEBHOOK_SECRET,
+        drop_pending_updates=False
+    )
+    print(f"✅ Webhook установлен: {url}")